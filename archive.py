@@ -0,0 +1,128 @@
+import gzip
+import json
+from datetime import datetime
+
+from deadlines import get_deadline_index
+from search import get_search_index
+from storage import get_storage
+from userstatus import get_user_status_index
+
+# Version of the archive layout written by export_archive
+FORMAT = 1
+# History entries per record: a task with a long history is streamed in pieces
+HISTORY_CHUNK = 1000
+
+
+def iter_records(storage):
+    """
+    Yield the whole data store as archive records, one small dict at a
+    time: a "meta" record, every "user" (registry order), then each
+    "project" header followed by its "task" records and the "history"
+    records of those tasks. Only one project is held in memory at once.
+    Users' project lists are not exported: they are the projects'
+    collaborators, and import_archive rebuilds them from those.
+    """
+    yield {"type": "meta", "format": FORMAT, "exported": str(datetime.now())[:19]}
+    try:
+        usernames = storage.load_registry()["usernames"].values()
+    except FileNotFoundError:
+        usernames = ()
+    for username in usernames:
+        try:
+            yield {"type": "user", "data": storage.load_user(username)}
+        except FileNotFoundError:
+            # reserved in the registry but never saved
+            continue
+    for project_id in storage.project_ids():
+        project = storage.load_project(project_id)
+        tasks = project.pop("tasks")
+        yield {"type": "project", "data": project}
+        for task in tasks.values():
+            yield {"type": "task", "project": project_id, "data": task}
+        for task_id in tasks:
+            entries = []
+            for entry in storage.iter_history(project_id, task_id):
+                entries.append(entry)
+                if len(entries) == HISTORY_CHUNK:
+                    yield {"type": "history", "project": project_id, "task": task_id, "entries": entries}
+                    entries = []
+            if entries:
+                yield {"type": "history", "project": project_id, "task": task_id, "entries": entries}
+
+
+def read_records(path):
+    # Records of an archive written by export_archive, streamed line by line
+    with gzip.open(path, "rt", encoding="utf-8") as file:
+        for line in file:
+            yield json.loads(line)
+
+
+def export_archive(path, storage=None):
+    # Stream the data store into a gzip-compressed JSONL file; returns the number of records per type
+    storage = storage or get_storage()
+    counts = {}
+    with gzip.open(path, "wt", encoding="utf-8", compresslevel=6) as file:
+        for record in iter_records(storage):
+            file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+            file.write("\n")
+            counts[record["type"]] = counts.get(record["type"], 0) + 1
+    counts.pop("meta", None)
+    return counts
+
+
+def import_archive(path, storage=None):
+    """
+    Load an archive written by export_archive into an empty data store
+    (purge it first). Records are applied as they are read, inside
+    storage.bulk(): each project is written once, with all its tasks,
+    history is appended in chunks, and the registry and each user's
+    project list are written once at the end. The derived indexes
+    (search, deadlines, user status) are rebuilt on their next use.
+    Returns the number of records per type.
+    """
+    storage = storage or get_storage()
+    try:
+        registry = storage.load_registry()
+    except FileNotFoundError:
+        registry = {"emails": [], "usernames": {}}
+    if registry["usernames"] or storage.project_ids():
+        raise ValueError("The data store is not empty. Purge it before importing.")
+    counts = {}
+    memberships = {}
+    project = None
+    with storage.bulk():
+        for record in read_records(path):
+            kind = record["type"]
+            if kind == "meta":
+                if record["format"] != FORMAT:
+                    raise ValueError(f"Unsupported archive format: {record['format']} (expected {FORMAT})")
+                continue
+            if kind != "task" and project is not None:
+                # every task of the project has been read
+                storage.save_project(project)
+                project = None
+            if kind == "user":
+                user = record["data"]
+                registry["emails"].append(user["email"])
+                registry["usernames"][user["ID"]] = user["username"]
+                storage.save_user(user)
+                storage.add_registry_user(registry, user["ID"], user["email"], user["username"])
+            elif kind == "project":
+                project = dict(record["data"], tasks={})
+                for member in project["collaborators"]:
+                    memberships.setdefault(member, []).append(project["ID"])
+            elif kind == "task":
+                project["tasks"][record["data"]["ID"]] = record["data"]
+            elif kind == "history":
+                storage.append_history(record["project"], record["task"], record["entries"])
+            else:
+                raise ValueError(f"Unknown archive record: {kind}")
+            counts[kind] = counts.get(kind, 0) + 1
+        if project is not None:
+            storage.save_project(project)
+        for member, project_ids in memberships.items():
+            if member in registry["usernames"]:
+                storage.set_user_projects(registry["usernames"][member], project_ids)
+    for index in (get_search_index(storage), get_deadline_index(storage), get_user_status_index(storage)):
+        index.invalidate()
+    return counts
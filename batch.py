@@ -0,0 +1,326 @@
+import argparse
+import inspect
+import os
+import shlex
+import sys
+import time
+from contextlib import ExitStack
+from datetime import datetime
+
+from logsetup import get_logger
+from main import Priority, Project, Status, Task, User, get_ID
+from passwords import hasher
+from storage import get_storage
+
+logger = get_logger("__batch__")
+
+# Commands applied between two saves of the open projects (--flush-every)
+FLUSH_EVERY = 500
+
+USAGE = """\
+Commands, one per line ('#' starts a comment, quote arguments with spaces):
+  create PROJECT TITLE [description=...] [priority=P] [status=S] [start=TIME] [end=TIME] [assignees=NAME,...]
+  status PROJECT TASKS STATUS
+  priority PROJECT TASKS PRIORITY
+  assign PROJECT TASKS NAME[,NAME...]
+  unassign PROJECT TASKS NAME[,NAME...]
+  comment PROJECT TASKS TEXT
+TASKS is a task ID, '*' for every task, or status:S, priority:P or assignee:NAME.
+TIME is "YYYY-MM-DD HH:MM:SS"."""
+
+
+def authenticate(username, password):
+    # The user when the credentials are right and the account is active, otherwise None
+    if not get_storage().user_exists(username):
+        return None
+    user = User(**User.load_user_data(username))
+    if not user.active or not hasher.verify(password, user.password):
+        return None
+    return user
+
+
+class BatchSession:
+    """
+    Applies text commands (see USAGE) for one authenticated user through
+    the same Project and Task code as the menus, without any prompt or
+    screen. Each project is opened once and kept in a Project.batch()
+    until the session closes, so its changes reach storage in one flush
+    every 'flush_every' commands (and at the end) instead of one save per
+    change. Permissions are the menus': only the owner creates tasks and
+    (un)assigns members, assignees may change status and priority and
+    comment on their own tasks.
+    """
+
+    def __init__(self, user, flush_every=FLUSH_EVERY):
+        self.user = user
+        self.flush_every = flush_every
+        self.projects = {}
+        self._stack = ExitStack()
+        self._pending = 0
+        self.applied = 0
+        self.failed = []
+        # saves that failed (not commands: they already ran in memory)
+        self.save_errors = []
+        self.output = []
+        self.commands = {"create": self.create, "status": self.set_status, "priority": self.set_priority,
+                         "assign": self.assign, "unassign": self.unassign, "comment": self.comment}
+        # checked before a command runs, so a TypeError inside one is a bug, not a usage error
+        self._signatures = {name: inspect.signature(command) for name, command in self.commands.items()}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        # Saves what is left and forgets the open projects
+        try:
+            self._stack.close()
+        finally:
+            self.projects = {}
+
+    def flush(self):
+        for project in self.projects.values():
+            project.flush()
+        self._pending = 0
+
+    def project(self, ID):
+        project = self.projects.get(ID)
+        if project is None:
+            try:
+                project = Project.open(ID)
+            except FileNotFoundError:
+                raise ValueError(f"No such project: {ID}")
+            if self.user.ID not in project.collaborators:
+                raise ValueError(f"You are not a member of project {ID}")
+            self._stack.enter_context(project.batch())
+            self.projects[ID] = project
+        return project
+
+    def member(self, project, username):
+        ID = get_ID(username)
+        if ID is None or ID not in project.collaborators:
+            raise ValueError(f"{username} is not a member of project {project.ID}")
+        return ID
+
+    def tasks(self, project, selector):
+        # The tasks a command applies to: an ID, '*', or status:/priority:/assignee: through the task index
+        if selector == "*":
+            return list(project.tasks.values())
+        kind, _, value = selector.partition(":")
+        if kind == "status" and value:
+            return list(project.index.by_status(Status(value.upper())))
+        if kind == "priority" and value:
+            return list(project.index.by_priority(Priority(value.upper())))
+        if kind == "assignee" and value:
+            return list(project.index.by_assignee(self.member(project, value)))
+        if selector not in project.tasks:
+            raise ValueError(f"No task {selector} in project {project.ID}")
+        return [project.tasks[selector]]
+
+    def _owner_only(self, project, action):
+        if project.owner != self.user.ID:
+            raise ValueError(f"Only the project owner can {action}.")
+
+    def _editable(self, project, selector):
+        # The owner edits every selected task, an assignee only their own (naming another task is an error)
+        tasks = self.tasks(project, selector)
+        if project.owner == self.user.ID:
+            return tasks
+        mine = [task for task in tasks if self.user.ID in task.assignees]
+        if selector in project.tasks and not mine:
+            raise ValueError(f"You don't have access to modify task {selector}.")
+        return mine
+
+    # commands: each returns the number of tasks it changed
+
+    def create(self, project_id, title, *options):
+        project = self.project(project_id)
+        self._owner_only(project, "create tasks")
+        fields = {}
+        for option in options:
+            key, sep, value = option.partition("=")
+            if not sep or key not in ("description", "priority", "status", "start", "end", "assignees"):
+                raise ValueError(f"Unknown option: {option}")
+            fields[key] = value
+        assignees = [self.member(project, name) for name in fields.get("assignees", "").split(",") if name]
+        task = Task(title, fields.get("description", ""), priority=fields.get("priority", "LOW").upper(),
+                    status=fields.get("status", "BACKLOG").upper(), start_time=fields.get("start"),
+                    end_time=fields.get("end"), assignees=assignees)
+        if task.end <= task.start:
+            raise ValueError("The end time must be after the start time.")
+        project.save_task(task)
+        self.output.append(f"created {project.ID} {task.ID}")
+        logger.debug("A new task [name : %s , id : [%s]] created by [%s]", task.title, task.ID, self.user.username,
+                     extra={"user": self.user.ID, "project": project.ID, "task": task.ID, "action": "create task"})
+        return 1
+
+    def set_status(self, project_id, selector, status):
+        project = self.project(project_id)
+        status = Status(status.upper())
+        changed = 0
+        for task in self._editable(project, selector):
+            if task.status != status:
+                task.status = status
+                task.add_to_history(self.user.ID, action="change status", new_amount=status.value)
+                project.save_task(task)
+                changed += 1
+        return changed
+
+    def set_priority(self, project_id, selector, priority):
+        project = self.project(project_id)
+        priority = Priority(priority.upper())
+        changed = 0
+        for task in self._editable(project, selector):
+            if task.priority != priority:
+                task.priority = priority
+                task.add_to_history(self.user.ID, action="change priority", new_amount=priority.value)
+                project.save_task(task)
+                changed += 1
+        return changed
+
+    def assign(self, project_id, selector, usernames):
+        project = self.project(project_id)
+        self._owner_only(project, "assign members")
+        members = [self.member(project, name) for name in usernames.split(",") if name]
+        changed = 0
+        for task in self.tasks(project, selector):
+            added = [member for member in members if member not in task.assignees]
+            if added:
+                task.assignees.extend(added)
+                task.add_to_history(self.user.ID, action="add assignee", members=added)
+                project.save_task(task)
+                changed += 1
+        return changed
+
+    def unassign(self, project_id, selector, usernames):
+        project = self.project(project_id)
+        self._owner_only(project, "remove assignees")
+        members = {self.member(project, name) for name in usernames.split(",") if name}
+        changed = 0
+        for task in self.tasks(project, selector):
+            removed = [member for member in task.assignees if member in members]
+            if removed:
+                task.assignees = [member for member in task.assignees if member not in members]
+                task.add_to_history(self.user.ID, action="remove assignee", members=removed)
+                project.save_task(task)
+                changed += 1
+        return changed
+
+    def comment(self, project_id, selector, text):
+        project = self.project(project_id)
+        is_owner = project.owner == self.user.ID
+        tasks = self._editable(project, selector)
+        for task in tasks:
+            comment = {"user": self.user.ID, "comment": text, "role": "owner" if is_owner else "assignee",
+                       "timestamp": str(datetime.now())[:19]}
+            task.comments.append(comment)
+            task.add_to_history(self.user.ID, action="add comment", message=comment)
+            project.save_task(task)
+        return len(tasks)
+
+    def execute(self, line):
+        # Runs one command line in memory; returns the number of tasks changed (None for a blank line
+        # or comment). Saving is up to flush() and close().
+        # most generated lines have nothing to unquote: skip shlex for them
+        if any(char in line for char in "'\"#\\"):
+            words = shlex.split(line, comments=True)
+        else:
+            words = line.split()
+        if not words:
+            return None
+        name, args = words[0].lower(), words[1:]
+        command = self.commands.get(name)
+        if command is None:
+            raise ValueError(f"Unknown command: {name}")
+        try:
+            self._signatures[name].bind(*args)
+        except TypeError:
+            raise ValueError(f"Wrong arguments for '{name}'")
+        changed = command(*args)
+        self.applied += 1
+        self._pending += 1
+        return changed
+
+    def _save(self, save):
+        # Runs flush or close; a failed save is reported on its own, not as the failure of a command line
+        try:
+            save()
+        except (ValueError, OSError) as e:
+            self.save_errors.append(str(e))
+            return False
+        return True
+
+    def run(self, lines, stop_on_error=False):
+        """
+        Execute every line and return the report: commands applied and
+        failed ((line number, line, error) each), saves that failed, tasks
+        changed, seconds and commands per second. A command that fails
+        changes nothing and does not stop the others unless
+        'stop_on_error'. A failed save (in 'save_errors') stops the run:
+        the commands applied since the last save may not have reached
+        storage.
+        """
+        start = time.perf_counter()
+        changed = 0
+        for number, line in enumerate(lines, start=1):
+            try:
+                result = self.execute(line)
+            except (ValueError, FileNotFoundError) as e:
+                self.failed.append((number, line.rstrip("\n"), str(e)))
+                if stop_on_error:
+                    break
+                continue
+            changed += result or 0
+            if self._pending >= self.flush_every and not self._save(self.flush):
+                break
+        self._save(self.close)
+        seconds = time.perf_counter() - start
+        report = {"applied": self.applied, "failed": len(self.failed), "save_errors": len(self.save_errors),
+                  "tasks_changed": changed, "seconds": round(seconds, 3), "per_second": round(self.applied / seconds) if seconds else 0}
+        logger.info("Batch of user [%s]: %s", self.user.username, report, extra={"user": self.user.ID, "action": "batch"})
+        return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python batch.py", description="Apply task commands without the menus",
+                                     epilog=USAGE, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("file", nargs="?", default="-", help="Command file (default: standard input)")
+    parser.add_argument("--username", required=True, help="User to run the commands as")
+    parser.add_argument("--password-env", default="TRELLOMIZE_PASSWORD", metavar="VAR",
+                        help="Environment variable holding the password (asked on the terminal when unset)")
+    parser.add_argument("--flush-every", type=int, default=FLUSH_EVERY, help="Commands applied between two saves")
+    parser.add_argument("--stop-on-error", action="store_true", help="Stop at the first failed command")
+    args = parser.parse_args(argv)
+
+    password = os.environ.get(args.password_env)
+    if password is None:
+        import getpass
+        password = getpass.getpass("Password: ")
+    user = authenticate(args.username, password)
+    if user is None:
+        print("Incorrect username or password, or inactive account.", file=sys.stderr)
+        return 2
+    logger.info("User [%s] started a batch", user.username, extra={"user": user.ID, "action": "login"})
+
+    session = BatchSession(user, max(1, args.flush_every))
+    file = sys.stdin if args.file == "-" else open(args.file, "r", encoding="utf-8")
+    try:
+        report = session.run(file, args.stop_on_error)
+    finally:
+        if file is not sys.stdin:
+            file.close()
+    for line in session.output:
+        print(line)
+    for number, line, error in session.failed:
+        print(f"line {number}: {error}: {line}", file=sys.stderr)
+    for error in session.save_errors:
+        print(f"save failed: {error}", file=sys.stderr)
+    print(f"{report['applied']} command(s) applied, {report['failed']} failed, {report['tasks_changed']} task change(s) "
+          f"in {report['seconds']:.2f}s ({report['per_second']} commands/s)", file=sys.stderr)
+    return 1 if session.failed or session.save_errors else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
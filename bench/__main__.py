@@ -0,0 +1,56 @@
+import argparse
+import json
+
+from bench.generate import BACKENDS, generate
+from bench.harness import TOLERANCE, Harness, compare, format_report
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Synthetic data and benchmarks")
+    subparsers = parser.add_subparsers(title="subcommands", dest="subcommand", required=True)
+
+    generate_parser = subparsers.add_parser("generate", help="Write a synthetic data set")
+    generate_parser.add_argument("root", help="Folder to write the data set to")
+    generate_parser.add_argument("--backend", choices=BACKENDS, default="json", help="Storage layout")
+    generate_parser.add_argument("--users", type=int, default=1000)
+    generate_parser.add_argument("--projects", type=int, default=500)
+    generate_parser.add_argument("--tasks", type=int, default=5000)
+    generate_parser.add_argument("--members", type=int, default=6, help="Most collaborators per project besides the owner")
+    generate_parser.add_argument("--seed", type=int, default=0)
+
+    run_parser = subparsers.add_parser("run", help="Benchmark a generated data set")
+    run_parser.add_argument("root", help="Folder written by 'generate'")
+    run_parser.add_argument("--iterations", type=int, default=20)
+    run_parser.add_argument("--only", nargs="+", metavar="OPERATION", help="Operations to run (default: all)")
+    run_parser.add_argument("--output", help="Write the report as JSON to this file")
+    run_parser.add_argument("--baseline", help="Compare against a report saved with --output")
+    run_parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="Allowed relative slowdown")
+
+    args = parser.parse_args()
+    if args.subcommand == "generate":
+        manifest = generate(args.root, args.backend, args.users, args.projects, args.tasks, args.members, args.seed)
+        print(f"Generated {manifest['users']} users, {manifest['projects']} projects and {manifest['tasks']} tasks in {args.root}")
+        return 0
+
+    harness = Harness(args.root, args.iterations)
+    report = harness.run(args.only, progress=lambda name: print(f"running {name}...", flush=True))
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    print(format_report(report, baseline))
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=4)
+    if baseline is not None:
+        regressions = compare(report, baseline, args.tolerance)
+        for name, metric, old, new in regressions:
+            print(f"REGRESSION {name} {metric}: {old} -> {new}")
+        if regressions:
+            return 1
+        print("No regressions against the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
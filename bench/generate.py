@@ -0,0 +1,132 @@
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+import bcrypt
+
+from storage import JSONStorage, SQLiteStorage
+
+# Password of every generated user, stored as one bcrypt hash at the lowest cost
+# with a fixed salt so the generated files are identical from run to run
+PASSWORD = "Bench#12345"
+_SALT = b"$2b$04$benchmarkbenchmarkbene"
+MANIFEST = "bench_manifest.json"
+# Data layouts a benchmark can run against
+BACKENDS = ("json", "split", "sqlite")
+
+WORDS = ("login", "page", "design", "api", "database", "migration", "report", "export", "invoice", "search",
+         "cache", "deploy", "release", "review", "onboarding", "billing", "email", "dashboard", "mobile", "sync",
+         "backup", "audit", "profile", "settings", "upload", "import", "metrics", "alert", "payment", "theme")
+STATUSES = (("BACKLOG", 2), ("TODO", 3), ("DOING", 2), ("DONE", 3), ("ARCHIVED", 1))
+PRIORITIES = (("CRITICAL", 1), ("HIGH", 2), ("MEDIUM", 4), ("LOW", 3))
+BASE_TIME = datetime(2024, 1, 1, 9, 0, 0)
+
+
+def _pick(rng, weighted):
+    values, weights = zip(*weighted)
+    return rng.choices(values, weights)[0]
+
+
+def _sentence(rng, low, high):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high))).capitalize()
+
+
+def _stamp(moment):
+    return moment.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _task(rng, task_id, members):
+    start = BASE_TIME + timedelta(hours=rng.randint(0, 24 * 365))
+    comments = []
+    for _ in range(rng.choices((0, 1, 2, 3), (4, 3, 2, 1))[0]):
+        author = rng.choice(members)
+        comments.append({"user": author, "comment": _sentence(rng, 3, 12),
+                         "role": "owner" if author == members[0] else "assignee",
+                         "timestamp": _stamp(start + timedelta(minutes=rng.randint(1, 10000)))})
+    return {"title": _sentence(rng, 2, 5), "description": _sentence(rng, 5, 25),
+            "priority": _pick(rng, PRIORITIES), "status": _pick(rng, STATUSES), "ID": task_id,
+            "start_time": _stamp(start), "end_time": _stamp(start + timedelta(hours=rng.randint(1, 24 * 30))),
+            "assignees": rng.sample(members, rng.choices((0, 1, 2, 3), (1, 5, 3, 1))[0] if len(members) > 2 else 1),
+            "comments": comments, "history": []}
+
+
+def _history(rng, task, owner):
+    # A few edits per task in the project's history log
+    entries = []
+    moment = datetime.strptime(task["start_time"], "%Y-%m-%d %H:%M:%S")
+    for _ in range(rng.randint(0, 6)):
+        moment += timedelta(minutes=rng.randint(1, 3000))
+        action = rng.choice(("change status", "change priority", "change title", "add comment"))
+        key = {"change status": "new status", "change priority": "new priority",
+               "change title": "new title", "add comment": "message"}[action]
+        value = {"change status": lambda: _pick(rng, STATUSES), "change priority": lambda: _pick(rng, PRIORITIES),
+                 "change title": lambda: task["title"], "add comment": lambda: _sentence(rng, 3, 8)}[action]()
+        entries.append({"user": task["assignees"][0] if task["assignees"] else owner, "action": action,
+                        key: value, "timestamp": _stamp(moment)})
+    return entries
+
+
+def open_backend(root, kind="json", durability=None):
+    # Storage backend for a generated tree in 'root'
+    if kind == "sqlite":
+        return SQLiteStorage(os.path.join(root, "trellomize.db"), durability=durability)
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown backend: {kind} (expected one of {', '.join(BACKENDS)})")
+    return JSONStorage(root, split_tasks=kind == "split", durability=durability)
+
+
+def generate(root, kind="json", users=1000, projects=500, tasks=5000, members=6, seed=0):
+    """
+    Write a deterministic data set into 'root' with the 'kind' backend:
+    'users' users in the registry, 'projects' projects with 1..'members'
+    collaborators besides the owner, and 'tasks' tasks spread unevenly
+    over them with comments, assignees and history. The same arguments
+    always produce the same data. Returns the manifest saved in 'root'.
+    """
+    os.makedirs(root, exist_ok=True)
+    # generated data can simply be generated again: skip the fsyncs
+    backend = open_backend(root, kind, durability="none")
+    rng = random.Random(seed)
+    password = bcrypt.hashpw(PASSWORD.encode("utf-8"), _SALT).decode("utf-8")
+    registry = {"emails": [], "usernames": {}}
+    user_ids = []
+    for i in range(users):
+        ID = f"{rng.getrandbits(32):08x}"
+        username = f"user{i:05d}"
+        email = f"{username}@example.com"
+        registry["emails"].append(email)
+        registry["usernames"][ID] = username
+        user_ids.append(ID)
+        backend.save_user({"email": email, "username": username, "password": password,
+                           "active": rng.random() > 0.05, "ID": ID})
+    backend.save_registry(registry)
+
+    # a few large projects and many small ones, like real boards
+    weights = [rng.paretovariate(1.5) for _ in range(projects)]
+    counts = [0] * projects
+    for index in rng.choices(range(projects), weights, k=tasks):
+        counts[index] += 1
+    task_number = 0
+    for p, count in enumerate(counts):
+        ID = f"p{p:05d}{rng.getrandbits(16):04x}"
+        collaborators = rng.sample(user_ids, min(users, rng.randint(2, members + 1)))
+        project_tasks = {}
+        for _ in range(count):
+            task_id = f"t{task_number:07d}"
+            task_number += 1
+            project_tasks[task_id] = _task(rng, task_id, collaborators)
+        backend.save_project({"title": _sentence(rng, 1, 3), "owner": collaborators[0],
+                              "collaborators": collaborators, "ID": ID, "tasks": project_tasks})
+        for task_id, task in project_tasks.items():
+            entries = _history(rng, task, collaborators[0])
+            if entries:
+                backend.append_history(ID, task_id, entries)
+        for member in collaborators:
+            backend.add_user_project(registry["usernames"][member], ID)
+
+    manifest = {"backend": kind, "seed": seed, "users": users, "projects": projects, "tasks": tasks,
+                "members": members, "password": PASSWORD}
+    with open(os.path.join(root, MANIFEST), "w") as file:
+        json.dump(manifest, file, indent=4)
+    return manifest
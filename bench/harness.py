@@ -0,0 +1,283 @@
+import io
+import json
+import os
+import random
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import ExitStack, contextmanager
+from unittest.mock import patch
+
+import storage
+from bench.generate import MANIFEST, open_backend
+from passwords import hasher
+
+# Relative slowdown (and growth of peak memory) tolerated by compare()
+TOLERANCE = 0.25
+# Differences below this many milliseconds are noise, whatever the ratio
+NOISE_FLOOR_MS = 0.5
+
+_io = threading.local()
+
+
+def _audit(event, args):
+    # Counts files opened for reading or writing while an operation runs
+    counts = getattr(_io, "counts", None)
+    if counts is None or event != "open":
+        return
+    path, mode, flags = args
+    if mode is not None:
+        writing = any(flag in mode for flag in "wax+")
+    else:
+        writing = bool(flags & (os.O_WRONLY | os.O_RDWR))
+    counts["writes" if writing else "reads"] += 1
+
+
+_audit_installed = False
+
+
+@contextmanager
+def count_io():
+    global _audit_installed
+    if not _audit_installed:
+        sys.addaudithook(_audit)
+        _audit_installed = True
+    _io.counts = counts = {"reads": 0, "writes": 0}
+    try:
+        yield counts
+    finally:
+        _io.counts = None
+
+
+def percentile(samples, fraction):
+    # Nearest-rank percentile of a list of numbers
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+@contextmanager
+def quiet_ui(answers):
+    # Runs the interactive views without a terminal: output goes nowhere, prompts get 'answers'
+    import main
+    from rich.console import Console
+    from rich.theme import Theme
+    from terminal import STYLES
+    answers = iter(answers)
+    with ExitStack() as stack:
+        stack.enter_context(patch.object(main, "console", Console(file=io.StringIO(), theme=Theme(STYLES), width=160)))
+        stack.enter_context(patch.object(main, "clear_screen", lambda: None))
+        stack.enter_context(patch.object(main, "wait_for_key_press", lambda: None))
+        stack.enter_context(patch("builtins.input", lambda prompt="": next(answers, "")))
+        stack.enter_context(patch("pwinput.pwinput", lambda prompt="", mask="*": next(answers, "")))
+        yield
+
+
+class Harness:
+    """
+    Times the main storage and view paths against a generated tree
+    (see bench.generate) without a terminal. Every operation runs
+    'iterations' times on targets drawn with a fixed seed; the report
+    has latency percentiles, files opened for reading and writing per
+    call, and the peak memory allocated by one call (tracemalloc, in a
+    separate untimed run). Operations that write (save, register) change
+    the tree, so benchmark a freshly generated one for comparable runs.
+    """
+
+    def __init__(self, root, iterations=20, seed=0):
+        self.root = os.path.abspath(root)
+        with open(os.path.join(self.root, MANIFEST)) as file:
+            self.manifest = json.load(file)
+        self.iterations = iterations
+        self.rng = random.Random(seed)
+        self.backend = open_backend(self.root, self.manifest["backend"])
+        self.usernames = list(self.backend.load_registry()["usernames"].values())
+        self.project_ids = sorted(self.backend.project_ids())
+
+    def operations(self):
+        # name -> function preparing one call (untimed) and returning the call to time
+        return {
+            "load_project_data": self._load_project,
+            "open_project": self._open_project,
+            "save_project_data": self._save_project,
+            "view_user_projects": self._view_user_projects,
+            "view_user_tasks": self._view_user_tasks,
+            "view_history": self._view_history,
+            "search": self._search,
+            "register": self._register,
+            "login": self._login,
+        }
+
+    # preparations: each returns the call to time
+
+    def _load_project(self):
+        from main import Project
+        ID = self.rng.choice(self.project_ids)
+        return lambda: Project.load_project_data(ID)
+
+    def _open_project(self):
+        from main import Project
+        ID = self.rng.choice(self.project_ids)
+        return lambda: Project.open(ID)
+
+    def _save_project(self):
+        from main import Project
+        project = Project.open(self.rng.choice(self.project_ids))
+        if project.tasks:
+            task = project.tasks[self.rng.choice(list(project.tasks))]
+            task.title = f"{task.title} (edited)"
+        return project.save_project_data
+
+    def _user(self):
+        from main import User
+        return User(**self.backend.load_user(self.rng.choice(self.usernames)))
+
+    def _view_user_projects(self):
+        from main import Project
+        user = self._user()
+
+        def call():
+            with quiet_ui([""]):
+                Project.view_user_projects(user)
+        return call
+
+    def _view_user_tasks(self):
+        from main import Project
+        user = self._user()
+
+        def call():
+            with quiet_ui(["6"]):
+                Project.view_user_tasks(user)
+        return call
+
+    def _view_history(self):
+        from main import Project
+        project = Project.open(self.rng.choice(self.project_ids))
+        if not project.tasks:
+            return lambda: None
+        task = project.tasks[self.rng.choice(list(project.tasks))]
+
+        def call():
+            with quiet_ui([]):
+                task.view_history(project.ID)
+        return call
+
+    def _search(self):
+        from bench.generate import WORDS
+        from search import get_search_index
+        query = self.rng.choice(WORDS)
+        index = get_search_index(self.backend)
+        index.ensure_built()
+        return lambda: index.search(query)
+
+    def _register(self):
+        from main import User
+        username = f"bench_{self.rng.getrandbits(40):010x}"
+        answers = [f"{username}@example.com", username, self.manifest["password"]]
+
+        def call():
+            with quiet_ui(answers):
+                User.register()
+        return call
+
+    def _login(self):
+        from main import User
+        answers = [self.rng.choice(self.usernames), self.manifest["password"]]
+
+        def call():
+            with quiet_ui(answers):
+                User.login()
+        return call
+
+    def run(self, names=None, progress=None):
+        """
+        Run the named operations (all by default) and return the report:
+        {"meta": {...}, "operations": {name: {"p50_ms", "p95_ms",
+        "p99_ms", "max_ms", "reads", "writes", "peak_kb"}}}
+        """
+        from logsetup import shutdown as shutdown_logging
+        operations = self.operations()
+        names = names or list(operations)
+        report = {"meta": dict(self.manifest, iterations=self.iterations), "operations": {}}
+        previous = storage._storage
+        storage.set_storage(self.backend)
+        # log records and bcrypt cost of this run stay out of the caller's setup
+        env = {"TRELLOMIZE_LOG_FILE": os.path.join(self.root, "bench.log"),
+               "TRELLOMIZE_BCRYPT_ROUNDS": os.environ.get("TRELLOMIZE_BCRYPT_ROUNDS", "4")}
+        try:
+            # the shared hasher keeps the cost it read first: pin it to this run's
+            with patch.dict(os.environ, env), \
+                    patch.object(hasher, "_rounds", int(env["TRELLOMIZE_BCRYPT_ROUNDS"])):
+                shutdown_logging()
+                for name in names:
+                    if progress is not None:
+                        progress(name)
+                    report["operations"][name] = self._measure(operations[name])
+                shutdown_logging()
+        finally:
+            storage.set_storage(previous)
+        return report
+
+    def _measure(self, prepare):
+        # warm-up call (caches, indexes built on first use), then timed calls, then one traced call
+        prepare()()
+        timings, reads, writes = [], 0, 0
+        for _ in range(self.iterations):
+            call = prepare()
+            with count_io() as counts:
+                start = time.perf_counter()
+                call()
+                timings.append((time.perf_counter() - start) * 1000)
+            reads += counts["reads"]
+            writes += counts["writes"]
+        call = prepare()
+        tracemalloc.start()
+        try:
+            call()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        return {"p50_ms": round(percentile(timings, 0.50), 3), "p95_ms": round(percentile(timings, 0.95), 3),
+                "p99_ms": round(percentile(timings, 0.99), 3), "max_ms": round(max(timings), 3),
+                "reads": round(reads / self.iterations, 2), "writes": round(writes / self.iterations, 2),
+                "peak_kb": round(peak / 1024, 1)}
+
+
+def compare(report, baseline, tolerance=TOLERANCE):
+    """
+    Regressions of 'report' against 'baseline' as (operation, metric,
+    baseline value, new value): latencies or peak memory more than
+    'tolerance' higher (and at least NOISE_FLOOR_MS for latencies), or
+    more files read or written per call.
+    """
+    regressions = []
+    for name, new in report["operations"].items():
+        old = baseline["operations"].get(name)
+        if old is None:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            if new[metric] > old[metric] * (1 + tolerance) and new[metric] - old[metric] >= NOISE_FLOOR_MS:
+                regressions.append((name, metric, old[metric], new[metric]))
+        for metric in ("reads", "writes"):
+            if new[metric] > old[metric]:
+                regressions.append((name, metric, old[metric], new[metric]))
+        if new["peak_kb"] > old["peak_kb"] * (1 + tolerance):
+            regressions.append((name, "peak_kb", old["peak_kb"], new["peak_kb"]))
+    return regressions
+
+
+def format_report(report, baseline=None):
+    # Plain-text table of a report, with the baseline's p50 next to each operation when given
+    meta = report["meta"]
+    lines = [f"{meta['backend']} backend, {meta['users']} users, {meta['projects']} projects, "
+             f"{meta['tasks']} tasks, {meta['iterations']} iterations",
+             f"{'operation':<20}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+             f"{'reads':>8}{'writes':>8}{'peak KB':>10}" + (f"{'base p50':>10}" if baseline else "")]
+    for name, result in report["operations"].items():
+        line = (f"{name:<20}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+                f"{result['max_ms']:>10.2f}{result['reads']:>8.1f}{result['writes']:>8.1f}{result['peak_kb']:>10.1f}")
+        if baseline:
+            old = baseline["operations"].get(name)
+            line += f"{old['p50_ms']:>10.2f}" if old else f"{'-':>10}"
+        lines.append(line)
+    return "\n".join(lines)
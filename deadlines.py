@@ -0,0 +1,133 @@
+import json
+from datetime import datetime, timedelta
+
+from indexdb import DerivedIndex
+
+# Tasks in these states have no pending deadline
+CLOSED_STATUSES = ("DONE", "ARCHIVED")
+
+
+def deadline(task):
+    # The parts of a stored task the deadline index covers; None for closed tasks
+    if task["status"] in CLOSED_STATUSES:
+        return None
+    return (task["title"], task["status"], task["priority"], task["end_time"], list(task["assignees"]))
+
+
+def _timestamp(value):
+    # Parsed once when the task is indexed: "YYYY-MM-DD HH:MM:SS" -> epoch seconds
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(value[:19])
+    return int(value.timestamp())
+
+
+class DeadlineIndex(DerivedIndex):
+    """
+    End times of every open task (not DONE or ARCHIVED) across all
+    projects, kept in its own SQLite file (Storage.index_path("deadlines")).
+    End times are stored as epoch seconds and deadlines is indexed by due
+    time, so "overdue" and "due in the next N hours" are B-tree range scans.
+    deadline_assignees is ordered by (user, due), which makes the per-user
+    queries (and the check on login) a range scan of that user's tasks
+    only, however many projects there are.
+
+    Project.flush sends the tasks whose title, status, priority, end time
+    or assignees changed; a task leaves the index when it is closed or
+    deleted.
+    """
+
+    NAME = "deadlines"
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS deadlines (
+            project_id TEXT NOT NULL,
+            task_id TEXT NOT NULL,
+            title TEXT NOT NULL,
+            status TEXT NOT NULL,
+            priority TEXT NOT NULL,
+            due INTEGER NOT NULL,
+            PRIMARY KEY (project_id, task_id)
+        );
+        CREATE INDEX IF NOT EXISTS deadlines_due ON deadlines(due);
+        CREATE TABLE IF NOT EXISTS deadline_assignees (
+            user_id TEXT NOT NULL,
+            due INTEGER NOT NULL,
+            project_id TEXT NOT NULL,
+            task_id TEXT NOT NULL,
+            PRIMARY KEY (user_id, due, project_id, task_id)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS deadline_assignees_task ON deadline_assignees(project_id, task_id);
+    """
+    TABLES = ("deadline_assignees", "deadlines")
+
+    entry = staticmethod(deadline)
+
+    def _add(self, project_id, task_id, entry):
+        title, status, priority, end_time, assignees = entry
+        due = _timestamp(end_time)
+        self.conn.execute("INSERT INTO deadlines VALUES (?, ?, ?, ?, ?, ?)",
+                          (project_id, task_id, title, status, priority, due))
+        self.conn.executemany("INSERT OR IGNORE INTO deadline_assignees VALUES (?, ?, ?, ?)",
+                              [(user, due, project_id, task_id) for user in assignees])
+
+    def _query(self, select, start, end, user_ID, project_ids):
+        conditions, params = [], []
+        if user_ID is not None:
+            sql = f"SELECT {select} FROM deadline_assignees a JOIN deadlines d USING (project_id, task_id) "
+            conditions.append("a.user_id = ?")
+            params.append(user_ID)
+            column = "a.due"
+        else:
+            sql = f"SELECT {select} FROM deadlines d "
+            column = "d.due"
+        if start is not None:
+            conditions.append(f"{column} >= ?")
+            params.append(_timestamp(start))
+        if end is not None:
+            conditions.append(f"{column} < ?")
+            params.append(_timestamp(end))
+        if project_ids is not None:
+            conditions.append("d.project_id IN (SELECT value FROM json_each(?))")
+            params.append(json.dumps(list(project_ids)))
+        if conditions:
+            sql += "WHERE " + " AND ".join(conditions) + " "
+        return sql, params
+
+    def due_between(self, start=None, end=None, user_ID=None, project_ids=None, limit=None):
+        """
+        Open tasks due in [start, end) (either bound may be None), soonest
+        first, as dicts with "project", "task", "title", "status",
+        "priority" and "end_time" (a datetime). 'user_ID' keeps the tasks
+        assigned to that user, 'project_ids' the tasks of those projects.
+        """
+        self.ensure_built()
+        sql, params = self._query("d.project_id, d.task_id, d.title, d.status, d.priority, d.due",
+                                  start, end, user_ID, project_ids)
+        sql += "ORDER BY d.due, d.project_id, d.task_id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        return [{"project": project_id, "task": task_id, "title": title, "status": status,
+                 "priority": priority, "end_time": datetime.fromtimestamp(due)}
+                for project_id, task_id, title, status, priority, due in rows]
+
+    def overdue(self, now=None, **filters):
+        return self.due_between(end=now or datetime.now(), **filters)
+
+    def due_within(self, hours, now=None, **filters):
+        now = now or datetime.now()
+        return self.due_between(now, now + timedelta(hours=hours), **filters)
+
+    def counts(self, user_ID, hours=24, now=None):
+        # (overdue, due within 'hours') for one user: two index range counts, for the login notice
+        self.ensure_built()
+        now = now or datetime.now()
+        with self._lock:
+            overdue = self.conn.execute(*self._query("COUNT(*)", None, now, user_ID, None)).fetchone()[0]
+            soon = self.conn.execute(*self._query("COUNT(*)", now, now + timedelta(hours=hours), user_ID, None)).fetchone()[0]
+        return overdue, soon
+
+
+def get_deadline_index(storage):
+    return DeadlineIndex.for_storage(storage)
@@ -0,0 +1,225 @@
+import json
+import marshal
+import os
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Durability levels for atomic_write:
+#   none - write to a temp file and rename it over the target (no fsync)
+#   file - also fsync the temp file before the rename
+#   dir  - also fsync the directory after the rename so the rename itself survives a crash
+DURABILITY_LEVELS = ("none", "file", "dir")
+
+# Files created through mkstemp are private (0600); give them the mode open() would have used
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def get_durability():
+    # Durability level chosen with TRELLOMIZE_DURABILITY (default: file)
+    level = os.environ.get("TRELLOMIZE_DURABILITY", "file").lower()
+    if level not in DURABILITY_LEVELS:
+        raise ValueError(f"Unknown durability level: {level} (expected one of {', '.join(DURABILITY_LEVELS)})")
+    return level
+
+
+def fsync_directory(path):
+    # Directories cannot be opened for fsync on Windows
+    if os.name == 'nt':
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path, data, durability=None):
+    """
+    Replace 'path' with 'data' (str or bytes) so that readers only ever
+    see the old or the new content, never a truncated file.
+    """
+    durability = durability if durability is not None else get_durability()
+    folder = os.path.dirname(path) or "."
+    try:
+        mode = os.stat(path).st_mode & 0o777
+    except FileNotFoundError:
+        mode = 0o666 & ~_UMASK
+
+    fd, temp_path = tempfile.mkstemp(dir=folder, prefix=f".{os.path.basename(path)}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data.encode("utf-8") if isinstance(data, str) else data)
+            file.flush()
+            if durability != "none":
+                os.fsync(file.fileno())
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    if durability == "dir":
+        fsync_directory(folder)
+
+
+def append_lines(path, lines, durability=None):
+    # Append-only writes; a crash can at most leave a torn last line that readers skip
+    durability = durability if durability is not None else get_durability()
+    with open(path, "a") as file:
+        file.write("".join(lines))
+        file.flush()
+        if durability != "none":
+            os.fsync(file.fileno())
+
+
+# Codecs for stored data, chosen with TRELLOMIZE_CODEC (default: json):
+#   json    - compact JSON (orjson is used when it is installed)
+#   pretty  - JSON indented by 4 spaces, the original format
+#   marshal - Python's marshal format, the fastest to load
+#   msgpack - MessagePack (needs the msgpack package)
+# Binary formats start with a magic prefix, so decode() reads files written
+# with any codec and switching codecs keeps existing data readable.
+CODECS = ("json", "pretty", "marshal", "msgpack")
+_MAGIC = b"\x00TRZ"
+_MARSHAL_TAG = b"M"
+_MSGPACK_TAG = b"P"
+
+
+def get_codec():
+    codec = os.environ.get("TRELLOMIZE_CODEC", "json").lower()
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec: {codec} (expected one of {', '.join(CODECS)})")
+    if codec == "msgpack" and msgpack is None:
+        raise ValueError("The msgpack codec needs the msgpack package")
+    return codec
+
+
+def encode(data, codec=None):
+    # Serialize 'data' to bytes with the given codec
+    codec = codec if codec is not None else get_codec()
+    if codec == "json":
+        if orjson is not None:
+            return orjson.dumps(data)
+        return json.dumps(data, separators=(",", ":")).encode("utf-8")
+    if codec == "pretty":
+        return json.dumps(data, indent=4).encode("utf-8")
+    if codec == "marshal":
+        # version 4 is readable by every Python 3 the program supports
+        return _MAGIC + _MARSHAL_TAG + marshal.dumps(data, 4)
+    if codec == "msgpack":
+        return _MAGIC + _MSGPACK_TAG + msgpack.packb(data, use_bin_type=True)
+    raise ValueError(f"Unknown codec: {codec}")
+
+
+def decode(raw):
+    # Deserialize bytes written by encode() with any codec
+    if raw.startswith(_MAGIC):
+        tag, body = raw[len(_MAGIC):len(_MAGIC) + 1], raw[len(_MAGIC) + 1:]
+        if tag == _MARSHAL_TAG:
+            return marshal.loads(body)
+        if tag == _MSGPACK_TAG:
+            if msgpack is None:
+                raise ValueError("Data was stored with msgpack, which is not installed")
+            return msgpack.unpackb(body, raw=False)
+        raise ValueError(f"Unknown codec tag: {tag!r}")
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def read_data(path):
+    with open(path, "rb") as file:
+        return decode(file.read())
+
+
+def write_data(path, data, codec=None, durability=None):
+    atomic_write(path, encode(data, codec), durability)
+
+
+class FileLock:
+    """
+    Exclusive lock on a lock file, shared by every process on the host
+    (fcntl.flock on POSIX, msvcrt.locking on Windows). The lock is
+    reentrant for the thread holding it and blocks other threads of the
+    same process, so nested 'with' blocks on the same name are safe.
+    """
+
+    _locks = {}
+    _locks_guard = threading.Lock()
+
+    def __init__(self, path):
+        self.path = path
+        with FileLock._locks_guard:
+            # one shared state per path and process: [thread lock, depth, file]
+            self._state = FileLock._locks.setdefault(os.path.abspath(path), [threading.RLock(), 0, None])
+
+    def __enter__(self):
+        state = self._state
+        state[0].acquire()
+        if state[1] == 0:
+            try:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                file = open(self.path, "a+")
+                try:
+                    _lock_file(file)
+                except BaseException:
+                    file.close()
+                    raise
+            except BaseException:
+                state[0].release()
+                raise
+            state[2] = file
+        state[1] += 1
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        state = self._state
+        state[1] -= 1
+        if state[1] == 0:
+            file, state[2] = state[2], None
+            try:
+                _unlock_file(file)
+            finally:
+                file.close()
+        state[0].release()
+        return False
+
+
+def _lock_file(file):
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+    elif msvcrt is not None:
+        file.seek(0)
+        while True:
+            try:
+                msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                # LK_LOCK gives up after ~10 seconds; keep waiting like flock does
+                continue
+
+
+def _unlock_file(file):
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+    elif msvcrt is not None:
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
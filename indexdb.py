@@ -0,0 +1,121 @@
+import threading
+
+
+class DerivedIndex:
+    """
+    Base of the indexes derived from the stored projects (search.py,
+    deadlines.py). Each one lives in its own SQLite file next to the data
+    (Storage.index_path(NAME)) and only holds data that can be rebuilt
+    from the projects: if the file is missing it is built once from every
+    stored project, and from then on Project.flush sends the entries of
+    the tasks it saved.
+
+    Subclasses define NAME, SCHEMA, TABLES (emptied on rebuild), entry()
+    and _add(); _remove() and _remove_project() delete by (project_id,
+    task_id) from TABLES unless overridden. An index derived from other
+    records (userstatus.py) overrides _build() instead.
+    """
+
+    NAME = None
+    SCHEMA = ""
+    TABLES = ()
+
+    def __init__(self, path, storage):
+        self.path = path
+        self.storage = storage
+        self._lock = threading.RLock()
+        import sqlite3
+        # a rebuild in another session can hold the write lock for a while
+        self.conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        # derived data: it can always be rebuilt from the projects
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self.conn.executescript(self.SCHEMA)
+            self.conn.execute("INSERT OR IGNORE INTO meta VALUES ('built', 0)")
+
+    @staticmethod
+    def entry(task):
+        # The part of a stored task the index covers (None when the task is not indexed)
+        raise NotImplementedError
+
+    def _add(self, project_id, task_id, entry):
+        raise NotImplementedError
+
+    def _remove(self, project_id, task_id):
+        for table in self.TABLES:
+            self.conn.execute(f"DELETE FROM {table} WHERE project_id = ? AND task_id = ?", (project_id, task_id))
+
+    def _remove_project(self, project_id):
+        for table in self.TABLES:
+            self.conn.execute(f"DELETE FROM {table} WHERE project_id = ?", (project_id,))
+
+    def _clear(self):
+        for table in self.TABLES:
+            self.conn.execute(f"DELETE FROM {table}")
+
+    def _built(self):
+        return self.conn.execute("SELECT value FROM meta WHERE key = 'built'").fetchone()[0] == 1
+
+    def ensure_built(self):
+        # Indexes every stored project once (new index, or data written before the index existed)
+        with self._lock:
+            if self._built():
+                return
+            with self.storage.lock(self.NAME):
+                if self._built():
+                    return
+                with self.conn:
+                    self._clear()
+                    self._build()
+                    self.conn.execute("UPDATE meta SET value = 1 WHERE key = 'built'")
+
+    def _build(self):
+        # Fills the emptied TABLES from every stored project
+        for project_id in self.storage.project_ids():
+            for task_id, task in self.storage.load_project(project_id)["tasks"].items():
+                entry = self.entry(task)
+                if entry is not None:
+                    self._add(project_id, task_id, entry)
+
+    def update(self, project_id, entries):
+        # entries: {task ID: entry(task) or None when the task was deleted or is no longer indexed}
+        self.ensure_built()
+        with self._lock, self.conn:
+            for task_id, entry in entries.items():
+                self._remove(project_id, task_id)
+                if entry is not None:
+                    self._add(project_id, task_id, entry)
+
+    def remove_project(self, project_id):
+        self.ensure_built()
+        with self._lock, self.conn:
+            self._remove_project(project_id)
+
+    def invalidate(self):
+        # The data was replaced behind the index's back (manager import): rebuild it on next use
+        with self._lock, self.conn:
+            self.conn.execute("UPDATE meta SET value = 0 WHERE key = 'built'")
+
+    def clear(self):
+        # Empty index for an empty data store (manager purge)
+        with self._lock, self.conn:
+            self._clear()
+            self.conn.execute("UPDATE meta SET value = 1 WHERE key = 'built'")
+
+    @classmethod
+    def for_storage(cls, storage):
+        # One open index of each kind per storage backend (keyed by its index path)
+        path = storage.index_path(cls.NAME)
+        with _indexes_guard:
+            index = _indexes.get(path)
+            if index is None or index.storage is not storage:
+                if index is not None:
+                    index.conn.close()
+                index = _indexes[path] = cls(path, storage)
+            return index
+
+
+_indexes = {}
+_indexes_guard = threading.Lock()
@@ -0,0 +1,109 @@
+import json
+import logging
+import os
+import threading
+
+# Logging is configured with environment variables:
+#   TRELLOMIZE_LOG_FILE      - file the records go to (default: logs.jsonl; the plain-text
+#                              "logs.log" of earlier versions is left as it was)
+#   TRELLOMIZE_LOG_LEVEL     - DEBUG, INFO (default), WARNING or ERROR
+#   TRELLOMIZE_LOG_ROTATE    - size (default), hourly or daily
+#   TRELLOMIZE_LOG_MAX_BYTES - size a file may reach before it is rotated (default: 5 MB)
+#   TRELLOMIZE_LOG_BACKUPS   - rotated files to keep (default: 5)
+# Default log file
+LOG_FILE = "logs.jsonl"
+ROTATIONS = {"size": None, "hourly": "H", "daily": "midnight"}
+# Attributes passed with extra={...} that become keys of the JSON line
+EVENT_FIELDS = ("user", "project", "task", "action")
+
+
+class JSONFormatter(logging.Formatter):
+    # One JSON object per line: time, level, logger, message and the event fields that were given
+    def format(self, record):
+        entry = {"time": self.formatTime(record), "level": record.levelname, "logger": record.name,
+                 "message": record.getMessage()}
+        for field in EVENT_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class QueueWriter(logging.Handler):
+    """
+    Handler that only puts records on a queue; a background thread
+    (logging.handlers.QueueListener) formats them as JSON lines and
+    writes them to the rotating log file. The thread, the queue and the
+    file are set up by the first record that passes the logger's level,
+    so a program that logs nothing never opens the file.
+
+    Messages use %-style arguments, so a record below the level is never
+    formatted at all; arguments are merged into the message here, in the
+    caller's thread, because they may change after the call.
+    """
+
+    _queue = None
+    _listener = None
+    _guard = threading.Lock()
+
+    def emit(self, record):
+        try:
+            record.msg, record.args = record.getMessage(), None
+            if record.exc_info:
+                record.exc_text = logging.Formatter().formatException(record.exc_info)
+                record.exc_info = None
+            QueueWriter._pipeline().put_nowait(record)
+        except Exception:
+            self.handleError(record)
+
+    @staticmethod
+    def _pipeline():
+        with QueueWriter._guard:
+            if QueueWriter._listener is None:
+                import atexit
+                import queue
+                from logging.handlers import QueueListener
+                file_handler = _file_handler()
+                file_handler.setFormatter(JSONFormatter())
+                QueueWriter._queue = queue.SimpleQueue()
+                QueueWriter._listener = QueueListener(QueueWriter._queue, file_handler)
+                QueueWriter._listener.start()
+                atexit.register(shutdown)
+            return QueueWriter._queue
+
+
+def _file_handler():
+    from logging.handlers import RotatingFileHandler, TimedRotatingFileHandler
+    path = os.environ.get("TRELLOMIZE_LOG_FILE", LOG_FILE)
+    rotate = os.environ.get("TRELLOMIZE_LOG_ROTATE", "size").lower()
+    if rotate not in ROTATIONS:
+        raise ValueError(f"Unknown log rotation: {rotate} (expected one of {', '.join(ROTATIONS)})")
+    backups = int(os.environ.get("TRELLOMIZE_LOG_BACKUPS", 5))
+    if ROTATIONS[rotate] is None:
+        max_bytes = int(os.environ.get("TRELLOMIZE_LOG_MAX_BYTES", 5 * 1024 * 1024))
+        return RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True)
+    return TimedRotatingFileHandler(path, when=ROTATIONS[rotate], backupCount=backups, encoding="utf-8", delay=True)
+
+
+def get_logger(name):
+    # Logger writing through the shared queue at TRELLOMIZE_LOG_LEVEL
+    logger = logging.getLogger(name)
+    if not any(isinstance(handler, QueueWriter) for handler in logger.handlers):
+        logger.addHandler(QueueWriter())
+        logger.setLevel(os.environ.get("TRELLOMIZE_LOG_LEVEL", "INFO").upper())
+        logger.propagate = False
+    return logger
+
+
+def shutdown():
+    # Writes out every queued record and closes the file; the next record starts a new pipeline
+    with QueueWriter._guard:
+        listener, QueueWriter._listener = QueueWriter._listener, None
+    if listener is not None:
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
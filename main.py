@@ -1,89 +1,66 @@
+import hashlib
 import json
 import os
+import sys
 import uuid
-import bcrypt
 import re
-import logging
-import pwinput
-import platform
+import itertools
+import bisect
+from collections.abc import Mapping
+from contextlib import contextmanager
 from enum import Enum
-from datetime import datetime, timedelta
-from rich.console import Console
-from rich.table import Table
-from rich.theme import Theme
-
-# Custom theme for console output using the rich library
-CUSTOM_THEME = Theme({
-    "Title": "bold Magenta",
-    "Info": "blue",
-    "Notice": "bold green",
-    "Error": "bold red"
-})
-
-console = Console(theme=CUSTOM_THEME)
-
-# Setting up logger for logging errors and debug information
-logger = logging.getLogger("__main__")
-logger.setLevel(logging.DEBUG)
-handler = logging.FileHandler('logs.log', mode='a')
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-handler.setFormatter(formatter)
-logger.addHandler(handler)
-
-
-def clear_screen():
-    #Clears the terminal screen based on the operating system.
-    os.system('cls' if os.name == 'nt' else 'clear')
-
-
-def wait_for_key_press():
-    #Waits for a key press from the user and handles different OS requirements.
-    console.print("\nPress any key to continue...", style="yellow")
-    if platform.system().lower() == 'windows':
-        import msvcrt
-        return msvcrt.getch()
-    else:
-        import sys
-        import tty
-        import termios
-        fd = sys.stdin.fileno()
-        old_settings = termios.tcgetattr(fd)
-        try:
-            tty.setraw(fd)
-            ch = sys.stdin.read(1)
-        finally:
-            termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
-        return ch
-    
+from datetime import date, datetime, timedelta
+from terminal import Table, clear_screen, console, wait_for, wait_for_key_press
+from registry import directory
+from passwords import hasher
+from storage import assignment_row, get_storage
+from search import SearchIndex, get_search_index
+from deadlines import DeadlineIndex, get_deadline_index
+from membership import update_memberships
+from userstatus import get_user_status_index
+from logsetup import get_logger
+
+# Logger for errors and debug information: JSON lines written by a background thread (see logsetup.py)
+logger = get_logger("__main__")
+
 
 #........................#
 #        CLASSES         #
 #........................#
 
 
-class Status(Enum):
+# str mixins: members compare equal to their stored strings ("TODO" == Status.TODO)
+class Status(str, Enum):
     BACKLOG = 'BACKLOG'
     TODO = 'TODO'
     DOING = 'DOING'
     DONE = 'DONE'
     ARCHIVED = 'ARCHIVED'
 
+    def __str__(self):
+        return self.value
+
 
-class Priority(Enum):
+class Priority(str, Enum):
     CRITICAL = 'CRITICAL'
     HIGH = 'HIGH'
     MEDIUM = 'MEDIUM'
     LOW = 'LOW'
 
+    def __str__(self):
+        return self.value
+
 
 class User:
 
-    def __init__(self, email, username, password, active=True, ID = None):
+    def __init__(self, email, username, password, active=True, ID = None, last_login=None):
         self.email = email
         self.username = username
         self.password = password
         self.active = active
         self.ID = ID if ID is not None else str(uuid.uuid1())[:8]
+        # day ("YYYY-MM-DD") of the last login, used by the manager's --inactive-since
+        self.last_login = last_login
 
     @staticmethod
     def validate_email_format(email):
@@ -101,33 +78,21 @@ class User:
 
     @staticmethod
     def check_unique_email(email):
-        #Checks if the email is unique by comparing it to stored emails.
-        data = {}
+        #Checks if the email is unique (case-insensitive) using the registry's email index.
         try:
-            with open('emails_and_usernames.json', 'r') as file:
-                data = json.load(file)
+            return not directory.email_taken(email)
         except FileNotFoundError:
             logger.error("Problem with [emails_and_usernames.json]")
             raise FileNotFoundError("File Error. Terminating Program")
 
-        if email in data['emails']:
-            return False
-        return True
-
     @staticmethod
     def check_unique_username(username):
-        #Checks if the username is unique by comparing it to stored usernames.
-        data = {}
+        #Checks if the username is unique (case-insensitive) using the registry's username index.
         try:
-            with open('emails_and_usernames.json', 'r') as file:
-                data = json.load(file)
+            return not directory.username_taken(username)
         except FileNotFoundError:
             logger.error("Problem with [emails_and_usernames.json]")
             raise FileNotFoundError("File Error. Terminating Program")
-
-        if username in list(data['usernames'].values()):
-            return False
-        return True
     
     @staticmethod
     # Validate password strength based on criteria
@@ -147,149 +112,108 @@ class User:
     @staticmethod
     def get_all_usernames():
         # Retrieve all stored usernames
-        data = {}
         try:
-            with open('emails_and_usernames.json', 'r') as file:
-                data = json.load(file)
+            return directory.usernames()
         except FileNotFoundError:
             logger.error("Problem with [emails_and_usernames.json]")
             raise FileNotFoundError("File Error. Terminating Program")
-        return list(data['usernames'].values())
     
     def add_email_username(self):
         # Add email and username to stored data
-        data = {}
         try:
-            with open('emails_and_usernames.json', 'r') as file:
-                data = json.load(file)
-
-            data['emails'].append(self.email)
-            data['usernames'][self.ID] = self.username
-
-            with open('emails_and_usernames.json', 'w') as file:
-                json.dump(data, file, indent=4)
+            directory.add_user(self.ID, self.email, self.username)
         except FileNotFoundError:
             logger.error("Problem with [emails_and_usernames.json]")
             raise FileNotFoundError("File Error. Terminating Program")
 
     def save_user_data(self):
-        # Create user folder if it doesn't exist
-        user_folder = f"users/{self.username}"
-        os.makedirs(user_folder, exist_ok=True)
-        json_file_path = os.path.join(user_folder, f"{self.username}.json")
+        # Save user data through the storage backend (users/<name>/<name>.json for JSON)
+        user_data = dict(vars(self))
+        if self.last_login is None:
+            # records of users who never logged in since the field exists keep their old shape
+            del user_data["last_login"]
         try:
-            # Save user data to a JSON file
-            with open(json_file_path, "w") as json_file:
-                json.dump(vars(self), json_file, indent=4)
+            get_storage().save_user(user_data)
         except FileNotFoundError:
-            logger.error(f"Problem with [{json_file_path}]")
+            logger.error("Problem with saving user [%s]", self.username)
             raise FileNotFoundError("File Error. Terminating Program")
+        get_user_status_index(get_storage()).update_users([user_data])
 
     @staticmethod
     def load_user_data(username):
-        # Load user data from a JSON file
-        user_folder = f"users/{username}"
-        json_file_path = os.path.join(user_folder, f"{username}.json")
+        # Load user data from the storage backend
         try:
-            with open(json_file_path, "r") as json_file:
-                return json.load(json_file)
+            return get_storage().load_user(username)
         except FileNotFoundError:
-            logger.error(f"Problem with [{json_file_path}]")
+            logger.error("Problem with loading user [%s]", username)
             raise FileNotFoundError("File Error. Terminating Program")
 
     @staticmethod
     def add_my_project(username, project_id):
         # Add a project to the user's list of projects
-        path = f"users/{username}/projects.json"
-        data = {}
-        if os.path.exists(path):
-            with open(path, "r") as file:
-                data = json.load(file)
-            data['projects'].append(project_id)
-        else:
-            data = {'projects': [project_id]}
         try:
-            # Save the updated projects list to a JSON file
-            with open(path, "w") as file:
-                json.dump(data, file, indent=4)
+            get_storage().add_user_project(username, project_id)
         except FileNotFoundError:
-            logger.error(f"Problem with [{path}]")
+            logger.error("Problem with projects of user [%s]", username)
             raise FileNotFoundError("File Error. Terminating Program")
 
     @staticmethod
     def remove_project(user_id, project_id):
         # Remove a project from the user's list of projects
-        path = f"users/{get_username(user_id)}/projects.json"
-        data = {}
+        username = get_username(user_id)
         try:
-            with open(path, "r") as file:
-                data = json.load(file)
-
-            data['projects'].remove(project_id)
-            with open(path, "w") as file:
-                json.dump(data, file, indent=4)
+            get_storage().remove_user_project(username, project_id)
         except FileNotFoundError:
-            logger.error(f"Problem with [{path}]")
+            logger.error("Problem with projects of user [%s]", username)
             raise FileNotFoundError("File Error. Terminating Program")
 
     @staticmethod
     def load_user_projects(username):
-        # Load the user's list of projects from a JSON file
-        path = f"users/{username}/projects.json"
-        try:
-            with open(path, "r") as file:
-                return json.load(file)
-        except FileNotFoundError:
-            logger.error(f"Problem with [{path}]")
-            return None
+        # Load the user's list of projects ({'projects': [...]}) or None if there is none
+        data = get_storage().load_user_projects(username)
+        if data is None:
+            logger.error("Problem with projects of user [%s]", username)
+        return data
 
     def change_username(self, new_username):
         old_username = self.username
         self.username = new_username
-        os.rename(f"users/{old_username}", f"users/{new_username}")
-        os.rename(f"users/{new_username}/{old_username}.json",
-                  f"users/{new_username}/{new_username}.json")
+        get_storage().rename_user(old_username, new_username)
         self.save_user_data()
-        data = {}
         try:
-            with open('emails_and_usernames.json', 'r') as file:
-                data = json.load(file)
-            data['usernames'][self.ID] = new_username
-            with open('emails_and_usernames.json', 'w') as file:
-                json.dump(data, file, indent=4)
+            directory.rename_user(self.ID, new_username)
             console.print("Username updated successfully.", style="Notice")
-            logger.info(f"User [{self.username}] changed username from {old_username} to {new_username}")
+            logger.info("User [%s] changed username from %s to %s", self.username, old_username, new_username,
+                        extra={"user": self.ID, "action": "change username"})
         except FileNotFoundError:
             logger.error("Problem with [emails_and_usernames.json]")
             raise FileNotFoundError("File Error. Terminating Program")
 
     def change_password(self, new_password):
-        if bcrypt.checkpw(new_password.encode('utf-8'), self.password.encode('utf-8')):
+        # the reuse check and the new hash run side by side on the hasher's pool
+        reused = hasher.submit_verify(new_password, self.password)
+        new_hash = hasher.submit_hash(new_password)
+        if wait_for(reused, "Checking password..."):
             console.print("Enter a new password not your old password!", style="Error")
             return
-        self.password = bcrypt.hashpw(new_password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        self.password = wait_for(new_hash, "Updating password...")
         self.save_user_data()
         console.print("Password updated successfully.", style="Notice")
-        logger.info(f"User [{self.username}] changed password")
+        logger.info("User [%s] changed password", self.username, extra={"user": self.ID, "action": "change password"})
 
     def change_email(self, new_email):
         if new_email == self.email:
             console.print("Enter a new email not your old email!", style='Error')
             return
 
-        data = {}
         try:
             old_email = self.email
             self.email = new_email
             self.save_user_data()
-            with open('emails_and_usernames.json', 'r') as file:
-                data = json.load(file)
-            data['emails'].remove(old_email)
-            data['emails'].append(new_email)
-            with open('emails_and_usernames.json', 'w') as file:
-                json.dump(data, file, indent=4)
+            directory.change_email(self.ID, old_email, new_email)
             console.print("Email updated successfully.", style="Notice")
-            logger.info(f"User [{self.username}] changed email from {old_email} to {new_email}")
+            logger.info("User [%s] changed email from %s to %s", self.username, old_email, new_email,
+                        extra={"user": self.ID, "action": "change email"})
         except FileNotFoundError:
             logger.error("Problem with [emails_and_usernames.json]")
             raise FileNotFoundError("File Error. Terminating Program")
@@ -376,12 +300,13 @@ class User:
                 raise ValueError("Weak password! Passwords must be at least 8 characters long and include uppercase and lowercase letters, digits, and special characters.")
             if not User.validate_username_format(username):
                 raise ValueError("Invalid username format! Usernames can only contain letters, digits, and underscores, and must be 3-20 characters long.")
-            hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-            new_user = User(email, username, hashed_password)
-            new_user.save_user_data()
+            hashed_password = wait_for(hasher.submit_hash(password), "Creating account...")
+            new_user = User(email, username, hashed_password, last_login=str(date.today()))
+            # reserve the username/email first; the registry re-checks them under its lock
             new_user.add_email_username()
+            new_user.save_user_data()
             console.print("Account created successfully.", style="Notice")
-            logger.info(f"A new user registered: {new_user.username}")
+            logger.info("A new user registered: %s", new_user.username, extra={"user": new_user.ID, "action": "register"})
             wait_for_key_press()
 
         except ValueError as e:
@@ -400,39 +325,125 @@ class User:
         username = input("Username: ")
         if username == "":
             return
+        import pwinput
         password = pwinput.pwinput(prompt="Password: ", mask="*")
-        path = f"users/{username}/{username}.json"
 
-        if os.path.exists(path):
+        if get_storage().user_exists(username):
             user_data = User.load_user_data(username)
-            if user_data["username"] == username and bcrypt.checkpw(password.encode('utf-8'), user_data["password"].encode('utf-8')):
+            if user_data["username"] == username and wait_for(hasher.submit_verify(password, user_data["password"]), "Checking password..."):
                 if not user_data["active"]:
                     console.print("Your account is inactive.", style="Error")
                     wait_for_key_press()
                     return None
+                user = User(**user_data)
+                changed = False
+                if hasher.needs_rehash(user.password):
+                    # stored with another cost factor: replace it while we have the password
+                    user.password = wait_for(hasher.submit_hash(password), "Updating password hash...")
+                    changed = True
+                    logger.info("Password of user [%s] rehashed with cost %d", user.username, hasher.rounds,
+                                extra={"user": user.ID, "action": "rehash password"})
+                # the login day is written at most once a day
+                today = str(date.today())
+                if user.last_login != today:
+                    user.last_login = today
+                    changed = True
+                if changed:
+                    user.save_user_data()
                 console.print("Login successful.", style="Notice")
-                logger.info(f"User [{user_data['username']}] has logged in")
+                logger.info("User [%s] has logged in", user.username, extra={"user": user.ID, "action": "login"})
+                # two index range counts, however many projects the user is in
+                overdue, soon = get_deadline_index(get_storage()).counts(user.ID)
+                if overdue:
+                    console.print(f"You have {overdue} overdue task(s).", style="Error")
+                if soon:
+                    console.print(f"You have {soon} task(s) due in the next 24 hours.", style="Info")
                 wait_for_key_press()
-                return User(**user_data)
+                return user
 
         console.print("Incorrect username or password.", style="Error")
         wait_for_key_press()
 
 
 class Task:
+    """
+    A task as it lives in memory: status and priority are enums (plain
+    strings are converted on assignment) and the start/end times are
+    datetimes, with start_time/end_time giving the stored
+    "YYYY-MM-DD HH:MM:SS" strings. Projects keep Task objects for their
+    whole life; from_dict/to_dict convert only at the storage boundary.
+    """
+
+    __slots__ = ("title", "description", "_priority", "_status", "ID", "start", "end", "assignees", "comments", "history")
 
     def __init__(self, title, description, priority=None, status=None, ID=None, start_time=None, end_time=None, assignees=None, comments=None, history=None):
+        now = datetime.now().replace(microsecond=0)
         self.title = title
         self.description = description
-        self.priority = priority if priority is not None else Priority.LOW.value
-        self.status = status if status is not None else Status.BACKLOG.value
+        self.priority = priority if priority is not None else Priority.LOW
+        self.status = status if status is not None else Status.BACKLOG
         self.ID = ID if ID is not None else str(uuid.uuid1())[:8]
-        self.start_time = start_time if start_time is not None else str(datetime.now())[:19]
-        self.end_time = end_time if end_time is not None else str(datetime.now() + timedelta(hours=24))[:19]
+        self.start = _parse_time(start_time) if start_time is not None else now
+        self.end = _parse_time(end_time) if end_time is not None else now + timedelta(hours=24)
         self.assignees = assignees if assignees is not None else []
         self.comments = comments if comments is not None else []
         self.history = history if history is not None else []
 
+    @property
+    def status(self):
+        return self._status
+
+    @status.setter
+    def status(self, value):
+        self._status = Status(value)
+
+    @property
+    def priority(self):
+        return self._priority
+
+    @priority.setter
+    def priority(self, value):
+        self._priority = Priority(value)
+
+    @property
+    def start_time(self):
+        return str(self.start)
+
+    @start_time.setter
+    def start_time(self, value):
+        self.start = _parse_time(value)
+
+    @property
+    def end_time(self):
+        return str(self.end)
+
+    @end_time.setter
+    def end_time(self, value):
+        self.end = _parse_time(value)
+
+    @staticmethod
+    def from_dict(data):
+        # Builds a task from its stored form
+        return Task(**data)
+
+    def to_dict(self):
+        # The stored form of the task (what vars() returned before tasks had slots)
+        return {"title": self.title, "description": self.description, "priority": self._priority.value,
+                "status": self._status.value, "ID": self.ID, "start_time": str(self.start), "end_time": str(self.end),
+                "assignees": self.assignees, "comments": self.comments, "history": self.history}
+
+    def update_from(self, data):
+        # Replaces every field with the stored form 'data', keeping this object's identity
+        self.title = data["title"]
+        self.description = data["description"]
+        self.priority = data["priority"]
+        self.status = data["status"]
+        self.start = _parse_time(data["start_time"])
+        self.end = _parse_time(data["end_time"])
+        self.assignees = list(data["assignees"])
+        self.comments = list(data["comments"])
+        self.history = list(data["history"])
+
     def view_task(self):
         # Create and display a table of task details
         table = Table(title=f"Task: {self.title}", style="cyan")
@@ -444,7 +455,7 @@ class Task:
         table.add_column("Priority", justify="center", width=15)
         table.add_column("Status", justify="center", width=15)
 
-        table.add_row(self.ID, self.title, self.description, self.start_time[:19], self.end_time[:19], self.priority, self.status)
+        table.add_row(self.ID, self.title, self.description, self.start_time, self.end_time, self.priority.value, self.status.value)
         console.print(table)
 
     def change_end_time(self):
@@ -455,13 +466,14 @@ class Task:
             return False
         try:
             # Ensure the new end time is not before the start time
-            if datetime.strptime(new_end_time, "%Y-%m-%d %H:%M:%S") < datetime.strptime(self.start_time, "%Y-%m-%d %H:%M:%S"):
+            new_end_time = datetime.strptime(new_end_time, "%Y-%m-%d %H:%M:%S")
+            if new_end_time < self.start:
                 console.print("Cannot set a date before start time." , style='Error')
                 wait_for_key_press()
                 return False
-            self.end_time = str(datetime.strptime(new_end_time, "%Y-%m-%d %H:%M:%S"))
+            self.end = new_end_time
             console.print("End time changed successfully.", style="Notice")
-            logger.debug(f"Task [id: {self.ID}] end time has changed (current: {self.end_time})")
+            logger.debug("Task [id: %s] end time has changed (current: %s)", self.ID, self.end, extra={"task": self.ID, "action": "change end time"})
             wait_for_key_press()
             return True
         except ValueError:
@@ -477,13 +489,14 @@ class Task:
             return False
         try:
             # Ensure the new start time is not after the start time
-            if datetime.strptime(new_start_time, "%Y-%m-%d %H:%M:%S") > datetime.strptime(self.end_time, "%Y-%m-%d %H:%M:%S"):
+            new_start_time = datetime.strptime(new_start_time, "%Y-%m-%d %H:%M:%S")
+            if new_start_time > self.end:
                 console.print("Cannot set a date after end time." , style='Error')
                 wait_for_key_press()
                 return False
-            self.start_time = str(datetime.strptime(new_start_time, "%Y-%m-%d %H:%M:%S"))
+            self.start = new_start_time
             console.print("Start time changed successfully.", style="Notice")
-            logger.debug(f"Task [id: {self.ID}] start time has changed (current: {self.start_time})")
+            logger.debug("Task [id: %s] start time has changed (current: %s)", self.ID, self.start, extra={"task": self.ID, "action": "change start time"})
             wait_for_key_press()
             return True
         except ValueError:
@@ -503,10 +516,9 @@ class Task:
         try:
             new_status_idx = int(new_status) - 1
             if 0 <= new_status_idx < len(Status):
-                new_status = list(Status)[new_status_idx].name
-                self.status = new_status
+                self.status = list(Status)[new_status_idx]
                 console.print("Task status changed successfully.", style="Notice")
-                logger.debug(f"Task [id: {self.ID}] status has changed (current: {self.status})")
+                logger.debug("Task [id: %s] status has changed (current: %s)", self.ID, self.status, extra={"task": self.ID, "action": "change status"})
                 wait_for_key_press()
                 return True
             else:
@@ -530,10 +542,9 @@ class Task:
         try:
             new_priority_idx = int(new_priority) - 1
             if 0 <= new_priority_idx < len(Priority):
-                new_priority = list(Priority)[new_priority_idx].name
-                self.priority = new_priority
+                self.priority = list(Priority)[new_priority_idx]
                 console.print("Task priority changed successfully.", style="Notice")
-                logger.debug(f"Task [id: {self.ID}] priority has changed (current: {self.priority})")
+                logger.debug("Task [id: %s] priority has changed (current: %s)", self.ID, self.priority, extra={"task": self.ID, "action": "change priority"})
                 wait_for_key_press()
                 return True
             else:
@@ -553,7 +564,7 @@ class Task:
             return False
         self.title = new_title
         console.print(f"Task title changed to {self.title}", style="Notice")
-        logger.debug(f"Task [id: {self.ID}] title has changed (current: {self.title})")
+        logger.debug("Task [id: %s] title has changed (current: %s)", self.ID, self.title, extra={"task": self.ID, "action": "change title"})
         wait_for_key_press()
         return True
 
@@ -565,7 +576,7 @@ class Task:
             return False
         self.description = new_description
         console.print(f"Task description changed to {self.description}", style="Notice")
-        logger.debug(f"Task [id: {self.ID}] description has changed (current: {self.description})")
+        logger.debug("Task [id: %s] description has changed (current: %s)", self.ID, self.description, extra={"task": self.ID, "action": "change description"})
         wait_for_key_press()
         return True
 
@@ -604,7 +615,8 @@ class Task:
             "timestamp": str(datetime.now())[:19]
         })
         console.print("Comment added successfully.", style="Notice")
-        logger.debug(f"A new comment added to task [id: {self.ID}] by user [{get_username(user_id)}]")
+        logger.debug("A new comment added to task [id: %s] by user [%s]", self.ID, _Username(user_id),
+                     extra={"user": user_id, "task": self.ID, "action": "add comment"})
         wait_for_key_press()
         return True
 
@@ -626,7 +638,8 @@ class Task:
                 if self.comments[comment_idx]["user"] == user.ID:
                     removed_comment = self.comments.pop(comment_idx)
                     console.print(f"Comment by {get_username(removed_comment['user'])} removed successfully.", style="Notice")
-                    logger.debug(f"Comment removed from task [id: {self.ID}] by user [{get_username(removed_comment['user'])}]")
+                    logger.debug("Comment removed from task [id: %s] by user [%s]", self.ID, _Username(removed_comment['user']),
+                                 extra={"user": removed_comment['user'], "task": self.ID, "action": "remove comment"})
                     wait_for_key_press()
                     return True
                 else:
@@ -662,7 +675,8 @@ class Task:
                     self.comments[comment_idx]['comment'] = new_comment
                     self.comments[comment_idx]['timestamp'] = str(datetime.now())[:19]
                     console.print("Comment edited successfully.", style="Notice")
-                    logger.debug(f"Comment edited on task [id: {self.ID}] by user [{get_username(self.comments[comment_idx]['user'])}]")
+                    logger.debug("Comment edited on task [id: %s] by user [%s]", self.ID, _Username(self.comments[comment_idx]['user']),
+                                 extra={"user": self.comments[comment_idx]['user'], "task": self.ID, "action": "edit comment"})
                     wait_for_key_press()
                     return True
                 else:
@@ -679,7 +693,8 @@ class Task:
             return False
 
     def add_to_history(self , ID , action , message = None , members = None , new_amount = None) :
-        # Add a new entry to the task's history based on the action
+        # Add a new entry to the task's history based on the action.
+        # self.history only holds entries not yet flushed to the project's history log (see Project.flush_history)
         if action == "add comment":
             new_history = {"user" : ID , "action" : action , "message" : message["comment"]}
             new_history["timestamp"] = str(datetime.now())[:19]
@@ -725,6 +740,11 @@ class Task:
             new_history["timestamp"] = str(datetime.now())[:19]
             self.history.append(new_history)
         
+        elif action == "reassign":
+            new_history = {"user" : ID , "action" : action , "removed assignees" : members[:1] , "new assignees" : members[1:]}
+            new_history["timestamp"] = str(datetime.now())[:19]
+            self.history.append(new_history)
+        
         elif action == "change title":
             new_history = {"user" : ID , "action" : action , "new title" : new_amount}
             new_history["timestamp"] = str(datetime.now())[:19]
@@ -735,10 +755,14 @@ class Task:
             new_history["timestamp"] = str(datetime.now())[:19]
             self.history.append(new_history)
         
-        logger.debug(f"Add new history to task [id : {self.ID}]")
-
-    def view_history(self):
-        if not self.history:
+        logger.debug("Add new history to task [id : %s]", self.ID, extra={"user": ID, "task": self.ID, "action": action})
+
+    def view_history(self, project_id=None):
+        # Stream this task's entries from the project's history log, then the ones not flushed yet
+        logged = get_storage().iter_history(project_id, self.ID) if project_id is not None else iter(())
+        entries = itertools.chain(logged, self.history)
+        first_entry = next(entries, None)
+        if first_entry is None:
             console.print("No history available for this task.", style="Error")
             wait_for_key_press()
             return
@@ -753,7 +777,7 @@ class Task:
         table.add_column("Timestamp", style="yellow", justify="center", width=25)
 
         # Iterate over the task's history entries and add them to the table
-        for index, entry in enumerate(self.history, start=1):
+        for index, entry in enumerate(itertools.chain([first_entry], entries), start=1):
             user = get_username(entry.get("user", ""))
             action = entry.get("action", "")
             amount = entry.get("new status", "") or \
@@ -764,7 +788,9 @@ class Task:
                      entry.get("new description", "") or \
                      entry.get("message", "")[:20] or \
                      entry.get("description")
-            if amount is None:
+            if action == "reassign":
+                amount = " -> ".join(get_username(x) for x in entry.get("removed assignees", []) + entry.get("new assignees", []))
+            elif amount is None:
                 amount = str([get_username(x) for x in entry.get("new assignees", "")])
             if amount == "[]":
                 amount = str([get_username(x) for x in entry.get("removed assignees", "")])
@@ -775,39 +801,332 @@ class Task:
         wait_for_key_press()
 
 
+class TaskIndex:
+    """
+    Secondary indexes over a project's tasks: by status, priority and
+    assignee (dicts used as ordered sets of tasks) and by end time (a
+    sorted list). Project keeps it in step through update_task and
+    delete_task_data, so queries cost the size of the answer.
+    """
+
+    __slots__ = ("_keys", "_by_status", "_by_priority", "_by_assignee", "_by_end")
+
+    def __init__(self, tasks=()):
+        # task ID -> (status, priority, assignees, end) the task is indexed under
+        self._keys = {}
+        self._by_status = {status: {} for status in Status}
+        self._by_priority = {priority: {} for priority in Priority}
+        self._by_assignee = {}
+        self._by_end = []
+        for task in tasks:
+            self.update(task)
+
+    def update(self, task: Task):
+        # (Re)indexes a task; only the entries whose key changed are touched.
+        key = (task.status, task.priority, tuple(task.assignees), task.end)
+        old = self._keys.get(task.ID)
+        if old == key:
+            return
+        if old is not None:
+            self._unlink(task.ID, old, key)
+        status, priority, assignees, end = key
+        old_status, old_priority, old_assignees, old_end = old if old is not None else (None, None, (), None)
+        if status != old_status:
+            self._by_status[status][task.ID] = task
+        if priority != old_priority:
+            self._by_priority[priority][task.ID] = task
+        for user in assignees:
+            if user not in old_assignees:
+                self._by_assignee.setdefault(user, {})[task.ID] = task
+        if end != old_end:
+            bisect.insort(self._by_end, (end, task.ID))
+        self._keys[task.ID] = key
+
+    def remove(self, task_id):
+        old = self._keys.pop(task_id, None)
+        if old is not None:
+            self._unlink(task_id, old, (None, None, (), None))
+
+    def _unlink(self, task_id, old, new):
+        # Drops the entries of 'old' that 'new' does not share
+        status, priority, assignees, end = old
+        if status != new[0]:
+            del self._by_status[status][task_id]
+        if priority != new[1]:
+            del self._by_priority[priority][task_id]
+        for user in assignees:
+            if user not in new[2]:
+                del self._by_assignee[user][task_id]
+                if not self._by_assignee[user]:
+                    del self._by_assignee[user]
+        if end != new[3]:
+            del self._by_end[bisect.bisect_left(self._by_end, (end, task_id))]
+
+    def by_status(self, status):
+        return list(self._by_status[Status(status)].values())
+
+    def by_priority(self, priority):
+        return list(self._by_priority[Priority(priority)].values())
+
+    def by_assignee(self, user_ID):
+        return list(self._by_assignee.get(user_ID, {}).values())
+
+    def ending_between(self, start=None, end=None):
+        # IDs of tasks whose end time is in [start, end), earliest first; None leaves a side open
+        low = 0 if start is None else bisect.bisect_left(self._by_end, (start,))
+        high = len(self._by_end) if end is None else bisect.bisect_left(self._by_end, (end,))
+        return [task_id for _, task_id in self._by_end[low:high]]
+
+
 class Project:
 
-    def __init__(self, title, owner, tasks={}, collaborators=None, ID=None):
+    def __init__(self, title, owner, tasks=None, collaborators=None, ID=None):
+        # tasks: {task ID: Task}
         self.title = title
         self.owner = owner
-        self.tasks = tasks
+        self.tasks = tasks if tasks is not None else {}
         self.collaborators = collaborators if collaborators is not None else [owner]
         self.ID = ID if ID is not None else str(uuid.uuid1())[:8]
+        self.index = TaskIndex(self.tasks.values())
+        # Dirty tracking: snapshots (_SavedTask) of what storage holds, and what changed since
+        self._saved_header = None
+        self._saved_tasks = {}
+        self._dirty_tasks = set()
+        self._deleted_tasks = set()
+        self._batch_depth = 0
+        # (added, removed) member IDs whose project lists wait for the project save that ends the batch
+        self._member_changes = []
+        # Storage version this session's copy is based on (None: unknown, always merge)
+        self._version = None
 
-    def save_project_data(self):
-        # Saves the project data to a JSON file in the "projects/" folder.
-        project_folder = "projects/"
-        os.makedirs(project_folder, exist_ok=True)
-        json_file_path = os.path.join(project_folder, f"{self.ID}.json")
+    @staticmethod
+    def from_data(data):
+        # Builds a project from stored data and marks it as clean.
+        tasks = {task_id: Task.from_dict(task) for task_id, task in data["tasks"].items()}
+        project = Project(data["title"], data["owner"], tasks, data["collaborators"], data["ID"])
+        project._mark_clean()
+        return project
+
+    @staticmethod
+    def open(ID):
+        # Loads a project for editing together with its storage version.
+        storage = get_storage()
+        try:
+            with storage.lock(f"project-{ID}"):
+                version = storage.project_version(ID)
+                project = Project.from_data(storage.load_project(ID))
+        except FileNotFoundError:
+            logger.error("Problem with loading project [%s]", ID)
+            raise FileNotFoundError("File Error. Terminating Program")
+        project._version = version
+        return project
+
+    def project_data(self):
+        # The stored form of the project; tasks are converted only when storage reads them.
+        return {"title": self.title, "owner": self.owner, "tasks": _StoredTasks(self.tasks),
+                "collaborators": self.collaborators, "ID": self.ID}
+
+    def _header_fingerprint(self):
+        return (self.title, self.owner, tuple(self.collaborators))
+
+    def _mark_clean(self):
+        self._saved_header = self._header_fingerprint()
+        self._saved_tasks = {task_id: _SavedTask(task.to_dict()) for task_id, task in self.tasks.items()}
+        self._dirty_tasks.clear()
+        self._deleted_tasks.clear()
+
+    @contextmanager
+    def batch(self):
+        # Defers saves until the outermost batch ends, then flushes them at once.
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            if self._batch_depth == 0:
+                self.flush()
+
+    def flush(self):
+        # Saves the project, then the project lists of the members added or removed meanwhile:
+        # if the save fails they stay as they were (and wait for the next save of these changes).
+        member_changes, self._member_changes = self._member_changes, []
         try:
-            with open(json_file_path, "w") as json_file:
-                json.dump(vars(self), json_file, indent=4)
+            self._save_changes()
+        except Exception:
+            self._member_changes[:0] = member_changes
+            raise
+        for added, removed in member_changes:
+            self._update_member_lists(added=added, removed=removed)
+
+    def _save_changes(self):
+        # Writes the tasks and header that changed since the last save; unchanged state is a no-op.
+        for task_id in self._dirty_tasks:
+            if task_id in self.tasks:
+                self.flush_history(self.tasks[task_id])
+        snapshots = {}
+        for task_id in self._dirty_tasks:
+            if task_id in self.tasks:
+                snapshot = _SavedTask(self.tasks[task_id].to_dict())
+                if snapshot != self._saved_tasks.get(task_id):
+                    snapshots[task_id] = snapshot
+        changed = list(snapshots)
+        deleted = [task_id for task_id in self._deleted_tasks if task_id in self._saved_tasks and task_id not in self.tasks]
+        header_changed = self._header_fingerprint() != self._saved_header
+        self._dirty_tasks.clear()
+        self._deleted_tasks.clear()
+        if not changed and not deleted and not header_changed:
+            return
+        storage = get_storage()
+        try:
+            with storage.lock(f"project-{self.ID}"):
+                if self._saved_header is None:
+                    storage.save_project(self.project_data())
+                    storage.update_assignments(self.ID, self._assignment_changes(self.tasks))
+                    for index in derived_indexes(storage):
+                        index.update(self.ID, self._index_changes(index, self.tasks))
+                    self._mark_clean()
+                    self._version = storage.bump_project_version(self.ID)
+                    return
+                if self._version is None or storage.project_version(self.ID) != self._version:
+                    # another session saved this project since we loaded it
+                    self._merge(storage.load_project(self.ID), changed, deleted)
+                    snapshots = {task_id: _SavedTask(self.tasks[task_id].to_dict()) for task_id in changed}
+                    deleted = [task_id for task_id in deleted if task_id in self._saved_tasks]
+                    header_changed = self._header_fingerprint() != self._saved_header
+                storage.save_changes(self.project_data(), changed, deleted, header_changed)
+                storage.update_assignments(self.ID, self._assignment_changes(changed + deleted))
+                for index in derived_indexes(storage):
+                    index_changes = self._index_changes(index, changed + deleted)
+                    if index_changes:
+                        index.update(self.ID, index_changes)
+                self._version = storage.bump_project_version(self.ID)
         except FileNotFoundError:
             raise FileNotFoundError("File Error. Teminating Program.")
+        self._saved_tasks.update(snapshots)
+        for task_id in deleted:
+            del self._saved_tasks[task_id]
+        self._saved_header = self._header_fingerprint()
+        logger.debug("Project [id: %s] saved (%d task(s), %d deleted, header: %s)", self.ID, len(changed), len(deleted), header_changed,
+                     extra={"project": self.ID, "action": "save project"})
+
+    def _assignment_changes(self, task_ids, removed=False):
+        # Updates that turn the saved assignments of 'task_ids' into the current ones,
+        # as {user ID: {task ID: assignment row or None}} for the assignee index
+        changes = {}
+        for task_id in task_ids:
+            old = self._saved_tasks.get(task_id)
+            new = self.tasks[task_id].to_dict() if task_id in self.tasks and not removed else None
+            old_users = old.assignees if old is not None else ()
+            new_users = new["assignees"] if new is not None else []
+            new_row = assignment_row(new) if new is not None else None
+            row_changed = new_row is not None and (
+                old is None or any(old.field(key) != _digest(value) for key, value in new_row.items()))
+            for user in old_users:
+                if user not in new_users:
+                    changes.setdefault(user, {})[task_id] = None
+            for user in new_users:
+                if user not in old_users or row_changed:
+                    changes.setdefault(user, {})[task_id] = new_row
+        return changes
+
+    def _index_changes(self, index, task_ids):
+        # {task ID: index entry or None} for the tasks whose entry in a derived index
+        # (search text, deadline) changed since the last save
+        changes = {}
+        for task_id in task_ids:
+            old = self._saved_tasks.get(task_id)
+            new_entry = index.entry(self.tasks[task_id].to_dict()) if task_id in self.tasks else None
+            if (old.entry(index) if old is not None else _digest(None)) != _digest(new_entry):
+                changes[task_id] = new_entry
+        return changes
+
+    def _merge(self, stored, changed, deleted):
+        # Task-level three-way merge of this session's unsaved changes into the stored project.
+        # Tasks only the other session touched are taken from storage; tasks both sessions
+        # changed are merged field by field, keeping this session's value on a real clash.
+        stored_tasks = stored["tasks"]
+        for task_id in list(self.tasks):
+            if task_id in changed:
+                continue
+            if task_id in stored_tasks:
+                # update in place so a Task being edited in a menu sees the new values
+                self.tasks[task_id].update_from(stored_tasks[task_id])
+            elif task_id in self._saved_tasks:
+                del self.tasks[task_id]
+                self.index.remove(task_id)
+        for task_id, task in stored_tasks.items():
+            if task_id not in self.tasks and task_id not in deleted:
+                self.tasks[task_id] = Task.from_dict(task)
+
+        for task_id in changed:
+            base, theirs = self._saved_tasks.get(task_id), stored_tasks.get(task_id)
+            if base is None or theirs is None or _SavedTask(theirs) == base:
+                continue
+            merged, clashes = _merge_fields(base, self.tasks[task_id].to_dict(), theirs)
+            self.tasks[task_id].update_from(merged)
+            if clashes:
+                console.print(f"Task '{self.tasks[task_id].title}' was also changed in another session; kept your {', '.join(clashes)}.", style="Error")
+                logger.warning("Merge conflict on task [id: %s] of project [id: %s] in fields %s", task_id, self.ID, clashes,
+                               extra={"project": self.ID, "task": task_id, "action": "merge"})
+
+        for task in self.tasks.values():
+            self.index.update(task)
+
+        base_title, base_owner, base_collaborators = self._saved_header
+        if self.title == base_title:
+            self.title = stored["title"]
+        if self.owner == base_owner:
+            self.owner = stored["owner"]
+        self.collaborators = _merge_list(list(base_collaborators), self.collaborators, stored["collaborators"])
+
+        # the stored project is the new base
+        self._saved_header = (stored["title"], stored["owner"], tuple(stored["collaborators"]))
+        self._saved_tasks = {task_id: _SavedTask(task) for task_id, task in stored_tasks.items()}
+
+    def save_project_data(self):
+        # Saves the project data through the storage backend (projects/<id>.json for JSON).
+        for task in self.tasks.values():
+            self.index.update(task)
+        self._dirty_tasks.update(self.tasks)
+        if self._batch_depth == 0:
+            self.flush()
+
+    def save_project_header(self):
+        # Saves only the project-level fields (title, owner, collaborators).
+        if self._batch_depth == 0:
+            self.flush()
 
     def load_project_data(ID):
-        # Loads project data from a JSON file based on the given ID.
-        project_folder = "projects/"
-        json_file_path = os.path.join(project_folder, f"{ID}.json")
+        # Loads project data from the storage backend based on the given ID.
         try:
-            with open(json_file_path, "r") as json_file:
-                return json.load(json_file)
+            return get_storage().load_project(ID)
         except FileNotFoundError:
-            logger.error(f"Problem with [{json_file_path}]")
+            logger.error("Problem with loading project [%s]", ID)
             raise FileNotFoundError("File Error. Terminating Program")
 
     def update_task(self, new_task: Task):
-        self.tasks[new_task.ID] = vars(new_task)
+        self.tasks[new_task.ID] = new_task
+        self.index.update(new_task)
+        self._dirty_tasks.add(new_task.ID)
+
+    def flush_history(self, task: Task):
+        # Moves a task's new history entries to the project's append-only history log.
+        if task.history:
+            get_storage().append_history(self.ID, task.ID, task.history)
+            task.history = []
+
+    def save_task(self, task: Task):
+        # Persists a single task; the project header is left untouched when the backend can write one task alone.
+        self.update_task(task)
+        if self._batch_depth == 0:
+            self.flush()
+
+    def delete_task_data(self, task_id):
+        # Removes a deleted task from storage.
+        self.index.remove(task_id)
+        self._deleted_tasks.add(task_id)
+        if self._batch_depth == 0:
+            self.flush()
 
     def view_members(self):
         # Displays the current project members in the console.
@@ -825,33 +1144,107 @@ class Project:
 
     def add_member(self, member):
         # Adds a new member to the project if they are not already a collaborator.
-        if member not in self.collaborators:
-            self.collaborators.append(member)
-            console.print(f"Member '{get_username(member)}' added to project successfully.", style="Notice")
-            User.add_my_project(get_username(member), self.ID)
-            self.save_project_data()
-            logger.debug(f"A new member [user : {get_username(member)}] added to project [id : {self.ID}] collaborators by owner")
-        else:
+        if member in self.collaborators:
             console.print(f"User {get_username(member)} has already been added", style='Error')
+            return
+        self.add_members([member])
+        console.print(f"Member '{get_username(member)}' added to project successfully.", style="Notice")
+
+    def add_members(self, user_IDs, by=None):
+        # Adds several users at once: one header save, then their project lists are updated together.
+        added = [ID for ID in dict.fromkeys(user_IDs) if ID not in self.collaborators]
+        if not added:
+            return []
+        self.collaborators.extend(added)
+        self.save_project_header()
+        self._update_member_lists(added=added)
+        for ID in added:
+            logger.debug("A new member [user : %s] added to project [id : %s] collaborators by owner", _Username(ID), self.ID,
+                         extra={"user": ID, "project": self.ID, "action": "add member"})
+        logger.info("%d member(s) added to project [id : %s]", len(added), self.ID,
+                    extra={"user": by, "project": self.ID, "action": "add members"})
+        return added
+
+    def _update_member_lists(self, added=(), removed=()):
+        # Writes the members' project lists in parallel and reports the ones that could not be updated;
+        # inside a batch they are written by flush(), after the project itself.
+        if self._batch_depth > 0:
+            self._member_changes.append((list(added), list(removed)))
+            return {}
+        failed = update_memberships(self.ID, added=added, removed=removed, backend=get_storage())
+        for ID, error in failed.items():
+            console.print(f"Could not update the project list of user '{ID}': {error}", style="Error")
+            logger.error("Problem with projects of user [id : %s]: %s", ID, error,
+                         extra={"user": ID, "project": self.ID, "action": "update memberships"})
+        return failed
 
     def remove_member(self, user_ID):
         # Removes a member from the project if they are a current collaborator.
-        if user_ID in self.collaborators:
-            self.collaborators.remove(user_ID)
-
-            # delete project id from user's project.json
-            User.remove_project(user_ID, self.ID)
-
-            # erase user's name from any tasks
-            for task in self.tasks.values():
-                if user_ID in task["assignees"]:
-                    self.remove_assignee(user_ID, Task(**task))
-
-            self.save_project_data()
-            console.print(f"Member '{get_username(user_ID)}' removed from project successfully.", style="Notice")
-            logger.debug(f"A member [user : {get_username(user_ID)}] removed from project [id : {self.ID}] collaborators")
-        else:
+        if user_ID not in self.collaborators:
             console.print(f"{get_username(user_ID)} is not a member of the project.", style="Error")
+            return
+        self.remove_members([user_ID])
+        console.print(f"Member '{get_username(user_ID)}' removed from project successfully.", style="Notice")
+
+    def remove_members(self, user_IDs, by=None):
+        """
+        Remove several collaborators at once: they are unassigned from
+        every task in memory, each affected task gets one history entry
+        (when 'by' is given), the project is saved once and each removed
+        user's project list is written once. The owner and users who are
+        not members are skipped. Returns the IDs that were removed.
+        """
+        removed = [ID for ID in dict.fromkeys(user_IDs) if ID in self.collaborators and ID != self.owner]
+        if not removed:
+            return []
+        gone = set(removed)
+        affected = {}
+        for ID in removed:
+            for task in self.index.by_assignee(ID):
+                affected[task.ID] = task
+        with self.batch():
+            self.collaborators = [ID for ID in self.collaborators if ID not in gone]
+            for task in affected.values():
+                dropped = [ID for ID in task.assignees if ID in gone]
+                task.assignees = [ID for ID in task.assignees if ID not in gone]
+                if by is not None:
+                    task.add_to_history(by, "remove assignee", members=dropped)
+                self.save_task(task)
+            self.save_project_header()
+        # delete project id from each user's project.json
+        self._update_member_lists(removed=removed)
+        for ID in removed:
+            logger.debug("A member [user : %s] removed from project [id : %s] collaborators", _Username(ID), self.ID,
+                         extra={"user": ID, "project": self.ID, "action": "remove member"})
+        logger.info("%d member(s) removed from project [id : %s], %d task(s) updated", len(removed), self.ID, len(affected),
+                    extra={"user": by, "project": self.ID, "action": "remove members"})
+        return removed
+
+    def reassign_tasks(self, from_ID, to_ID, by=None):
+        """
+        Hand every task assigned to 'from_ID' over to 'to_ID', who must be
+        a collaborator. Tasks already assigned to 'to_ID' just lose
+        'from_ID'. Each task gets one history entry (when 'by' is given)
+        and the project is saved once. Returns the number of tasks changed.
+        """
+        if to_ID not in self.collaborators:
+            raise ValueError(f"{get_username(to_ID)} is not a member of the project.")
+        if from_ID == to_ID:
+            return 0
+        tasks = list(self.index.by_assignee(from_ID))
+        with self.batch():
+            for task in tasks:
+                if to_ID in task.assignees:
+                    task.assignees = [ID for ID in task.assignees if ID != from_ID]
+                else:
+                    task.assignees = [to_ID if ID == from_ID else ID for ID in task.assignees]
+                if by is not None:
+                    task.add_to_history(by, "reassign", members=[from_ID, to_ID])
+                self.save_task(task)
+        logger.info("%d task(s) of [user : %s] reassigned to [user : %s] in project [id : %s]", len(tasks),
+                    _Username(from_ID), _Username(to_ID), self.ID,
+                    extra={"user": by, "project": self.ID, "action": "reassign tasks"})
+        return len(tasks)
 
     def add_member_menu(self, user: User):
         # Displays a menu to add new members to the project, accessible only to the owner.
@@ -877,17 +1270,24 @@ class Project:
         if selected_indices[0] == "":
             return
 
+        selected = []
         for idx_str in selected_indices:
             if not idx_str.isdigit():
                 console.print("Invalid input. Please enter valid user numbers.", style="Error")
                 continue
             idx = int(idx_str) - 1
             if idx >= 0 and idx < len(all_usernames):
-                selected_username = all_usernames[idx]
-                self.add_member(get_ID(selected_username))
+                member = get_ID(all_usernames[idx])
+                if member in self.collaborators:
+                    console.print(f"User {all_usernames[idx]} has already been added", style='Error')
+                else:
+                    selected.append(member)
             else:
                 console.print(f"Invalid user number: {idx + 1}.", style="Error")
 
+        for member in self.add_members(selected, by=user.ID):
+            console.print(f"Member '{get_username(member)}' added to project successfully.", style="Notice")
+
     def remove_member_menu(self, user: User):
         # Checks if the user trying to remove a member is the project owner.
         if self.owner != user.ID:
@@ -910,17 +1310,40 @@ class Project:
         if selected_indices[0] == "":
             return
 
-        # Validates and processes the selected removals.
+        # Validates the selected removals.
+        selected = []
         for idx_str in selected_indices:
             if not idx_str.isdigit():
                 console.print("Invalid input. Please enter valid user numbers.", style="Error")
                 continue
             idx = int(idx_str) - 1
             if idx >= 0 and idx < len(members_to_display):
-                selected_member = members_to_display[idx]
-                self.remove_member(get_ID(selected_member))
+                selected.append(get_ID(members_to_display[idx]))
             else:
                 console.print(f"Invalid user number: {idx + 1}.", style="Error")
+        if not selected:
+            return
+
+        # Optionally hands the removed members' tasks to someone who stays.
+        remaining = [member for member in self.collaborators if member not in selected]
+        console.print("\nReassign their tasks to:", style="Info")
+        for idx, member in enumerate(remaining, start=1):
+            console.print(f"{idx}. {get_username(member)}")
+        choice = input("Enter a number or press ENTER to just unassign them: ").strip()
+        target = None
+        if choice.isdigit() and 1 <= int(choice) <= len(remaining):
+            target = remaining[int(choice) - 1]
+        elif choice:
+            console.print("Invalid user number. Their tasks will be unassigned.", style="Error")
+
+        # Processes every change in memory and saves the project once.
+        with self.batch():
+            if target is not None:
+                for member in selected:
+                    self.reassign_tasks(member, target, by=user.ID)
+            removed = self.remove_members(selected, by=user.ID)
+        for member in removed:
+            console.print(f"Member '{get_username(member)}' removed from project successfully.", style="Notice")
 
     def view_assignees(self, task: Task):
         if not task.assignees:
@@ -941,8 +1364,9 @@ class Project:
             if member not in task.assignees:
                 task.assignees.append(member)
                 console.print(f"Member ({get_username(member)}) assigned to task successfully.", style="Notice")
-                self.save_project_data()
-                logger.debug(f"A new assignee [user : {get_username(member)}] added to task.")
+                self.save_task(task)
+                logger.debug("A new assignee [user : %s] added to task.", _Username(member),
+                             extra={"user": member, "project": self.ID, "task": task.ID, "action": "add assignee"})
             else:
                 console.print(f"Member ({get_username(member)}) is already assigned to the task.", style="Error")
         else:
@@ -953,8 +1377,9 @@ class Project:
         if userID in task.assignees:
             task.assignees.remove(userID)
             console.print(f"Member '{get_username(userID)}' removed from task successfully.", style="Notice")
-            self.save_project_data()
-            logger.debug(f"An assignee [user : {get_username(userID)}] removed from task.")
+            self.save_task(task)
+            logger.debug("An assignee [user : %s] removed from task.", _Username(userID),
+                         extra={"user": userID, "project": self.ID, "task": task.ID, "action": "remove assignee"})
         else:
             console.print(f"Member '{get_username(userID)}' is not assigned to the task.", style="Error")
         
@@ -1044,10 +1469,10 @@ class Project:
         description = input("Task Description: ")
         # Add the new task to the project's task list and save project data
         new_task = Task(title , description)
-        self.tasks[new_task.ID]=vars(new_task)
-        self.save_project_data()
+        self.save_task(new_task)
         console.print("Task created successfully.", style="Notice")
-        logger.info(f"A new task [name : {new_task.title} , id : [{new_task.ID}]] created by [{user.username}]")
+        logger.info("A new task [name : %s , id : [%s]] created by [%s]", new_task.title, new_task.ID, user.username,
+                    extra={"user": user.ID, "project": self.ID, "task": new_task.ID, "action": "create task"})
         wait_for_key_press()
             
         
@@ -1059,7 +1484,8 @@ class Project:
                 # Delete the task from the project's task list
                 del self.tasks[task.ID]
                 console.print(f"Task has deleted successfully" , style='Notice')
-                logger.debug(f"Task [id = {task.ID}] deleted by user [user = {user.username}]")
+                logger.debug("Task [id = %s] deleted by user [user = %s]", task.ID, user.username,
+                             extra={"user": user.ID, "project": self.ID, "task": task.ID, "action": "delete task"})
                 wait_for_key_press()
                 return True
         else:
@@ -1086,56 +1512,30 @@ class Project:
                 main_table.add_column("DONE", style="green", justify="center", width=50)
                 main_table.add_column("ARCHIVED", style="blue", justify="center", width=50)
 
-                # Create sub-tables for each status
-                backlog_table = Table()
-                todo_table = Table()
-                doing_table = Table()
-                done_table = Table()
-                archived_table = Table()
-
-                # Fill sub-tables with tasks based on their status
-                backlog_table.add_column("ID", justify="center", width=50)
-                backlog_table.add_column("Title", justify="center", width=50)
-                todo_table.add_column("ID", justify="center", width=50)
-                todo_table.add_column("Title", justify="center", width=50)
-                doing_table.add_column("ID", justify="center", width=50)
-                doing_table.add_column("Title", justify="center", width=50)
-                done_table.add_column("ID", justify="center", width=50)
-                done_table.add_column("Title", justify="center", width=50)
-                archived_table.add_column("ID", justify="center", width=50)
-                archived_table.add_column("Title", justify="center", width=50)
-
-                for task in self.tasks.values():
-                    instance_task = Task(**task)
-                    if instance_task.status == "BACKLOG":
-                        backlog_table.add_row(instance_task.ID, instance_task.title)
-                    elif instance_task.status == "TODO":
-                        todo_table.add_row(instance_task.ID, instance_task.title)
-                    elif instance_task.status == "DOING":
-                        doing_table.add_row(instance_task.ID, instance_task.title)
-                    elif instance_task.status == "DONE":
-                        done_table.add_row(instance_task.ID, instance_task.title)
-                    else:
-                        archived_table.add_row(instance_task.ID, instance_task.title)
-
-                main_table.add_row(backlog_table if len(backlog_table.rows) != 0 else "No task Available",
-                                todo_table if len(todo_table.rows) != 0 else "No task Available",
-                                doing_table if len(doing_table.rows) != 0 else "No task Available",
-                                done_table if len(done_table.rows) != 0 else "No task Available",
-                                archived_table if len(archived_table.rows) != 0 else "No task Available")
+                # Create a sub-table for each status from the project's status index
+                status_tables = []
+                for status in Status:
+                    tasks = self.index.by_status(status)
+                    if not tasks:
+                        status_tables.append("No task Available")
+                        continue
+                    table = Table()
+                    table.add_column("ID", justify="center", width=50)
+                    table.add_column("Title", justify="center", width=50)
+                    for task in tasks:
+                        table.add_row(task.ID, task.title)
+                    status_tables.append(table)
+
+                main_table.add_row(*status_tables)
 
                 console.print(main_table)
 
                 task_id = input("Enter task ID to manage (or press ENTER to go back): ")
                 if task_id == "":
                     return
-                flag = False
-                for task in self.tasks.values():
-                    if task["ID"] == task_id:
-                        self.manage_task(user, Task(**task))
-                        flag = True
-                        break
-                if not flag:
+                if task_id in self.tasks:
+                    self.manage_task(user, self.tasks[task_id])
+                else:
                     console.print("Invalid Task ID", style="Error")
                     wait_for_key_press()
 
@@ -1153,7 +1553,8 @@ class Project:
         # Create a new project with the entered title and user's ID and save project data to file
         project = Project(title, user.ID)
         project.save_project_data()
-        logger.info(f"A new project [name: {project.title}, id: {project.ID}] created by [{user.username}]")
+        logger.info("A new project [name: %s, id: %s] created by [%s]", project.title, project.ID, user.username,
+                    extra={"user": user.ID, "project": project.ID, "action": "create project"})
         User.add_my_project(user.username, project.ID)
         console.print("Project created successfully.", style="Notice")
         wait_for_key_press()
@@ -1172,15 +1573,19 @@ class Project:
         # Confirm project deletion
         choice = input("Are you sure? (y/n)")
         if choice == 'y':
-            file_path = f"projects/{self.ID}.json"
             try:
-                # Remove project file
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-                    for member in self.collaborators:
-                        User.remove_project(member, self.ID)
+                # Remove project data
+                with get_storage().lock(f"project-{self.ID}"):
+                    deleted = get_storage().delete_project(self.ID)
+                    if deleted:
+                        get_storage().update_assignments(self.ID, self._assignment_changes(self._saved_tasks, removed=True))
+                        for index in derived_indexes(get_storage()):
+                            index.remove_project(self.ID)
+                if deleted:
+                    self._update_member_lists(removed=self.collaborators)
                     console.print(f"Project '{self.title}' has been deleted successfully.", style="Notice")
-                    logger.info(f"Project [id: {self.ID}] deleted by owner [user: {user.username}]")
+                    logger.info("Project [id: %s] deleted by owner [user: %s]", self.ID, user.username,
+                                extra={"user": user.ID, "project": self.ID, "action": "delete project"})
                     wait_for_key_press()
                     return True
                 else:
@@ -1206,7 +1611,9 @@ class Project:
             console.print("4. Add Member")
             console.print("5. Remove Member")
             console.print("6. Delete Project")
-            console.print("7. Back")
+            console.print("7. Search Tasks")
+            console.print("8. Deadlines")
+            console.print("9. Back")
 
             choice = input("Enter your choice: ")
             if choice == "1":
@@ -1216,15 +1623,21 @@ class Project:
             elif choice == "3":
                 self.view_members()
             elif choice == "4":
-                self.add_member_menu(user)
+                with self.batch():
+                    self.add_member_menu(user)
                 wait_for_key_press()
             elif choice == "5":
-                self.remove_member_menu(user)
+                with self.batch():
+                    self.remove_member_menu(user)
                 wait_for_key_press()
             elif choice == "6":
                 if self.delete_project(user):
                     break
             elif choice == "7":
+                Project.search_tasks(user, self)
+            elif choice == "8":
+                Project.view_deadlines(user, self)
+            elif choice == "9":
                 break
             else:
                 console.print("Invalid choice.", style="Error")
@@ -1251,34 +1664,28 @@ class Project:
             # Handle field change choices
             if choice == "1":
                 if task.change_status():
-                    task.add_to_history(user.ID, action="change status", new_amount=task.status)
-                    self.update_task(task)
-                    self.save_project_data()
+                    task.add_to_history(user.ID, action="change status", new_amount=task.status.value)
+                    self.save_task(task)
             elif choice == "2":
                 if task.change_priority():
-                    task.add_to_history(user.ID, action="change priority", new_amount=task.priority)
-                    self.update_task(task)
-                    self.save_project_data()
+                    task.add_to_history(user.ID, action="change priority", new_amount=task.priority.value)
+                    self.save_task(task)
             elif choice == "3":
                 if task.change_start_time():
                     task.add_to_history(user.ID, action="change start time", new_amount=task.start_time)
-                    self.update_task(task)
-                    self.save_project_data()
+                    self.save_task(task)
             elif choice == "4":
                 if task.change_end_time():
                     task.add_to_history(user.ID, action="change end time", new_amount=task.end_time)
-                    self.update_task(task)
-                    self.save_project_data()
+                    self.save_task(task)
             elif choice == "5":
                 if task.change_title():
                     task.add_to_history(user.ID, action="change title", new_amount=task.title)
-                    self.update_task(task)
-                    self.save_project_data()
+                    self.save_task(task)
             elif choice == "6":
                 if task.change_description():
                     task.add_to_history(user.ID, action="change description", new_amount=task.description)
-                    self.update_task(task)
-                    self.save_project_data()
+                    self.save_task(task)
             elif choice == "7":
                 break
             else:
@@ -1309,9 +1716,8 @@ class Project:
             choice = input("Enter your choice: ")
             # Handle task management choices
             if choice == "1":
+                # every field change is already saved by change_task_fields
                 self.change_task_fields(user, task)
-                self.update_task(task)
-                self.save_project_data()
 
             elif choice == "2":
                 self.manage_comments(task, user)
@@ -1320,11 +1726,11 @@ class Project:
                 self.manage_assignees(task, user)
 
             elif choice == "4":
-                task.view_history()
+                task.view_history(self.ID)
 
             elif choice == "5":
                 if self.delete_task(task, user):
-                    self.save_project_data()
+                    self.delete_task_data(task.ID)
                     break
             elif choice == "6":
                 break
@@ -1353,20 +1759,17 @@ class Project:
             elif choice == "2":
                 if task.add_comment(user.ID, user.ID == self.owner):
                     task.add_to_history(user.ID, action="add comment", message=task.comments[-1])
-                    self.update_task(task)
-                    self.save_project_data()
+                    self.save_task(task)
 
             elif choice == "3":
                 if task.edit_comment(user):
                     task.add_to_history(user.ID, action="edit comment", new_amount="VIEW EDITED MESSAGE IN VIEW COMMENTS")
-                    self.update_task(task)
-                    self.save_project_data()
+                    self.save_task(task)
                 
             elif choice == "4":
                 if task.remove_comment(user):
                     task.add_to_history(user.ID, action="remove comment", new_amount="MESSAGE REMOVED")
-                    self.update_task(task)
-                    self.save_project_data()
+                    self.save_task(task)
             
             elif choice == "5":
                 break
@@ -1390,15 +1793,16 @@ class Project:
                 self.view_assignees(task)
 
             elif choice == "2":
-                self.assign_member_menu(task, user)
-                self.update_task(task)
-                self.save_project_data()
+                # assigning several members is saved once
+                with self.batch():
+                    self.assign_member_menu(task, user)
+                    self.save_task(task)
                 wait_for_key_press()
 
             elif choice == "3":
-                self.remove_assignee_menu(task, user)
-                self.update_task(task)
-                self.save_project_data()
+                with self.batch():
+                    self.remove_assignee_menu(task, user)
+                    self.save_task(task)
                 wait_for_key_press()
 
             elif choice == "4":
@@ -1407,6 +1811,212 @@ class Project:
                 console.print("Invalid choice.", style="Error")
                 wait_for_key_press()
 
+    def search_tasks(user: User, project=None):
+        """
+        search task titles, descriptions and comments in every project of
+        the user, or only in 'project', and open a task from the results
+
+        """
+        storage = get_storage()
+        if project is not None:
+            project_ids = [project.ID]
+        else:
+            data = User.load_user_projects(user.username)
+            project_ids = data["projects"] if data is not None else []
+        while True:
+            clear_screen()
+            console.print("|Searching Tasks|\n", style="Title")
+            console.print("Words must all match; end a word with * to match its beginning (e.g. 'desi*').", style="Info")
+            query = input("Search (or press ENTER to go back): ")
+            if query == "":
+                return
+            results = get_search_index(storage).search(query, project_ids)
+            summaries = storage.load_project_summaries({result["project"] for result in results})
+            results = [result for result in results if result["project"] in summaries]
+            if not results:
+                console.print("No matching tasks.", style="Error")
+                wait_for_key_press()
+                continue
+
+            table = Table(title=f"Results for '{query}'")
+            table.add_column("No.", style="cyan", justify="center", width=5)
+            table.add_column("Project", style="magenta", justify="center", width=15)
+            table.add_column("Task", style="green", justify="center", width=25)
+            table.add_column("Score", style="yellow", justify="center", width=8)
+            for i, result in enumerate(results, start=1):
+                table.add_row(str(i), summaries[result["project"]]["title"], result["title"], f"{result['score']:.2f}")
+            console.print(table)
+
+            number = input("Enter result number to manage the task (or press ENTER to search again): ")
+            if number.isdigit() and 1 <= int(number) <= len(results):
+                result = results[int(number) - 1]
+                opened = project if project is not None else Project.open(result["project"])
+                if result["task"] in opened.tasks:
+                    opened.manage_task(user, opened.tasks[result["task"]])
+            elif number != "":
+                console.print("Invalid number", style="Error")
+                wait_for_key_press()
+
+    def view_deadlines(user: User, project=None):
+        """
+        list overdue tasks and tasks due in the next hours from the
+        deadline index, for the tasks assigned to the user or for every
+        task of the user's projects (or only of 'project')
+
+        """
+        storage = get_storage()
+        if project is not None:
+            project_ids = [project.ID]
+        else:
+            data = User.load_user_projects(user.username)
+            project_ids = data["projects"] if data is not None else []
+        hours = 24
+        mine = True
+        while True:
+            index = get_deadline_index(storage)
+            now = datetime.now().replace(microsecond=0)
+            filters = {"user_ID": user.ID if mine else None, "project_ids": project_ids}
+            rows = index.overdue(now, **filters) + index.due_within(hours, now, **filters)
+            summaries = storage.load_project_summaries({row["project"] for row in rows})
+            # rows of projects deleted by another session are skipped
+            rows = [row for row in rows if row["project"] in summaries]
+
+            clear_screen()
+            console.print("|Deadlines|\n", style="Title")
+            scope = "assigned to me" if mine else "all tasks"
+            table = Table(title=f"Overdue and due in the next {hours} hours ({scope})")
+            table.add_column("No.", style="cyan", justify="center", width=5)
+            table.add_column("Project", style="magenta", justify="center", width=15)
+            table.add_column("Task", style="green", justify="center", width=20)
+            table.add_column("Priority", style="red", justify="center", width=10)
+            table.add_column("End Time", style="blue", justify="center", width=20)
+            table.add_column("Due", style="yellow", justify="center", width=12)
+            for i, row in enumerate(rows, start=1):
+                left = row["end_time"] - now
+                due = "OVERDUE" if row["end_time"] < now else f"in {left.days * 24 + left.seconds // 3600}h {left.seconds // 60 % 60}m"
+                table.add_row(str(i), summaries[row["project"]]["title"], row["title"], row["priority"],
+                              row["end_time"].strftime("%Y-%m-%d %H:%M:%S"), due)
+            console.print(table)
+            if not rows:
+                console.print("No pending deadlines.", style="Notice")
+
+            console.print("1. Open Task")
+            console.print("2. Change Time Window")
+            console.print("3. Show All Tasks" if mine else "3. Show My Tasks")
+            console.print("4. Back")
+            choice = input("Enter your choice: ")
+            if choice == "1":
+                number = input("Enter task number to manage (or press ENTER to go back): ")
+                if number.isdigit() and 1 <= int(number) <= len(rows):
+                    row = rows[int(number) - 1]
+                    opened = project if project is not None else Project.open(row["project"])
+                    if row["task"] in opened.tasks:
+                        opened.manage_task(user, opened.tasks[row["task"]])
+                elif number != "":
+                    console.print("Invalid number", style="Error")
+                    wait_for_key_press()
+            elif choice == "2":
+                number = input("Show tasks due in the next how many hours? ")
+                if number.isdigit() and int(number) > 0:
+                    hours = int(number)
+                else:
+                    console.print("Invalid number of hours", style="Error")
+                    wait_for_key_press()
+            elif choice == "3":
+                mine = not mine
+            elif choice == "4":
+                break
+            else:
+                console.print("Invalid choice.", style="Error")
+                wait_for_key_press()
+
+    def view_user_tasks(user: User):
+        """
+        list the tasks assigned to the user in every project from the
+        assignee index, with status/priority filters and sorting
+
+        """
+        sort_keys = {
+            "1": ("due date", lambda row: row["end_time"]),
+            "2": ("priority", lambda row: list(Priority).index(Priority(row["priority"]))),
+            "3": ("status", lambda row: list(Status).index(Status(row["status"]))),
+            "4": ("project", lambda row: row["project_title"].lower()),
+        }
+        status_filter = priority_filter = None
+        sort_by = "1"
+        while True:
+            storage = get_storage()
+            rows = storage.load_assignments(user.ID)
+            summaries = storage.load_project_summaries({row["project"] for row in rows})
+            # rows of projects deleted by another session are skipped
+            rows = [dict(row, project_title=summaries[row["project"]]["title"]) for row in rows if row["project"] in summaries]
+            if not rows:
+                console.print("You don't have any assigned tasks to display.", style="Error")
+                wait_for_key_press()
+                return
+            if status_filter is not None:
+                rows = [row for row in rows if row["status"] == status_filter]
+            if priority_filter is not None:
+                rows = [row for row in rows if row["priority"] == priority_filter]
+            rows.sort(key=sort_keys[sort_by][1])
+
+            clear_screen()
+            console.print(f"|{user.username}'s Tasks|\n", style="Title")
+            filters = ", ".join(f for f in (status_filter, priority_filter) if f is not None) or "none"
+            table = Table(title=f"Sorted by {sort_keys[sort_by][0]} (filters: {filters})")
+            table.add_column("No.", style="cyan", justify="center", width=5)
+            table.add_column("Project", style="magenta", justify="center", width=15)
+            table.add_column("Task", style="green", justify="center", width=20)
+            table.add_column("Status", style="yellow", justify="center", width=10)
+            table.add_column("Priority", style="red", justify="center", width=10)
+            table.add_column("End Time", style="blue", justify="center", width=20)
+            for i, row in enumerate(rows, start=1):
+                table.add_row(str(i), row["project_title"], row["title"], row["status"], row["priority"], row["end_time"])
+            console.print(table)
+
+            console.print("1. Open Task")
+            console.print("2. Filter By Status")
+            console.print("3. Filter By Priority")
+            console.print("4. Sort")
+            console.print("5. Clear Filters")
+            console.print("6. Back")
+            choice = input("Enter your choice: ")
+            if choice == "1":
+                number = input("Enter task number to manage (or press ENTER to go back): ")
+                if number.isdigit() and 1 <= int(number) <= len(rows):
+                    row = rows[int(number) - 1]
+                    project = Project.open(row["project"])
+                    if row["task"] in project.tasks:
+                        project.manage_task(user, project.tasks[row["task"]])
+                elif number != "":
+                    console.print("Invalid number", style="Error")
+                    wait_for_key_press()
+            elif choice == "2":
+                for idx, status in enumerate(Status, start=1):
+                    console.print(f"{idx}. {status.value}")
+                number = input("Enter the number of the status to show: ")
+                if number.isdigit() and 1 <= int(number) <= len(Status):
+                    status_filter = list(Status)[int(number) - 1].value
+            elif choice == "3":
+                for idx, priority in enumerate(Priority, start=1):
+                    console.print(f"{idx}. {priority.value}")
+                number = input("Enter the number of the priority to show: ")
+                if number.isdigit() and 1 <= int(number) <= len(Priority):
+                    priority_filter = list(Priority)[int(number) - 1].value
+            elif choice == "4":
+                for key, (name, _) in sort_keys.items():
+                    console.print(f"{key}. {name.capitalize()}")
+                number = input("Sort by: ")
+                if number in sort_keys:
+                    sort_by = number
+            elif choice == "5":
+                status_filter = priority_filter = None
+            elif choice == "6":
+                break
+            else:
+                console.print("Invalid choice.", style="Error")
+                wait_for_key_press()
+
     def view_user_projects(user: User):
         """
         load the user's projects.json file and 
@@ -1416,8 +2026,9 @@ class Project:
         
         data = User.load_user_projects(user.username)
         if data is not None and len(data['projects']) != 0:
-            # Load user's projects if they exist
-            user_projects = [Project.load_project_data(proj_id) for proj_id in data["projects"]]
+            # Only the project summaries are loaded; the full project is opened when it is selected
+            summaries = get_storage().load_project_summaries(data["projects"])
+            user_projects = [summaries[proj_id] for proj_id in data["projects"] if proj_id in summaries]
 
         else:
             console.print("You don't have any projects to display.", style="Error")
@@ -1432,10 +2043,15 @@ class Project:
         table.add_column("ID", style="magenta", justify="center", width=15)
         table.add_column("Title", style="green", justify="center", width=15)
         table.add_column("Owner", style="yellow", justify="center", width=15)
+        table.add_column("Members", style="blue", justify="center", width=8)
+        table.add_column("Tasks", style="white", justify="center", width=12)
 
         project_map = {}
         for i, project in enumerate(user_projects, start=1):
-            table.add_row(str(i), project["ID"], project["title"], get_username(project["owner"]))
+            tasks = sum(project["tasks"].values())
+            done = project["tasks"].get(Status.DONE.value, 0)
+            table.add_row(str(i), project["ID"], project["title"], get_username(project["owner"]),
+                          str(project["members"]), f"{tasks} ({done} done)")
             project_map[str(i)] = project
         console.print(table)
 
@@ -1446,8 +2062,9 @@ class Project:
             if project_number in project_map:
                 # Manage the selected project
                 project = project_map[project_number]
-                project_instance = Project(**project)
-                logger.debug(f"User [{user.username}] is managing project [id: {project_instance.ID}]")
+                project_instance = Project.open(project["ID"])
+                logger.debug("User [%s] is managing project [id: %s]", user.username, project_instance.ID,
+                             extra={"user": user.ID, "project": project_instance.ID, "action": "open project"})
                 project_instance.manage_project_menu(user)
                 break
             else:
@@ -1478,6 +2095,8 @@ def main_menu():
                 user_menu(user)
         elif choice == "3":
             console.print("Thank you for using the Project Management System. Have a great day!", style="Notice")
+            if hasher.metrics():
+                logger.info("Password hashing (cost %d): %s", hasher.rounds, hasher.metrics())
             logger.info("EXIT (end of program)")
             break
         else:
@@ -1492,8 +2111,11 @@ def user_menu(user: User):
         console.print("What would you like to do?", style="Info")
         console.print("1. Create Project")
         console.print("2. View Projects")
-        console.print("3. Edit Profile")
-        console.print("4. Logout")
+        console.print("3. My Tasks")
+        console.print("4. Deadlines")
+        console.print("5. Search Tasks")
+        console.print("6. Edit Profile")
+        console.print("7. Logout")
 
         choice = input("Enter your choice: ")
         if choice == "1":
@@ -1501,40 +2123,167 @@ def user_menu(user: User):
         elif choice == "2":
             Project.view_user_projects(user)
         elif choice == "3":
-            User.edit_profile_menu(user)
+            Project.view_user_tasks(user)
         elif choice == "4":
+            Project.view_deadlines(user)
+        elif choice == "5":
+            Project.search_tasks(user)
+        elif choice == "6":
+            User.edit_profile_menu(user)
+        elif choice == "7":
             console.print("You have been successfully logged out.", style="Notice")
-            logger.info(f"User [{user.username}] logged out")
+            logger.info("User [%s] logged out", user.username, extra={"user": user.ID, "action": "logout"})
             wait_for_key_press()
             break
         else:
             console.print("Invalid choice.", style="Error")
             wait_for_key_press()
             
+# Fields of a stored task, list fields and derived indexes (see derived_indexes): their positions
+# in the digests _SavedTask keeps
+_FIELD_POSITIONS = {key: position for position, key in enumerate(
+    ("title", "description", "priority", "status", "ID", "start_time", "end_time", "assignees", "comments", "history"))}
+_LIST_POSITIONS = {key: position for position, key in enumerate(("assignees", "comments", "history"))}
+_INDEX_TYPES = (SearchIndex, DeadlineIndex)
+_INDEX_POSITIONS = {index_type.NAME: position for position, index_type in enumerate(_INDEX_TYPES)}
+# Bytes of one digest
+_DIGEST_SIZE = 16
+
+
+def _digest(value):
+    # Digest of a JSON value, used by Project's dirty tracking
+    return hashlib.blake2b(json.dumps(value, sort_keys=True).encode("utf-8"), digest_size=_DIGEST_SIZE).digest()
+
+
+def _part(digests, position):
+    # The digest at 'position' of a joined group of digests
+    return digests[position * _DIGEST_SIZE:(position + 1) * _DIGEST_SIZE]
+
+
+class _SavedTask:
+    """
+    What Project's dirty tracking keeps of a task as last saved instead of
+    a copy of it: a digest of every field, the digests of the items of its
+    list fields (all the three-way merge needs of the base), the assignees
+    (for the assignee index) and the digest of its entry in each derived
+    index. Each group of digests is one bytes object. Snapshots of the same
+    stored form are equal.
+    """
+
+    __slots__ = ("fields", "items", "assignees", "entries")
+
+    def __init__(self, task):
+        self.fields = b"".join(_digest(task.get(key)) for key in _FIELD_POSITIONS)
+        self.items = tuple(b"".join(map(_digest, task.get(key) or ())) for key in _LIST_POSITIONS)
+        self.assignees = tuple(task["assignees"])
+        self.entries = b"".join(_digest(index_type.entry(task)) for index_type in _INDEX_TYPES)
+
+    def __eq__(self, other):
+        return isinstance(other, _SavedTask) and self.fields == other.fields
+
+    def field(self, key):
+        # Digest of the saved value of 'key' (None for a field tasks do not have)
+        return _part(self.fields, _FIELD_POSITIONS[key]) if key in _FIELD_POSITIONS else None
+
+    def entry(self, index):
+        # Digest of the saved task's entry in the derived index 'index'
+        return _part(self.entries, _INDEX_POSITIONS[index.NAME])
+
+    def item_digests(self, key):
+        # Digests of the saved items of the list field 'key'
+        items = self.items[_LIST_POSITIONS[key]]
+        return {_part(items, position) for position in range(len(items) // _DIGEST_SIZE)}
+
+
+def _parse_time(value):
+    # Task times are stored as "YYYY-MM-DD HH:MM:SS"; datetimes pass through
+    if isinstance(value, datetime):
+        return value.replace(microsecond=0)
+    return datetime.fromisoformat(value[:19])
+
+
+class _StoredTasks(Mapping):
+    # Read-only {task ID: task dict} view of Project.tasks handed to storage;
+    # a task is converted with to_dict() only when the backend reads it, and
+    # only once per save (the file write and the summary both read every task).
+    __slots__ = ("_tasks", "_converted")
+
+    def __init__(self, tasks):
+        self._tasks = tasks
+        self._converted = {}
+
+    def __getitem__(self, task_id):
+        data = self._converted.get(task_id)
+        if data is None:
+            data = self._converted[task_id] = self._tasks[task_id].to_dict()
+        return data
+
+    def __iter__(self):
+        return iter(self._tasks)
+
+    def __len__(self):
+        return len(self._tasks)
+
+
+def _merge_list(base, ours, theirs, key=None):
+    # Three-way list merge: their list plus our additions, minus our removals
+    # ('base' holds key(item) of the base items when a key is given)
+    def in_base(item):
+        return (key(item) if key is not None else item) in base
+    merged = [item for item in theirs if item in ours or not in_base(item)]
+    merged += [item for item in ours if not in_base(item) and item not in merged]
+    return merged
+
+
+def _merge_fields(base, ours, theirs):
+    # Three-way merge of two versions of a task dict against the _SavedTask 'base';
+    # returns (merged, clashing fields)
+    merged, clashes = {}, []
+    for key, our_value in ours.items():
+        base_digest, their_value = base.field(key), theirs.get(key)
+        if our_value == their_value or _digest(our_value) == base_digest:
+            merged[key] = their_value
+        elif _digest(their_value) == base_digest:
+            merged[key] = our_value
+        elif isinstance(our_value, list) and isinstance(their_value, list) and key in _LIST_POSITIONS:
+            merged[key] = _merge_list(base.item_digests(key), our_value, their_value, key=_digest)
+        else:
+            merged[key] = our_value
+            clashes.append(key)
+    return merged, clashes
+
+
+def derived_indexes(storage):
+    # Indexes rebuilt from the projects that Project keeps in step on every save
+    return (get_search_index(storage), get_deadline_index(storage))
+
+
+class _Username:
+    # A user ID that is looked up only when a log message is actually written
+    __slots__ = ("ID",)
+
+    def __init__(self, ID):
+        self.ID = ID
+
+    def __str__(self):
+        return get_username(self.ID)
+
+
 def get_username(ID):
-    # Function to retrieve username based on ID
-    data = {}
+    # Function to retrieve username based on ID (served from the shared directory cache)
     try:
-        with open("emails_and_usernames.json", 'r') as file:
-            data = json.load(file)
+        return directory.username(ID)
     except FileNotFoundError:
         logger.error("Problem with [emails_and_usernames.json]")
         raise FileNotFoundError("File Error. Terminating Program")
-    return data["usernames"][ID]
     
 def get_ID(username):
-    # Function to retrieve ID based on username
-    data = {}
+    # Function to retrieve ID based on username (served from the shared directory cache)
     try:
-        with open("emails_and_usernames.json", 'r') as file:
-            data = json.load(file)
+        return directory.ID(username)
     except FileNotFoundError:
         logger.error("Problem with [emails_and_usernames.json]")
         raise FileNotFoundError("File Error. Terminating Program")
-         
-    for ID in data['usernames']:
-        if data['usernames'][ID] == username:
-            return ID 
     
 
 #.........................#
@@ -1543,4 +2292,8 @@ def get_ID(username):
 
 # Start the main menu loop when the script is executed
 if __name__ == "__main__":
-    main_menu()
\ No newline at end of file
+    if "--startup-profile" in sys.argv[1:]:
+        from startup import print_startup_profile
+        print_startup_profile("main")
+    else:
+        main_menu()
\ No newline at end of file
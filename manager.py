@@ -2,50 +2,20 @@ import argparse
 import json
 import os
 import base64
-import shutil
-import logging
-import platform
-from rich.console import Console
-from rich.theme import Theme
-
-CUSTOM_THEME = Theme({
-    "Title": "bold Magenta",
-    "Info": "blue",
-    "Notice": "bold green",
-    "Error": "bold red"
-})
-
-console = Console(theme=CUSTOM_THEME)
-
-logger = logging.getLogger("__manager__")
-logger.setLevel(logging.DEBUG)
-handler = logging.FileHandler('logs.log', mode='a')
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-handler.setFormatter(formatter)
-logger.addHandler(handler)
-
-
-def clear_screen():
-    os.system('cls' if os.name == 'nt' else 'clear')
-
-
-def wait_for_key_press():
-    console.print("\nPress any key to continue...", style="yellow")
-    if platform.system().lower() == 'windows':
-        import msvcrt
-        return msvcrt.getch()
-    else:
-        import sys
-        import tty
-        import termios
-        fd = sys.stdin.fileno()
-        old_settings = termios.tcgetattr(fd)
-        try:
-            tty.setraw(fd)
-            ch = sys.stdin.read(1)
-        finally:
-            termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
-        return ch
+from datetime import datetime
+from terminal import clear_screen, console, wait_for_key_press
+from registry import directory
+from storage import get_storage
+from search import get_search_index
+from deadlines import get_deadline_index
+from userstatus import get_user_status_index
+from fileio import atomic_write
+from logsetup import get_logger
+
+logger = get_logger("__manager__")
+
+# Most user records rewritten at the same time by the bulk activate/deactivate subcommands
+MAX_WORKERS = 8
 
 
 class Manager:
@@ -64,8 +34,7 @@ class Manager:
             "password": base64.b64encode(self.password.encode("utf-8")).decode("utf-8")
         }
         
-        with open("manager_info.json", "w") as admin_file:
-            json.dump(admin_info, admin_file)
+        atomic_write("manager_info.json", json.dumps(admin_info))
         console.print("Admin info created successfully.", style="Notice")
         logger.info("Manager has created successfully")
     
@@ -89,6 +58,21 @@ class Manager:
             console.print("Invalid username or password.", style='Error')
             exit()
             
+    def check_credentials(self):
+        # Exits unless the admin credentials given on the command line are correct
+        data = {}
+        try:
+            with open("manager_info.json", 'r') as file:
+                data = json.load(file)
+        except FileNotFoundError:
+            console.print("Manager is not defined.", style='Error')
+            console.print("Create Manager first.", style='Error')
+            exit()
+
+        if data['username'] != self.username or base64.b64decode(data['password']).decode("utf-8") != self.password:
+            console.print("Invalid username or password.", style='Error')
+            exit()
+
     def manager_menu(self):
         while True:
             clear_screen()
@@ -96,8 +80,9 @@ class Manager:
             console.print("What would you like to do?", style="Info")
             console.print("1. Deactivate a user")
             console.print("2. Activate a user")
-            console.print("3. Delete database")
-            console.print("4. Log out")
+            console.print("3. List inactive users")
+            console.print("4. Delete database")
+            console.print("5. Log out")
 
             choice = input("Enter your choice: ")
             if choice == '1':
@@ -105,12 +90,16 @@ class Manager:
 
             elif choice == '2':
                 Manager.activate_user_menu()
-            
+
             elif choice == '3':
-                self.purge_data(is_run=True)
+                Manager.list_users(active=False)
                 wait_for_key_press()
             
             elif choice == '4':
+                self.purge_data(is_run=True)
+                wait_for_key_press()
+            
+            elif choice == '5':
                 console.print("You have been successfully logged out.", style="Notice")
                 logger.info("End of Manager program")
                 exit()
@@ -121,35 +110,29 @@ class Manager:
     
     @staticmethod 
     def load_users():
-        #get usernames from file and return the data
-        if not os.path.exists("emails_and_usernames.json"):
+        #get usernames from the registry and return the data
+        try:
+            return directory.usernames()
+        except FileNotFoundError:
             console.print("User info file not found.", style="Error")
             wait_for_key_press()
             return
-        
-        with open("emails_and_usernames.json", "r") as user_file:
-            users_data = json.load(user_file)
-        return list(users_data["usernames"].values())
 
     @staticmethod
     def deactivate_user(username):
-        #open user's data file and change user status to False 
-        path = f"users/{username}/{username}.json"
-        user_data = {}
-        with open(path , 'r') as file :
-            user_data = json.load(file)
+        #load user's data and change user status to False 
+        user_data = get_storage().load_user(username)
         
         if user_data["active"] == False:
             console.print(f"User ({username}) has already been deactivated.", style='Error')
             return
         
         user_data["active"] = False
-        
-        with open (path , 'w') as file:
-            json.dump(user_data,file,indent=4)
+        get_storage().save_user(user_data)
+        get_user_status_index(get_storage()).update_users([user_data])
         
         console.print(f"User ({username}) has been deactivated successfully.", style='Notice')
-        logger.info(f"User ({username}) deactivated by Manager")
+        logger.info("User (%s) deactivated by Manager", username, extra={"user": user_data["ID"], "action": "deactivate"})
 
     @staticmethod
     def deactivate_user_menu():
@@ -165,8 +148,9 @@ class Manager:
         if selected_usernames[0] == '':
             return
         
+        known = set(all_usernames)
         for username in selected_usernames:
-            if username not in all_usernames:
+            if username not in known:
                 console.print(f"User {username} does not exist.", style='Error')
                 continue
             Manager.deactivate_user(username)
@@ -174,23 +158,19 @@ class Manager:
 
     @staticmethod
     def activate_user(username):
-        #open user's data file and change user status to True
-        path = f"users/{username}/{username}.json"
-        user_data = {}
-        with open(path , 'r') as file :
-            user_data = json.load(file)
+        #load user's data and change user status to True
+        user_data = get_storage().load_user(username)
         
         if user_data["active"] == True:
             console.print(f"User ({username}) is active." , style='Error')
             return
         
         user_data["active"] = True
-        
-        with open (path , 'w') as file:
-            json.dump(user_data,file,indent=4)
+        get_storage().save_user(user_data)
+        get_user_status_index(get_storage()).update_users([user_data])
         
         console.print(f"User ({username}) has been activated successfully.", style='Notice')
-        logger.info(f"User ({username}) activated by Manager")
+        logger.info("User (%s) activated by Manager", username, extra={"user": user_data["ID"], "action": "activate"})
         
     @staticmethod
     def activate_user_menu():
@@ -205,13 +185,144 @@ class Manager:
         if selected_usernames[0] == '':
             return
         
+        known = set(all_usernames)
         for username in selected_usernames:
-            if username not in all_usernames:
+            if username not in known:
                 console.print(f"User {username} does not exist.", style='Error')
                 continue
             Manager.activate_user(username)
         wait_for_key_press()
             
+    @staticmethod
+    def list_users(active=None, pattern=None, inactive_since=None, count_only=False):
+        # Lists (or counts) users by status from the status index, without opening user files
+        index = get_user_status_index(get_storage())
+        if count_only and pattern is None and inactive_since is None:
+            active_count, inactive_count = index.counts()
+            console.print(f"{active_count} active, {inactive_count} inactive user(s).", style="Notice")
+            return
+        usernames = index.select(active=active, pattern=pattern, inactive_since=inactive_since)
+        if not count_only:
+            for username in usernames:
+                console.print("-", username)
+        console.print(f"{len(usernames)} user(s).", style="Notice")
+
+    @staticmethod
+    def select_users(active, from_file=None, pattern=None, inactive_since=None):
+        """
+        Users the bulk subcommands would give status 'active', from the
+        status index: those listed in 'from_file' (one username per line,
+        '#' comments allowed), matching the 'pattern' glob and last logged
+        in before the 'inactive_since' day. Every filter given applies.
+        Returns (selected usernames, unknown usernames from the file,
+        number of matching users that already have the status).
+        """
+        usernames, unknown = None, []
+        if from_file is not None:
+            with open(from_file, "r") as file:
+                lines = (line.strip() for line in file)
+                usernames = list(dict.fromkeys(line for line in lines if line and not line.startswith("#")))
+            known = set(directory.usernames())
+            unknown = [username for username in usernames if username not in known]
+        index = get_user_status_index(get_storage())
+        selected = index.select(active=not active, pattern=pattern, inactive_since=inactive_since, usernames=usernames)
+        already = index.select(active=active, pattern=pattern, inactive_since=inactive_since, usernames=usernames)
+        return selected, unknown, len(already)
+
+    @staticmethod
+    def _change_status(username, active):
+        # Worker: rewrites one user record; returns it, or None when it already had the status
+        user_data = get_storage().load_user(username)
+        if user_data["active"] == active:
+            return None
+        user_data["active"] = active
+        get_storage().save_user(user_data)
+        return user_data
+
+    @staticmethod
+    def set_users_active(usernames, active, workers=MAX_WORKERS):
+        """
+        Activate or deactivate 'usernames' on a pool of 'workers' threads
+        and update the status index once at the end. Every user is
+        attempted; returns (changed, unchanged, failed) where failed maps
+        a username to the error that stopped its update.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+        action = "activate" if active else "deactivate"
+        changed, unchanged, failed, saved = [], [], {}, []
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="manager") as pool:
+            futures = [(username, pool.submit(Manager._change_status, username, active)) for username in usernames]
+        for username, future in futures:
+            error = future.exception()
+            if error is not None:
+                failed[username] = error
+                logger.error("Problem with user (%s): %s", username, error, extra={"action": action})
+            elif future.result() is None:
+                unchanged.append(username)
+            else:
+                saved.append(future.result())
+                changed.append(username)
+                logger.info("User (%s) %sd by Manager", username, action, extra={"user": future.result()["ID"], "action": action})
+        if saved:
+            get_user_status_index(get_storage()).update_users(saved)
+        return changed, unchanged, failed
+
+    def bulk_status(self, active, from_file=None, pattern=None, inactive_since=None, workers=MAX_WORKERS, dry_run=False):
+        # Non-interactive activate/deactivate subcommands: one summary line at the end; returns the number of failures
+        self.check_credentials()
+        if from_file is None and pattern is None and inactive_since is None:
+            console.print("Give --from-file, --pattern or --inactive-since to select users.", style='Error')
+            return 1
+        verb, state = ("Activated", "active") if active else ("Deactivated", "inactive")
+        try:
+            selected, unknown, already = Manager.select_users(active, from_file, pattern, inactive_since)
+        except FileNotFoundError as e:
+            console.print(f"File not found: {e.filename}", style='Error')
+            return 1
+        for username in unknown:
+            console.print(f"User {username} does not exist.", style='Error')
+        if dry_run:
+            for username in selected:
+                console.print("-", username)
+            console.print(f"{len(selected)} user(s) would be {verb.lower()}; {already} already {state}; "
+                          f"{len(unknown)} unknown.", style="Notice")
+            return 0
+        changed, unchanged, failed = Manager.set_users_active(selected, active, workers)
+        for username, error in failed.items():
+            console.print(f"User ({username}) could not be updated: {error}", style='Error')
+        summary = (f"{verb} {len(changed)} user(s); {already + len(unchanged)} already {state}; "
+                   f"{len(unknown)} unknown; {len(failed)} failed.")
+        console.print(summary, style="Notice" if not failed else "Error")
+        logger.info("Bulk status change by Manager: %s", summary, extra={"action": verb.lower()})
+        return len(failed)
+
+    def export_data(self, path):
+        # Streams the whole data store into a compressed archive (see archive.py)
+        self.check_credentials()
+        from archive import export_archive
+        start = datetime.now()
+        counts = export_archive(path)
+        summary = describe_counts(counts)
+        console.print(f"Exported {summary} to {path} in {(datetime.now() - start).total_seconds():.1f}s.", style="Notice")
+        logger.info("Data exported by Manager to %s: %s", path, summary, extra={"action": "export"})
+
+    def import_data(self, path):
+        # Loads an archive written by export into an empty data store; returns False when it could not
+        self.check_credentials()
+        from archive import import_archive
+        start = datetime.now()
+        try:
+            counts = import_archive(path)
+        except (ValueError, OSError) as e:
+            console.print(f"Import failed: {e}", style='Error')
+            logger.error("Problem with importing %s: %s", path, e, extra={"action": "import"})
+            return False
+        directory.invalidate()
+        summary = describe_counts(counts)
+        console.print(f"Imported {summary} from {path} in {(datetime.now() - start).total_seconds():.1f}s.", style="Notice")
+        logger.info("Data imported by Manager from %s: %s", path, summary, extra={"action": "import"})
+        return True
+
     def purge_data(self, is_run=False):
         """
         If this function is executed with parse commands, 
@@ -221,75 +332,63 @@ class Manager:
         
         """
         if not is_run:
-            data = {}
-            try:
-                with open("manager_info.json", 'r') as file:
-                    data = json.load(file)
-            except FileExistsError:
-                console.print("Manager is not defined.", style='Error')
-                console.print("Create Manager first.", style='Error')
-                exit()
-
-            if data['username'] == self.username and base64.b64decode(data['password']).decode("utf-8") == self.password:
-                pass
-            else:
-                console.print("Invalid username or password.", style='Error')
-                exit()
+            self.check_credentials()
 
         choice = input("Are you sure? (y/n)")
         if choice == 'y':
-            project_path = 'projects/'
-            with os.scandir(project_path) as entries:
-                if not any(entries):
-                    console.print("There is no project data.", style='Error')
-                else:
-                    shutil.rmtree(project_path)
-                    console.print("All projects has been deleted.", style='Notice')
-                    logger.info("All projects has been deleted")
-                    os.makedirs(project_path)
-
-            users_path = 'users/'
-            with os.scandir(users_path) as entries:
-                if not any(entries):
-                    console.print("There is no user data.", style='Error')
-                else:
-                    shutil.rmtree(users_path)
-                    os.remove("emails_and_usernames.json")
-                    console.print("All users has been deleted.", style='Notice')
-                    logger.info("All users has been deleted")
-                    os.makedirs(users_path)
-                    with open("emails_and_usernames.json", 'w') as file:
-                        data = {'emails': [], 'usernames': {}}
-                        json.dump(data, file, indent=4)
+            had_projects, had_users = get_storage().purge()
+            if had_projects:
+                get_search_index(get_storage()).clear()
+                get_deadline_index(get_storage()).clear()
+            if had_users:
+                get_user_status_index(get_storage()).clear()
+            if not had_projects:
+                console.print("There is no project data.", style='Error')
+            else:
+                console.print("All projects has been deleted.", style='Notice')
+                logger.info("All projects has been deleted")
+
+            if not had_users:
+                console.print("There is no user data.", style='Error')
+            else:
+                console.print("All users has been deleted.", style='Notice')
+                logger.info("All users has been deleted")
 
 
 def get_username(ID):
-    data = {}
     try:
-        with open("emails_and_usernames.json", 'r') as file:
-            data = json.load(file)
+        return directory.username(ID)
     except FileNotFoundError:
         logger.error("Problem with [emails_and_usernames.json]")
         raise FileNotFoundError("File Error. Terminating Program.")
-    return data["usernames"][ID]
 
 
 def get_ID(username):
-    data = {}
     try:
-        with open("emails_and_usernames.json", 'r') as file:
-            data = json.load(file)
+        return directory.ID(username)
     except FileNotFoundError:
         logger.error("Problem with [emails_and_usernames.json]")
         raise FileNotFoundError("File Error. Terminating Program")
 
-    for ID in data['usernames']:
-        if data['usernames'][ID] == username:
-            return ID
+
+def describe_counts(counts):
+    # "3 user(s), 2 project(s), ..." for the export/import summaries
+    names = {"user": "user(s)", "project": "project(s)", "task": "task(s)", "history": "history record(s)"}
+    return ", ".join(f"{counts.get(kind, 0)} {name}" for kind, name in names.items())
+
+
+def day(value):
+    # argparse type of --inactive-since
+    try:
+        datetime.strptime(value, "%Y-%m-%d")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid day: {value} (expected YYYY-MM-DD)")
+    return value
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="User and Admin Manager")
+    parser.add_argument("--startup-profile", action="store_true", help="Print an import-time breakdown of manager.py and exit")
     subparsers = parser.add_subparsers(title="subcommands", dest="subcommand")
 
     create_admin_parser = subparsers.add_parser("create-admin", help="Create admin credentials")
@@ -304,7 +403,40 @@ if __name__ == "__main__":
     purge_parser.add_argument("--username", required=True, help="Admin username")
     purge_parser.add_argument("--password", required=True, help="Admin password")
 
+    status_parser = argparse.ArgumentParser(add_help=False)
+    status_parser.add_argument("--username", required=True, help="Admin username")
+    status_parser.add_argument("--password", required=True, help="Admin password")
+    status_parser.add_argument("--from-file", help="File with one username per line")
+    status_parser.add_argument("--pattern", help="Shell-style pattern the usernames must match (e.g. 'intern_*')")
+    status_parser.add_argument("--inactive-since", type=day, metavar="YYYY-MM-DD", help="Only users whose last login is before this day")
+    status_parser.add_argument("--workers", type=int, default=MAX_WORKERS, help="User records rewritten in parallel")
+    status_parser.add_argument("--dry-run", action="store_true", help="List the selected users without changing them")
+    subparsers.add_parser("deactivate", parents=[status_parser], help="Deactivate the selected users")
+    subparsers.add_parser("activate", parents=[status_parser], help="Activate the selected users")
+
+    users_parser = subparsers.add_parser("users", help="List or count users by status")
+    users_parser.add_argument("--username", required=True, help="Admin username")
+    users_parser.add_argument("--password", required=True, help="Admin password")
+    users_parser.add_argument("--status", choices=("active", "inactive", "all"), default="inactive")
+    users_parser.add_argument("--pattern", help="Shell-style pattern the usernames must match")
+    users_parser.add_argument("--inactive-since", type=day, metavar="YYYY-MM-DD", help="Only users whose last login is before this day")
+    users_parser.add_argument("--count", action="store_true", help="Only print how many users match")
+
+    export_parser = subparsers.add_parser("export", help="Write every user and project to a compressed archive")
+    export_parser.add_argument("--username", required=True, help="Admin username")
+    export_parser.add_argument("--password", required=True, help="Admin password")
+    export_parser.add_argument("path", help="Archive to write (gzip-compressed JSON lines, e.g. backup.jsonl.gz)")
+
+    import_parser = subparsers.add_parser("import", help="Load an exported archive into an empty database")
+    import_parser.add_argument("--username", required=True, help="Admin username")
+    import_parser.add_argument("--password", required=True, help="Admin password")
+    import_parser.add_argument("path", help="Archive written by 'export'")
+
     args = parser.parse_args()
+    if args.startup_profile:
+        from startup import print_startup_profile
+        print_startup_profile("manager")
+        exit()
 
     manager = Manager(args.username, args.password)
     if args.subcommand == "create-admin":
@@ -312,4 +444,16 @@ if __name__ == "__main__":
     elif args.subcommand == "login":
         manager.login()
     elif args.subcommand == "purge-data":
-        manager.purge_data()
\ No newline at end of file
+        manager.purge_data()
+    elif args.subcommand in ("activate", "deactivate"):
+        failures = manager.bulk_status(args.subcommand == "activate", args.from_file, args.pattern, args.inactive_since,
+                                       args.workers, args.dry_run)
+        exit(1 if failures else 0)
+    elif args.subcommand == "export":
+        manager.export_data(args.path)
+    elif args.subcommand == "import":
+        exit(0 if manager.import_data(args.path) else 1)
+    elif args.subcommand == "users":
+        manager.check_credentials()
+        Manager.list_users({"active": True, "inactive": False, "all": None}[args.status], args.pattern,
+                           args.inactive_since, args.count)
\ No newline at end of file
@@ -0,0 +1,56 @@
+import os
+
+from registry import directory
+
+# Most project lists written at the same time by update_memberships (TRELLOMIZE_FANOUT_WORKERS)
+MAX_WORKERS = 8
+
+
+def _apply(backend, username, project_id, add):
+    if add:
+        backend.add_user_project(username, project_id)
+    else:
+        backend.remove_user_project(username, project_id)
+
+
+def update_memberships(project_id, added=(), removed=(), workers=None, backend=None):
+    """
+    Add 'project_id' to the project lists (projects.json) of the 'added'
+    user IDs and remove it from those of the 'removed' ones, in 'backend'
+    (the active storage by default). Usernames are resolved from one
+    snapshot of that backend's registry, then the lists are written
+    on a bounded thread pool; each user has a file and a lock of their
+    own, so the writes do not wait for each other. Every user is
+    attempted even when some fail. Returns {user ID: exception} for the
+    users whose list could not be updated (empty when all succeeded).
+    """
+    if backend is None or backend is directory.backend:
+        backend = directory.backend
+        usernames = directory.data()["usernames"]
+    else:
+        # another backend than the shared directory's: its own registry names the users
+        usernames = backend.load_registry()["usernames"]
+    jobs, failed = [], {}
+    for add, IDs in ((True, added), (False, removed)):
+        for ID in dict.fromkeys(IDs):
+            if ID in usernames:
+                jobs.append((ID, usernames[ID], add))
+            else:
+                failed[ID] = KeyError(f"Unknown user: {ID}")
+    if not jobs:
+        return failed
+    workers = min(len(jobs), workers or int(os.environ.get("TRELLOMIZE_FANOUT_WORKERS", MAX_WORKERS)))
+    if workers <= 1:
+        for ID, username, add in jobs:
+            try:
+                _apply(backend, username, project_id, add)
+            except Exception as error:
+                failed[ID] = error
+        return failed
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="membership") as pool:
+        futures = [(ID, pool.submit(_apply, backend, username, project_id, add)) for ID, username, add in jobs]
+    for ID, future in futures:
+        if future.exception() is not None:
+            failed[ID] = future.exception()
+    return failed
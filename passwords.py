@@ -0,0 +1,154 @@
+import math
+import os
+import threading
+import time
+
+from fileio import FileLock, atomic_write
+
+# bcrypt cost factors: each extra round doubles the hashing time.
+# Calibration never goes below MIN_ROUNDS (the usual recommended minimum)
+# unless TRELLOMIZE_BCRYPT_ROUNDS asks for it explicitly.
+MIN_ROUNDS = 10
+MAX_ROUNDS = 16
+# Time one hash should take on this host (TRELLOMIZE_BCRYPT_TARGET_MS)
+DEFAULT_TARGET_MS = 250
+# Cost used to time the host during calibration (cheap, but long enough to measure)
+_PROBE_ROUNDS = 6
+
+
+def calibrate(target_ms):
+    # Highest cost whose hash takes at most target_ms here, clamped to [MIN_ROUNDS, MAX_ROUNDS]
+    import bcrypt
+    start = time.perf_counter()
+    bcrypt.hashpw(b"calibration", bcrypt.gensalt(_PROBE_ROUNDS))
+    elapsed_ms = max((time.perf_counter() - start) * 1000, 0.01)
+    rounds = _PROBE_ROUNDS + math.floor(math.log2(target_ms / elapsed_ms))
+    return min(max(rounds, MIN_ROUNDS), MAX_ROUNDS)
+
+
+def cost_of(hashed):
+    # Cost factor stored in a bcrypt hash ("$2b$12$...")
+    try:
+        return int(hashed.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    """
+    bcrypt hashing and checking on a small thread pool. bcrypt releases
+    the GIL, so callers (menus showing a spinner, concurrent sessions of
+    a server) are not blocked by each other's hashes. The cost factor is
+    TRELLOMIZE_BCRYPT_ROUNDS when set, otherwise the one saved in
+    'cost_file' (default: bcrypt.cost in the storage lock directory), and
+    only when there is none is it calibrated to TRELLOMIZE_BCRYPT_TARGET_MS
+    and saved there, so every process uses the same cost. needs_rehash()
+    tells login to store a fresh hash when a stored one is cheaper than
+    that cost; stronger hashes are kept.
+    Every operation is timed; metrics() returns count/total/max per kind.
+    bcrypt and the pool are only loaded by the first hash or check.
+    """
+
+    def __init__(self, rounds=None, target_ms=None, workers=None, cost_file=None):
+        self._rounds = rounds
+        self.target_ms = target_ms
+        self.cost_file = cost_file
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self._pool = None
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    @property
+    def pool(self):
+        with self._lock:
+            if self._pool is None:
+                from concurrent.futures import ThreadPoolExecutor
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+            return self._pool
+
+    @property
+    def rounds(self):
+        with self._lock:
+            if self._rounds is None:
+                configured = os.environ.get("TRELLOMIZE_BCRYPT_ROUNDS")
+                if configured:
+                    self._rounds = int(configured)
+                else:
+                    self._rounds = self._saved_rounds()
+            return self._rounds
+
+    def _saved_rounds(self):
+        # The cost saved by the first process that calibrated; calibrates and saves it when there is none
+        path = self.cost_file
+        if path is None:
+            from storage import get_storage
+            path = os.path.join(get_storage().lock_dir, "bcrypt.cost")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with FileLock(f"{path}.lock"):
+            try:
+                with open(path, "r") as file:
+                    return int(file.read())
+            except (FileNotFoundError, ValueError):
+                pass
+            target_ms = self.target_ms or float(os.environ.get("TRELLOMIZE_BCRYPT_TARGET_MS", DEFAULT_TARGET_MS))
+            rounds = calibrate(target_ms)
+            atomic_write(path, str(rounds))
+            return rounds
+
+    def _timed(self, kind, function, *args):
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            with self._lock:
+                count, total, longest = self._metrics.get(kind, (0, 0.0, 0.0))
+                self._metrics[kind] = (count + 1, total + elapsed_ms, max(longest, elapsed_ms))
+
+    def _hash(self, password, rounds):
+        import bcrypt
+        return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+    def _verify(self, password, hashed):
+        import bcrypt
+        try:
+            return bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
+        except ValueError:
+            # not a bcrypt hash
+            return False
+
+    def submit_hash(self, password):
+        # Future of the bcrypt hash (str) of 'password' at the configured cost
+        return self.pool.submit(self._timed, "hash", self._hash, password, self.rounds)
+
+    def submit_verify(self, password, hashed):
+        # Future of whether 'password' matches the stored hash
+        return self.pool.submit(self._timed, "verify", self._verify, password, hashed)
+
+    def hash(self, password):
+        return self.submit_hash(password).result()
+
+    def verify(self, password, hashed):
+        return self.submit_verify(password, hashed).result()
+
+    def needs_rehash(self, hashed):
+        # Only upgrades: a hash stored at a higher cost (another host, an older setting) is left alone
+        cost = cost_of(hashed)
+        return cost is None or cost < self.rounds
+
+    def metrics(self):
+        # {kind: {"count", "total_ms", "avg_ms", "max_ms"}} for "hash" and "verify"
+        with self._lock:
+            return {kind: {"count": count, "total_ms": round(total, 1), "avg_ms": round(total / count, 1),
+                           "max_ms": round(longest, 1)}
+                    for kind, (count, total, longest) in self._metrics.items()}
+
+    def shutdown(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+
+# Shared hasher used by main.py
+hasher = PasswordHasher()
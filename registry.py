@@ -0,0 +1,112 @@
+from storage import get_storage
+
+
+class UserDirectory:
+    """
+    In-process cache of the user registry (emails and usernames) with
+    O(1) lookups from ID to username and from username to ID, plus
+    lowercase username/email indexes for uniqueness checks.
+    The cache is reloaded when the storage backend's registry stamp
+    changes (file mtime/size for JSON), and the writers below update it
+    directly after they persist a change. Writers hold the backend's
+    "registry" lock and re-validate the cache inside it, so concurrent
+    sessions never overwrite each other's registry updates.
+    """
+
+    def __init__(self, backend=None):
+        self._backend = backend
+        self._stamp = None
+        self._data = None
+        self._ids = {}
+        self._usernames_lower = set()
+        self._emails_lower = set()
+
+    @property
+    def backend(self):
+        return self._backend if self._backend is not None else get_storage()
+
+    def _ensure_loaded(self):
+        # Raises FileNotFoundError when the registry is missing
+        stamp = self.backend.registry_stamp()
+        if stamp != self._stamp:
+            self._set(self.backend.load_registry(), stamp)
+
+    def _set(self, data, stamp):
+        self._data = data
+        self._ids = {username: ID for ID, username in data["usernames"].items()}
+        self._usernames_lower = {username.lower() for username in self._ids}
+        self._emails_lower = {email.lower() for email in data["emails"]}
+        self._stamp = stamp
+
+    def _saved(self, write, *args):
+        # Persist the already updated registry and re-stamp the cache
+        try:
+            write(self._data, *args)
+        except Exception:
+            self.invalidate()
+            raise
+        self._set(self._data, self.backend.registry_stamp())
+
+    def invalidate(self):
+        self._stamp = None
+        self._data = None
+        self._ids = {}
+        self._usernames_lower = set()
+        self._emails_lower = set()
+
+    def data(self):
+        # Full registry content ({'emails': [...], 'usernames': {ID: username}})
+        self._ensure_loaded()
+        return self._data
+
+    def username(self, ID):
+        self._ensure_loaded()
+        return self._data["usernames"][ID]
+
+    def ID(self, username):
+        self._ensure_loaded()
+        return self._ids.get(username)
+
+    def usernames(self):
+        self._ensure_loaded()
+        return list(self._data["usernames"].values())
+
+    def username_taken(self, username):
+        # Case-insensitive check against the username index
+        self._ensure_loaded()
+        return username.lower() in self._usernames_lower
+
+    def email_taken(self, email):
+        # Case-insensitive check against the email index
+        self._ensure_loaded()
+        return email.lower() in self._emails_lower
+
+    def add_user(self, ID, email, username):
+        # Insert a new user reusing the already loaded registry
+        with self.backend.lock("registry"):
+            self._ensure_loaded()
+            # another session may have taken them since the caller checked
+            if username.lower() in self._usernames_lower:
+                raise ValueError("Username already exists! Please choose a different username.")
+            if email.lower() in self._emails_lower:
+                raise ValueError("Email already exists! Please enter a different email.")
+            self._data["emails"].append(email)
+            self._data["usernames"][ID] = username
+            self._saved(self.backend.add_registry_user, ID, email, username)
+
+    def rename_user(self, ID, new_username):
+        with self.backend.lock("registry"):
+            self._ensure_loaded()
+            self._data["usernames"][ID] = new_username
+            self._saved(self.backend.rename_registry_user, ID, new_username)
+
+    def change_email(self, ID, old_email, new_email):
+        with self.backend.lock("registry"):
+            self._ensure_loaded()
+            self._data["emails"].remove(old_email)
+            self._data["emails"].append(new_email)
+            self._saved(self.backend.change_registry_email, ID, old_email, new_email)
+
+
+# Shared directory object used by main.py and manager.py
+directory = UserDirectory()
@@ -0,0 +1,183 @@
+import os
+import socket
+import threading
+
+from fileio import decode, encode
+from storage import Storage
+
+# Default socket of server.py (TRELLOMIZE_SOCKET)
+SOCKET = "trellomize.sock"
+
+# Errors the server sends back by name (server.ERRORS)
+ERRORS = {error.__name__: error for error in (FileNotFoundError, KeyError, ValueError, OSError)}
+
+
+def _header(project_data):
+    # The project-level fields of a project (no tasks)
+    return {"title": project_data["title"], "owner": project_data["owner"],
+            "collaborators": list(project_data["collaborators"]), "ID": project_data["ID"]}
+
+
+class RemoteStorage(Storage):
+    """
+    Storage served by server.py over its Unix socket (TRELLOMIZE_STORAGE=remote),
+    so every session shares the daemon's in-memory copy of the data
+    instead of reading the files itself. Calls are JSON-RPC requests on
+    one connection, made by one thread at a time. Task writes send only
+    the tasks that changed, not the whole project.
+
+    Locks, project versions and the derived indexes (search, deadlines,
+    user status) stay files in the daemon's data directory: clients must
+    run on the same machine, which a Unix socket implies anyway.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or os.environ.get("TRELLOMIZE_SOCKET", SOCKET)
+        self._lock = threading.Lock()
+        self._socket = None
+        self._file = None
+        self._next_id = 0
+        self._info = None
+        self._index_paths = {}
+
+    def _connect(self):
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            connection.connect(self.path)
+        except OSError as e:
+            connection.close()
+            raise ConnectionError(f"No trellomize server on {self.path} (start it with 'python server.py')") from e
+        self._socket = connection
+        self._file = connection.makefile("rb")
+
+    def close(self):
+        with self._lock:
+            if self._socket is not None:
+                self._file.close()
+                self._socket.close()
+                self._socket = self._file = None
+
+    def call(self, method, *params):
+        # One request to the server; errors it reports are raised here with the same type
+        with self._lock:
+            if self._socket is None:
+                self._connect()
+            self._next_id += 1
+            request = {"jsonrpc": "2.0", "id": self._next_id, "method": method, "params": params}
+            try:
+                self._socket.sendall(encode(request, "json") + b"\n")
+                line = self._file.readline()
+            except OSError:
+                line = b""
+            if not line:
+                # the server stopped: the next call reconnects
+                self._file.close()
+                self._socket.close()
+                self._socket = self._file = None
+                raise ConnectionError(f"The trellomize server on {self.path} closed the connection")
+        response = decode(line)
+        error = response.get("error")
+        if error is not None:
+            raise ERRORS.get(error.get("data"), RuntimeError)(error["message"])
+        return response["result"]
+
+    @property
+    def lock_dir(self):
+        if self._info is None:
+            self._info = self.call("info")
+        return self._info["lock_dir"]
+
+    def index_path(self, name):
+        if name not in self._index_paths:
+            self._index_paths[name] = self.call("index_path", name)
+        return self._index_paths[name]
+
+    def flush(self):
+        # Waits until the server has written every change made so far (OSError when some could not be)
+        return self.call("flush")
+
+    # registry (emails and usernames); the server updates its own copy, 'data' is not sent
+    def load_registry(self):
+        return self.call("load_registry")
+
+    def registry_stamp(self):
+        return tuple(self.call("registry_stamp"))
+
+    def add_registry_user(self, data, ID, email, username):
+        self.call("add_registry_user", ID, email, username)
+
+    def rename_registry_user(self, data, ID, new_username):
+        self.call("rename_registry_user", ID, new_username)
+
+    def change_registry_email(self, data, ID, old_email, new_email):
+        self.call("change_registry_email", ID, old_email, new_email)
+
+    # users
+    def user_exists(self, username):
+        return self.call("user_exists", username)
+
+    def load_user(self, username):
+        return self.call("load_user", username)
+
+    def save_user(self, user_data):
+        self.call("save_user", user_data)
+
+    def rename_user(self, old_username, new_username):
+        self.call("rename_user", old_username, new_username)
+
+    def load_user_projects(self, username):
+        return self.call("load_user_projects", username)
+
+    def add_user_project(self, username, project_id):
+        self.call("add_user_project", username, project_id)
+
+    def remove_user_project(self, username, project_id):
+        self.call("remove_user_project", username, project_id)
+
+    def set_user_projects(self, username, project_ids):
+        self.call("set_user_projects", username, list(project_ids))
+
+    # projects
+    def load_project(self, ID):
+        return self.call("load_project", ID)
+
+    def save_project(self, project_data):
+        self.call("save_project", dict(_header(project_data), tasks=dict(project_data["tasks"])))
+
+    def save_project_header(self, project_data):
+        self.call("save_project_header", _header(project_data))
+
+    def save_task(self, project_data, task_id):
+        self.call("save_task", _header(project_data), task_id, project_data["tasks"][task_id])
+
+    def delete_task(self, project_data, task_id):
+        self.call("delete_task", project_data["ID"], task_id)
+
+    def save_changes(self, project_data, task_ids, deleted_ids, header):
+        tasks = {task_id: project_data["tasks"][task_id] for task_id in task_ids}
+        self.call("save_changes", _header(project_data), tasks, list(deleted_ids), header)
+
+    def delete_project(self, ID):
+        return self.call("delete_project", ID)
+
+    def project_ids(self):
+        return self.call("project_ids")
+
+    def load_project_summaries(self, IDs):
+        return self.call("load_project_summaries", list(IDs))
+
+    def append_history(self, project_id, task_id, entries):
+        self.call("append_history", project_id, task_id, list(entries))
+
+    def iter_history(self, project_id, task_id):
+        yield from self.call("iter_history", project_id, task_id)
+
+    # whole database
+    def load_assignments(self, user_ID):
+        return self.call("load_assignments", user_ID)
+
+    def update_assignments(self, project_id, changes):
+        self.call("update_assignments", project_id, changes)
+
+    def purge(self):
+        return tuple(self.call("purge"))
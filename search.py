@@ -0,0 +1,143 @@
+import json
+import math
+import re
+
+from indexdb import DerivedIndex
+
+# A word in a task title counts more than one in its description or comments
+TITLE_WEIGHT = 3
+TEXT_WEIGHT = 1
+# Longer words matched by a prefix query ("des*") count this much of an exact match
+PREFIX_FACTOR = 0.5
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return _TOKEN.findall(text.lower())
+
+
+def searchable(task):
+    # The parts of a stored task that search covers: (title, description, comment texts)
+    return (task["title"], task["description"], [comment["comment"] for comment in task["comments"]])
+
+
+class SearchIndex(DerivedIndex):
+    """
+    Inverted index over task titles, descriptions and comments, kept in
+    its own SQLite file next to the data (Storage.index_path("search")).
+    postings holds one row per (term, task) with the term's weighted
+    count. Its primary key is ordered by term, so exact terms and
+    prefixes are B-tree range scans. A query walks the postings of its
+    rarest word and probes the other words per candidate task, ranking
+    by weight * idf summed over the words. No project file is read to
+    answer a search.
+
+    Project.flush sends the tasks whose searchable text changed. If the
+    index is missing, it is built once from every stored project.
+    """
+
+    NAME = "search"
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS docs (
+            doc INTEGER PRIMARY KEY,
+            project_id TEXT NOT NULL,
+            task_id TEXT NOT NULL,
+            title TEXT NOT NULL,
+            UNIQUE (project_id, task_id)
+        );
+        CREATE TABLE IF NOT EXISTS postings (
+            term TEXT NOT NULL,
+            doc INTEGER NOT NULL,
+            weight INTEGER NOT NULL,
+            PRIMARY KEY (term, doc)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS postings_doc ON postings(doc);
+    """
+    TABLES = ("postings", "docs")
+
+    entry = staticmethod(searchable)
+
+    def _add(self, project_id, task_id, text):
+        title, description, comments = text
+        weights = {}
+        for term in tokenize(title):
+            weights[term] = weights.get(term, 0) + TITLE_WEIGHT
+        for part in [description, *comments]:
+            for term in tokenize(part):
+                weights[term] = weights.get(term, 0) + TEXT_WEIGHT
+        doc = self.conn.execute("INSERT INTO docs (project_id, task_id, title) VALUES (?, ?, ?)",
+                                (project_id, task_id, title)).lastrowid
+        self.conn.executemany("INSERT INTO postings (term, doc, weight) VALUES (?, ?, ?)",
+                              [(term, doc, weight) for term, weight in weights.items()])
+
+    def _remove(self, project_id, task_id):
+        row = self.conn.execute("SELECT doc FROM docs WHERE project_id = ? AND task_id = ?", (project_id, task_id)).fetchone()
+        if row is not None:
+            self.conn.execute("DELETE FROM postings WHERE doc = ?", row)
+            self.conn.execute("DELETE FROM docs WHERE doc = ?", row)
+
+    def _remove_project(self, project_id):
+        self.conn.execute("DELETE FROM postings WHERE doc IN (SELECT doc FROM docs WHERE project_id = ?)", (project_id,))
+        self.conn.execute("DELETE FROM docs WHERE project_id = ?", (project_id,))
+
+    def search(self, query, project_ids=None, limit=50):
+        """
+        Tasks matching every word of 'query', best first, as dicts with
+        "project", "task", "title" and "score". A word ending in '*' is a
+        prefix. 'project_ids' limits the search to those projects.
+        """
+        self.ensure_built()
+        words = []
+        for word in query.split():
+            tokens = tokenize(word)
+            words += [(token, False) for token in tokens[:-1]]
+            if tokens:
+                words.append((tokens[-1], word.endswith("*")))
+        if not words:
+            return []
+
+        with self._lock:
+            total = self.conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+            matches = []
+            for token, prefix in words:
+                if prefix:
+                    condition, params = "term >= ? AND term < ?", [token, token + "\U0010ffff"]
+                else:
+                    condition, params = "term = ?", [token]
+                frequency = self.conn.execute(f"SELECT COUNT(*) FROM postings WHERE {condition}", params).fetchone()[0]
+                if frequency == 0:
+                    return []
+                matches.append((token, prefix, condition, params, math.log(1 + total / min(frequency, total))))
+            # the rarest word drives the query; every other word is an indexed probe per candidate task
+            matches.sort(key=lambda match: match[4], reverse=True)
+
+            # exact terms count fully, longer words matched by a prefix count PREFIX_FACTOR
+            weight = f"weight * (CASE WHEN term = ? THEN 1 ELSE {PREFIX_FACTOR} END)"
+            token, prefix, condition, params, idf = matches[0]
+            if prefix:
+                driver = f"SELECT doc, SUM({weight}) * ? AS score FROM postings WHERE {condition} GROUP BY doc"
+                sql_params = [token, idf, *params]
+            else:
+                # one posting per task: no grouping needed
+                driver = "SELECT doc, weight * ? AS score FROM postings WHERE term = ?"
+                sql_params = [idf, token]
+            probes, probe_params = "", []
+            for token, prefix, condition, params, idf in matches[1:]:
+                probes += f" + (SELECT SUM({weight}) FROM postings WHERE doc = c.doc AND {condition}) * ?"
+                probe_params += [token, *params, idf]
+            sql_params = probe_params + sql_params
+            sql = (f"SELECT d.project_id, d.task_id, d.title, c.score{probes} AS rank "
+                   f"FROM ({driver}) c JOIN docs d ON d.doc = c.doc WHERE rank IS NOT NULL ")
+            if project_ids is not None:
+                sql += "AND d.project_id IN (SELECT value FROM json_each(?)) "
+                sql_params.append(json.dumps(list(project_ids)))
+            sql += "ORDER BY rank DESC LIMIT ?"
+            sql_params.append(limit)
+            rows = self.conn.execute(sql, sql_params).fetchall()
+        return [{"project": project_id, "task": task_id, "title": title, "score": score}
+                for project_id, task_id, title, score in rows]
+
+
+def get_search_index(storage):
+    return SearchIndex.for_storage(storage)
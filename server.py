@@ -0,0 +1,531 @@
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import time
+
+from fileio import decode, encode
+from logsetup import get_logger
+from storage import get_storage, project_summary
+
+logger = get_logger("__server__")
+
+# Unix socket the daemon listens on and RemoteStorage connects to (TRELLOMIZE_SOCKET)
+SOCKET = "trellomize.sock"
+# Seconds between two write-behind flushes (TRELLOMIZE_FLUSH_INTERVAL)
+FLUSH_INTERVAL = 1.0
+# Queued writes that start a flush before the interval is over
+FLUSH_OPS = 1000
+# Longest request or response line (a whole project is one line)
+MAX_MESSAGE = 256 * 1024 * 1024
+
+# Exceptions sent back to the client by name and raised again there (see remote.py)
+ERRORS = (FileNotFoundError, KeyError, ValueError, OSError)
+
+
+class SharedStore:
+    """
+    Users, users' project lists, projects and the registry of one backend
+    held in memory for every client of the daemon. Reads are served from
+    memory; a miss is loaded from the backend once. Writes change memory
+    at once and are queued, then written to the backend in order by a
+    single writer thread (write-behind) every 'flush_interval' seconds,
+    after FLUSH_OPS queued writes, before any read the memory cannot
+    answer and on shutdown.
+
+    All writes to a project made between two flushes become one
+    save_project or save_changes call with the project as it is at
+    flush time. History and assignments are not kept in memory: they
+    are queued like the other writes and read from the backend after a
+    flush. A write the backend rejects is not dropped: it and the writes
+    queued after it are retried, in order, with the next batch, and
+    flush() raises until they are saved.
+
+    Methods in METHODS are the JSON-RPC calls; they are only called from
+    the event loop, so each one runs without interleaving with another
+    until it waits for the backend.
+    """
+
+    METHODS = frozenset((
+        "info", "flush", "load_registry", "registry_stamp", "add_registry_user", "rename_registry_user",
+        "change_registry_email", "user_exists", "load_user", "save_user", "rename_user", "load_user_projects",
+        "add_user_project", "remove_user_project", "set_user_projects", "load_project", "save_project",
+        "save_project_header", "save_task", "delete_task", "save_changes", "delete_project", "project_ids",
+        "load_project_summaries", "append_history", "iter_history", "load_assignments", "update_assignments",
+        "index_path", "purge"))
+
+    def __init__(self, backend, flush_interval=FLUSH_INTERVAL):
+        self.backend = backend
+        self.flush_interval = flush_interval
+        # imported here: only the daemon needs a thread pool
+        from concurrent.futures import ThreadPoolExecutor
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="writer")
+        # registry_stamp() is (start time, registry version): clients of an earlier run reload it
+        self._boot = time.time()
+        self._registry = None
+        self._registry_version = 0
+        self._users = {}
+        self._user_projects = {}
+        self._projects = {}
+        self._ids = None
+        # bumped by deletes: a project loaded while one ran is not cached
+        self._epoch = 0
+        # queued writes: (method, args), or ("project", pending) for the project writes merged into 'pending'
+        self._log = []
+        self._pending = {}
+        self.written = 0
+        # writer thread only: calls of a failed batch from the failed one on, retried before the next batch
+        self._retry = []
+        self._error = None
+
+    # write-behind
+
+    def _queue(self, method, *args):
+        self._log.append((method, args))
+        if len(self._log) >= FLUSH_OPS:
+            self.submit()
+
+    def _project_changed(self, ID, tasks=(), deleted=(), header=False, full=False):
+        pending = self._pending.get(ID)
+        if pending is None:
+            pending = self._pending[ID] = {"ID": ID, "full": False, "tasks": set(), "deleted": set(), "header": False}
+            self._queue("project", pending)
+        pending["full"] = pending["full"] or full
+        pending["tasks"].update(tasks)
+        pending["deleted"].update(deleted)
+        pending["header"] = pending["header"] or header
+
+    def _take(self):
+        # The queued writes as backend calls, with a copy of each changed project as it is now
+        log, self._log, self._pending = self._log, [], {}
+        # tasks deleted since the last flush: history queued for them is not written
+        deleted_tasks = {args[0]["ID"]: args[0]["deleted"] for method, args in log
+                         if method == "project" and not args[0].get("dropped")}
+        calls = []
+        for method, args in log:
+            if method == "project":
+                pending, = args
+                if pending.get("dropped"):
+                    continue
+                project = self._projects[pending["ID"]]
+                snapshot = dict(project, tasks=dict(project["tasks"]))
+                if pending["full"]:
+                    calls.append(("save_project", (snapshot,)))
+                else:
+                    tasks = [task_id for task_id in pending["tasks"] if task_id in snapshot["tasks"]]
+                    deleted = [task_id for task_id in pending["deleted"] if task_id not in snapshot["tasks"]]
+                    calls.append(("save_changes", (snapshot, tasks, deleted, pending["header"])))
+            elif method == "append_history" and args[1] in deleted_tasks.get(args[0], ()) \
+                    and args[1] not in self._projects[args[0]]["tasks"]:
+                continue
+            else:
+                calls.append((method, args))
+        return calls
+
+    def _write(self, calls):
+        # Runs on the writer thread, one batch after the other. A failed call stops the batch: it and
+        # the calls after it are kept and retried first by the next batch, so the backend sees them in order.
+        calls, self._retry = self._retry + calls, []
+        for position, (method, args) in enumerate(calls):
+            try:
+                getattr(self.backend, method)(*args)
+            except Exception as e:
+                logger.exception("Write-behind %s failed; %d write(s) kept for retry", method, len(calls) - position,
+                                 extra={"action": "write-behind"})
+                self._retry = calls[position:]
+                self._error = f"{method} failed: {e}"
+                return
+            self.written += 1
+        self._error = None
+
+    def submit(self):
+        # Hands the queued writes (and any failed ones) to the writer; returns its future (None when there are none)
+        calls = self._take()
+        if not calls and not self._retry:
+            return None
+        return asyncio.get_running_loop().run_in_executor(self._writer, self._write, calls)
+
+    async def _read(self, function, *args):
+        # A backend read on the writer thread, after every write queued so far
+        self.submit()
+        return await asyncio.get_running_loop().run_in_executor(self._writer, function, *args)
+
+    async def flush(self):
+        # Writes everything queued and waits for the writer; returns the number of backend calls made so far.
+        # Raises when some writes are still unsaved after failing (they stay queued for the next attempt).
+        self.submit()
+        await asyncio.get_running_loop().run_in_executor(self._writer, lambda: None)
+        if self._retry:
+            raise OSError(f"{len(self._retry)} write(s) not saved yet: {self._error}")
+        return self.written
+
+    def close(self):
+        self._writer.shutdown(wait=True)
+
+    # registry
+
+    async def _registry_data(self):
+        if self._registry is None:
+            registry = await self._read(self.backend.load_registry)
+            if self._registry is None:
+                self._registry = registry
+        return self._registry
+
+    def _registry_snapshot(self):
+        return {"emails": list(self._registry["emails"]), "usernames": dict(self._registry["usernames"])}
+
+    async def load_registry(self):
+        return await self._registry_data()
+
+    async def registry_stamp(self):
+        await self._registry_data()
+        return [self._boot, self._registry_version]
+
+    async def add_registry_user(self, ID, email, username):
+        registry = await self._registry_data()
+        registry["emails"].append(email)
+        registry["usernames"][ID] = username
+        self._registry_version += 1
+        self._queue("add_registry_user", self._registry_snapshot(), ID, email, username)
+
+    async def rename_registry_user(self, ID, new_username):
+        registry = await self._registry_data()
+        registry["usernames"][ID] = new_username
+        self._registry_version += 1
+        self._queue("rename_registry_user", self._registry_snapshot(), ID, new_username)
+
+    async def change_registry_email(self, ID, old_email, new_email):
+        registry = await self._registry_data()
+        registry["emails"].remove(old_email)
+        registry["emails"].append(new_email)
+        self._registry_version += 1
+        self._queue("change_registry_email", self._registry_snapshot(), ID, old_email, new_email)
+
+    # users
+
+    async def _user(self, username):
+        # The stored user, None when there is none (remembered too: only the daemon writes the data)
+        if username not in self._users:
+            try:
+                user_data = await self._read(self.backend.load_user, username)
+            except FileNotFoundError:
+                user_data = None
+            self._users.setdefault(username, user_data)
+        return self._users[username]
+
+    async def user_exists(self, username):
+        return await self._user(username) is not None
+
+    async def load_user(self, username):
+        user_data = await self._user(username)
+        if user_data is None:
+            raise FileNotFoundError(f"No such user: {username}")
+        return user_data
+
+    async def save_user(self, user_data):
+        self._users[user_data["username"]] = user_data
+        self._queue("save_user", user_data)
+
+    async def rename_user(self, old_username, new_username):
+        self._users[new_username] = await self._user(old_username)
+        self._users[old_username] = None
+        if old_username in self._user_projects:
+            self._user_projects[new_username] = self._user_projects.pop(old_username)
+        else:
+            self._user_projects.pop(new_username, None)
+        self._queue("rename_user", old_username, new_username)
+
+    async def _projects_of(self, username):
+        if username not in self._user_projects:
+            data = await self._read(self.backend.load_user_projects, username)
+            self._user_projects.setdefault(username, data)
+        return self._user_projects[username]
+
+    async def load_user_projects(self, username):
+        return await self._projects_of(username)
+
+    async def add_user_project(self, username, project_id):
+        if await self._user(username) is None:
+            raise FileNotFoundError(f"No such user: {username}")
+        data = await self._projects_of(username)
+        if data is None:
+            self._user_projects[username] = {"projects": [project_id]}
+        elif project_id not in data["projects"]:
+            data["projects"].append(project_id)
+        self._queue("add_user_project", username, project_id)
+
+    async def remove_user_project(self, username, project_id):
+        data = await self._projects_of(username)
+        if data is None:
+            raise FileNotFoundError(f"{username} has no projects")
+        if project_id in data["projects"]:
+            data["projects"].remove(project_id)
+            self._queue("remove_user_project", username, project_id)
+
+    async def set_user_projects(self, username, project_ids):
+        self._user_projects[username] = {"projects": list(project_ids)}
+        self._queue("set_user_projects", username, project_ids)
+
+    # projects
+
+    async def _project_ids(self):
+        if self._ids is None:
+            ids = dict.fromkeys(await self._read(self.backend.project_ids))
+            if self._ids is None:
+                self._ids = ids
+        return self._ids
+
+    async def _project(self, ID):
+        if ID not in self._projects:
+            if ID not in await self._project_ids():
+                raise FileNotFoundError(f"No such project: {ID}")
+            epoch = self._epoch
+            project = await self._read(self.backend.load_project, ID)
+            if epoch != self._epoch:
+                # deleted or purged while it was being read
+                return project
+            self._projects.setdefault(ID, project)
+        return self._projects[ID]
+
+    @staticmethod
+    def _set_header(project, header):
+        for key in ("title", "owner", "collaborators"):
+            project[key] = header[key]
+
+    async def load_project(self, ID):
+        return await self._project(ID)
+
+    async def save_project(self, project_data):
+        ID = project_data["ID"]
+        (await self._project_ids())[ID] = None
+        removed = set(self._projects[ID]["tasks"]).difference(project_data["tasks"]) if ID in self._projects else ()
+        self._projects[ID] = project_data
+        self._project_changed(ID, deleted=removed, full=True)
+
+    async def save_project_header(self, header):
+        project = await self._project(header["ID"])
+        self._set_header(project, header)
+        self._project_changed(header["ID"], header=True)
+
+    async def save_task(self, header, task_id, task):
+        project = await self._project(header["ID"])
+        header_changed = any(project[key] != header[key] for key in ("title", "owner", "collaborators"))
+        self._set_header(project, header)
+        project["tasks"][task_id] = task
+        self._project_changed(header["ID"], tasks=(task_id,), header=header_changed)
+
+    async def delete_task(self, ID, task_id):
+        project = await self._project(ID)
+        project["tasks"].pop(task_id, None)
+        self._project_changed(ID, deleted=(task_id,))
+
+    async def save_changes(self, header, tasks, deleted_ids, header_changed):
+        project = await self._project(header["ID"])
+        for task_id in deleted_ids:
+            project["tasks"].pop(task_id, None)
+        project["tasks"].update(tasks)
+        if header_changed:
+            self._set_header(project, header)
+        self._project_changed(header["ID"], tasks=tasks, deleted=deleted_ids, header=header_changed)
+
+    async def delete_project(self, ID):
+        ids = await self._project_ids()
+        if ID not in ids:
+            return False
+        del ids[ID]
+        self._projects.pop(ID, None)
+        pending = self._pending.pop(ID, None)
+        if pending is not None:
+            pending["dropped"] = True
+        self._epoch += 1
+        # SQLite drops the project from its members' lists with it; reload them after the delete
+        self._user_projects.clear()
+        self._queue("delete_project", ID)
+        return True
+
+    async def project_ids(self):
+        return list(await self._project_ids())
+
+    async def load_project_summaries(self, IDs):
+        summaries = {ID: project_summary(self._projects[ID]) for ID in IDs if ID in self._projects}
+        missing = [ID for ID in IDs if ID not in self._projects]
+        if missing:
+            summaries.update(await self._read(self.backend.load_project_summaries, missing))
+        return summaries
+
+    async def append_history(self, project_id, task_id, entries):
+        self._queue("append_history", project_id, task_id, entries)
+
+    async def iter_history(self, project_id, task_id):
+        return await self._read(lambda: list(self.backend.iter_history(project_id, task_id)))
+
+    async def load_assignments(self, user_ID):
+        return await self._read(self.backend.load_assignments, user_ID)
+
+    async def update_assignments(self, project_id, changes):
+        self._queue("update_assignments", project_id, changes)
+
+    # whole database
+
+    async def info(self):
+        # What clients need to share the daemon's lock files and derived indexes
+        return {"lock_dir": os.path.abspath(self.backend.lock_dir), "pid": os.getpid()}
+
+    async def index_path(self, name):
+        return os.path.abspath(self.backend.index_path(name))
+
+    async def purge(self):
+        await self.flush()
+        result = await self._read(self.backend.purge)
+        self._registry = None
+        self._registry_version += 1
+        self._users.clear()
+        self._user_projects.clear()
+        self._projects.clear()
+        self._ids = None
+        self._epoch += 1
+        return list(result)
+
+
+class StoreServer:
+    """
+    JSON-RPC 2.0 over a Unix socket in front of a SharedStore: one
+    request per line in compact JSON (fileio.encode), one response line
+    each, the requests of a connection answered in order. Errors listed
+    in ERRORS come back with their class name in "data" so RemoteStorage
+    raises the same exception.
+    """
+
+    def __init__(self, backend, path=SOCKET, flush_interval=FLUSH_INTERVAL):
+        self.path = path
+        self.store = SharedStore(backend, flush_interval)
+        self._stopped = None
+        self._loop = None
+        # open connections: {handler task: stream writer}
+        self._clients = {}
+
+    async def _respond(self, line):
+        try:
+            request = decode(line)
+            request_id = request.get("id")
+            method, params = request["method"], request.get("params", [])
+        except (ValueError, KeyError, AttributeError):
+            return {"jsonrpc": "2.0", "id": None, "error": {"code": -32700, "message": "Invalid request"}}
+        if method not in SharedStore.METHODS:
+            return {"jsonrpc": "2.0", "id": request_id, "error": {"code": -32601, "message": f"Unknown method: {method}"}}
+        try:
+            result = await getattr(self.store, method)(*params)
+        except ERRORS as e:
+            message = str(e.args[0]) if isinstance(e, KeyError) and e.args else str(e)
+            error = {"code": -32000, "message": message, "data": type(e).__name__}
+            return {"jsonrpc": "2.0", "id": request_id, "error": error}
+        except TypeError as e:
+            return {"jsonrpc": "2.0", "id": request_id, "error": {"code": -32602, "message": str(e)}}
+        except Exception as e:
+            logger.exception("Request %s failed", method, extra={"action": "server"})
+            return {"jsonrpc": "2.0", "id": request_id, "error": {"code": -32603, "message": str(e)}}
+        return {"jsonrpc": "2.0", "id": request_id, "result": result}
+
+    async def _client(self, reader, writer):
+        self._clients[asyncio.current_task()] = writer
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = await self._respond(line)
+                writer.write(encode(response, "json") + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            # client gone, or a line over MAX_MESSAGE
+            pass
+        finally:
+            self._clients.pop(asyncio.current_task(), None)
+            writer.close()
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.store.flush_interval)
+            self.store.submit()
+
+    def _remove_stale_socket(self):
+        # A socket file left by a daemon that did not stop cleanly; refuse to start over a live one
+        if not os.path.exists(self.path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+        except OSError:
+            os.remove(self.path)
+        else:
+            raise RuntimeError(f"A server is already listening on {self.path}")
+        finally:
+            probe.close()
+
+    async def serve(self, ready=None):
+        """
+        Serve until stop() (or SIGINT/SIGTERM when run from the command
+        line), then write everything queued and remove the socket.
+        'ready', a threading.Event, is set once clients can connect.
+        """
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        self._remove_stale_socket()
+        server = await asyncio.start_unix_server(self._client, self.path, limit=MAX_MESSAGE)
+        flusher = asyncio.create_task(self._flush_periodically())
+        logger.info("Server listening on %s", self.path, extra={"action": "server"})
+        if ready is not None:
+            ready.set()
+        try:
+            await self._stopped.wait()
+        finally:
+            flusher.cancel()
+            server.close()
+            # the handlers see the connections close and return
+            for writer in list(self._clients.values()):
+                writer.close()
+            await asyncio.gather(*self._clients, return_exceptions=True)
+            await server.wait_closed()
+            try:
+                written = await self.store.flush()
+            except OSError as e:
+                written = self.store.written
+                logger.error("Changes lost at shutdown: %s", e, extra={"action": "server"})
+            self.store.close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            logger.info("Server stopped after %d backend write(s)", written, extra={"action": "server"})
+
+    def stop(self):
+        # Thread-safe; does nothing before serve() or once it has returned
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._stopped.set)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python server.py",
+                                     description="Serve the data directory to main.py and manager.py sessions "
+                                                 "started with TRELLOMIZE_STORAGE=remote")
+    parser.add_argument("--socket", default=os.environ.get("TRELLOMIZE_SOCKET", SOCKET), help="Unix socket path")
+    parser.add_argument("--flush-interval", type=float, default=float(os.environ.get("TRELLOMIZE_FLUSH_INTERVAL", FLUSH_INTERVAL)),
+                        help="Seconds between two writes of the queued changes")
+    args = parser.parse_args(argv)
+    if os.environ.get("TRELLOMIZE_STORAGE", "json").lower() == "remote":
+        parser.error("the server needs a local backend: set TRELLOMIZE_STORAGE to json or sqlite")
+
+    server = StoreServer(get_storage(), args.socket, args.flush_interval)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, server.stop)
+        await server.serve()
+
+    print(f"Serving on {args.socket} (Ctrl+C to stop)")
+    asyncio.run(run())
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
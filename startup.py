@@ -0,0 +1,54 @@
+import os
+import subprocess
+import sys
+
+# Import-time budget for the entry points in milliseconds (TRELLOMIZE_STARTUP_BUDGET_MS);
+# it covers a cold interpreter importing main.py or manager.py, before any menu is shown
+STARTUP_BUDGET_MS = 150
+# Modules that must only load when first needed, never while importing an entry point
+DEFERRED_MODULES = ("rich", "bcrypt", "pwinput", "sqlite3", "concurrent.futures")
+
+
+def import_profile(module):
+    """
+    Import 'module' in a fresh interpreter with -X importtime and return
+    (total_ms, rows) where rows are (cumulative_ms, self_ms, depth, name)
+    for every module it loaded, in import order. depth 0 is 'module'.
+    """
+    folder = os.path.dirname(os.path.abspath(__file__))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            capture_output=True, text=True, cwd=folder, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        # the module itself is indented by one space, each level below it by two more
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((int(cumulative_us) / 1000, int(self_us) / 1000, depth, name.strip()))
+    # -X importtime reports a module after everything it imported: keep the rows
+    # from the end of the previous top-level import (interpreter startup) to 'module'
+    end = max(i for i, row in enumerate(rows) if row[2] == 0 and row[3] == module)
+    start = max([i for i, row in enumerate(rows[:end]) if row[2] == 0], default=-1) + 1
+    rows = rows[start:end + 1]
+    return rows[-1][0], rows
+
+
+def budget_ms():
+    # The import-time budget, TRELLOMIZE_STARTUP_BUDGET_MS when set
+    return float(os.environ.get("TRELLOMIZE_STARTUP_BUDGET_MS", STARTUP_BUDGET_MS))
+
+
+def print_startup_profile(module, top=15):
+    # Breakdown printed by --startup-profile (plain print: loading rich would skew the numbers)
+    total_ms, rows = import_profile(module)
+    print(f"Importing {module}: {total_ms:.1f} ms (budget {budget_ms():.0f} ms)")
+    print("\nDirect imports by cumulative time:")
+    for cumulative, self_ms, depth, name in sorted((row for row in rows if row[2] == 1), reverse=True)[:top]:
+        print(f"  {cumulative:8.1f} ms  {name}")
+    print("\nModules by own import time:")
+    for self_ms, name in sorted(((row[1], row[3]) for row in rows), reverse=True)[:top]:
+        print(f"  {self_ms:8.1f} ms  {name}")
+    loaded = [name for name in DEFERRED_MODULES if any(row[3] == name for row in rows)]
+    if loaded:
+        print(f"\nLoaded at startup but should be deferred: {', '.join(loaded)}")
@@ -0,0 +1,1043 @@
+import abc
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+
+from fileio import FileLock, append_lines, atomic_write, get_codec, get_durability, read_data, write_data
+
+REGISTRY_FILE = "emails_and_usernames.json"
+
+
+class Storage(abc.ABC):
+    """
+    Interface used by User, Project, Manager and the user directory for
+    all persistence. Backends return and accept plain dicts (users via
+    vars(), tasks via Task.to_dict(); a project's "tasks" may be any
+    read-only mapping), so the JSON file layout and the SQLite tables
+    are interchangeable. Backends implement every abstract method; the
+    other methods have defaults built on them.
+
+    Cross-process coordination lives in lock_dir: named lock files
+    (see fileio.FileLock) and per-project version counters used by
+    Project for optimistic concurrency control.
+    """
+
+    lock_dir = ".locks"
+
+    def lock(self, name):
+        # Exclusive lock shared by every session using this data directory
+        return FileLock(os.path.join(self.lock_dir, f"{name}.lock"))
+
+    def index_path(self, name):
+        # SQLite file of a derived index (search, deadlines; see indexdb.py)
+        return f"{name}.db"
+
+    def _version_file(self, project_id):
+        return os.path.join(self.lock_dir, f"project-{project_id}.version")
+
+    def project_version(self, project_id):
+        # Counter bumped on every save of the project; call while holding lock(f"project-{ID}")
+        try:
+            with open(self._version_file(project_id), "r") as file:
+                return int(file.read() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def bump_project_version(self, project_id):
+        version = self.project_version(project_id) + 1
+        os.makedirs(self.lock_dir, exist_ok=True)
+        atomic_write(self._version_file(project_id), str(version), "none")
+        return version
+
+    # registry (emails and usernames)
+    @abc.abstractmethod
+    def load_registry(self):
+        ...
+
+    @abc.abstractmethod
+    def registry_stamp(self):
+        # Token that changes whenever the registry changes
+        ...
+
+    @abc.abstractmethod
+    def add_registry_user(self, data, ID, email, username):
+        ...
+
+    @abc.abstractmethod
+    def rename_registry_user(self, data, ID, new_username):
+        ...
+
+    @abc.abstractmethod
+    def change_registry_email(self, data, ID, old_email, new_email):
+        ...
+
+    def save_registry(self, data):
+        # Store a whole registry built in memory ({'emails': [...], 'usernames': {ID: username}}, in
+        # the same order) at once, e.g. a generated data set; backends with one row per user add each one
+        for (ID, username), email in zip(data["usernames"].items(), data["emails"]):
+            self.add_registry_user(data, ID, email, username)
+
+    # users
+    @abc.abstractmethod
+    def user_exists(self, username):
+        ...
+
+    @abc.abstractmethod
+    def load_user(self, username):
+        ...
+
+    @abc.abstractmethod
+    def save_user(self, user_data):
+        ...
+
+    @abc.abstractmethod
+    def rename_user(self, old_username, new_username):
+        ...
+
+    @abc.abstractmethod
+    def load_user_projects(self, username):
+        ...
+
+    @abc.abstractmethod
+    def add_user_project(self, username, project_id):
+        ...
+
+    @abc.abstractmethod
+    def remove_user_project(self, username, project_id):
+        ...
+
+    @abc.abstractmethod
+    def set_user_projects(self, username, project_ids):
+        # Replace the user's whole list of projects (manager import)
+        ...
+
+    # projects
+    @abc.abstractmethod
+    def load_project(self, ID):
+        ...
+
+    @abc.abstractmethod
+    def save_project(self, project_data):
+        ...
+
+    @abc.abstractmethod
+    def delete_project(self, ID):
+        # Returns False when the project does not exist
+        ...
+
+    @abc.abstractmethod
+    def project_ids(self):
+        # IDs of every stored project (used to build derived indexes)
+        ...
+
+    @abc.abstractmethod
+    def load_project_summaries(self, IDs):
+        # {ID: project_summary(...)} for the given projects, without loading their tasks
+        ...
+
+    def save_project_header(self, project_data):
+        # Persist the project-level fields (title, owner, collaborators)
+        self.save_project(project_data)
+
+    def save_task(self, project_data, task_id):
+        # Persist one task of the project; backends that cannot write a
+        # single task fall back to saving the whole project
+        self.save_project(project_data)
+
+    def delete_task(self, project_data, task_id):
+        # project_data no longer contains the task
+        self.save_project(project_data)
+
+    def save_changes(self, project_data, task_ids, deleted_ids, header):
+        # Persist a batch of changes to an already stored project:
+        # the tasks in task_ids, the removal of deleted_ids and, if header is True, the project header
+        for task_id in deleted_ids:
+            self.delete_task(project_data, task_id)
+        for task_id in task_ids:
+            self.save_task(project_data, task_id)
+        if header:
+            self.save_project_header(project_data)
+
+    @abc.abstractmethod
+    def append_history(self, project_id, task_id, entries):
+        # Append entries to the task's history log
+        ...
+
+    @abc.abstractmethod
+    def iter_history(self, project_id, task_id):
+        # Yield the task's history entries oldest first
+        ...
+
+    # whole database
+    @abc.abstractmethod
+    def load_assignments(self, user_ID):
+        # Tasks assigned to the user across all projects: assignment_row(...) plus "project" and "task" IDs
+        ...
+
+    @abc.abstractmethod
+    def update_assignments(self, project_id, changes):
+        # changes: {user ID: {task ID: assignment_row(...) or None to drop it}}
+        ...
+
+    @abc.abstractmethod
+    def purge(self):
+        # Returns (had_projects, had_users)
+        ...
+
+    @contextmanager
+    def bulk(self):
+        # Groups a large number of writes (manager import): a backend may skip per-write syncs and
+        # write shared files once at the end. Projects saved inside it bypass Project, so their
+        # assignments are indexed afterwards.
+        yield self
+
+
+def project_summary(project_data, counts=None):
+    # What project listings show: no task bodies, comments or history ('counts' of tasks
+    # per status when they are already known)
+    if counts is None:
+        counts = {}
+        for task in project_data["tasks"].values():
+            counts[task["status"]] = counts.get(task["status"], 0) + 1
+    return {"ID": project_data["ID"], "title": project_data["title"], "owner": project_data["owner"],
+            "members": len(project_data["collaborators"]), "tasks": counts}
+
+
+def assignment_row(task):
+    # What a user's cross-project task list shows for one assigned task
+    return {"title": task["title"], "status": task["status"], "priority": task["priority"], "end_time": task["end_time"]}
+
+
+class JSONStorage(Storage):
+    """
+    The original file layout:
+        users/<name>/<name>.json, users/<name>/projects.json,
+        projects/<id>.json and emails_and_usernames.json
+
+    Task history is kept out of the project data in append-only
+    projects/<id>/history/<task id>.jsonl segments.
+
+    With split_tasks=True every task lives in projects/<id>/tasks/<task id>.json
+    and projects/<id>.json only keeps the project header with the ordered
+    list of task IDs, so a task edit rewrites just that task's file.
+    Both layouts are read back transparently.
+
+    Files are written with the codec from fileio.py (compact JSON unless
+    'codec' says otherwise) and read back whatever codec wrote them.
+
+    projects/summaries.json holds project_summary() of every project and
+    is refreshed by each project write, so listings never open project files.
+    assignments/<user ID>.json is the inverted index behind a user's task
+    list ({project ID: {task ID: assignment_row()}}), updated by Project.
+    """
+
+    def __init__(self, root=".", split_tasks=False, durability=None, codec=None):
+        self.root = root
+        self.split_tasks = split_tasks
+        self.durability = durability
+        self.codec = codec
+        self.registry_path = os.path.join(root, REGISTRY_FILE)
+        self.users_path = os.path.join(root, "users")
+        self.projects_path = os.path.join(root, "projects")
+        self.lock_dir = os.path.join(root, ".locks")
+        self.summaries_path = os.path.join(self.projects_path, "summaries.json")
+        self.assignments_path = os.path.join(root, "assignments")
+        self._summaries = None
+        self._summaries_stamp = None
+        # inside bulk(): shared files (registry, summaries) written once at the end, by path
+        self._deferred = None
+
+    def _user_file(self, username):
+        return os.path.join(self.users_path, username, f"{username}.json")
+
+    def _user_projects_file(self, username):
+        return os.path.join(self.users_path, username, "projects.json")
+
+    def _project_file(self, ID):
+        return os.path.join(self.projects_path, f"{ID}.json")
+
+    def _project_folder(self, ID):
+        return os.path.join(self.projects_path, ID)
+
+    def _task_file(self, project_id, task_id):
+        return os.path.join(self._project_folder(project_id), "tasks", f"{task_id}.json")
+
+    def _history_file(self, project_id, task_id):
+        return os.path.join(self._project_folder(project_id), "history", f"{task_id}.jsonl")
+
+    def _is_split(self, project_id):
+        # A project stored in the single-file layout is converted by its next full save
+        return self.split_tasks and os.path.isdir(os.path.join(self._project_folder(project_id), "tasks"))
+
+    @staticmethod
+    def _read(path):
+        return read_data(path)
+
+    def _write(self, path, data):
+        # temp file + rename, fsynced according to TRELLOMIZE_DURABILITY (see fileio.py)
+        write_data(path, data, self.codec, self.durability)
+
+    def load_registry(self):
+        return self._read(self.registry_path)
+
+    def registry_stamp(self):
+        stat = os.stat(self.registry_path)
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _write_registry(self, data):
+        if self._deferred is not None:
+            self._deferred[self.registry_path] = data
+        else:
+            self._write(self.registry_path, data)
+
+    def add_registry_user(self, data, ID, email, username):
+        self._write_registry(data)
+
+    def rename_registry_user(self, data, ID, new_username):
+        self._write_registry(data)
+
+    def change_registry_email(self, data, ID, old_email, new_email):
+        self._write_registry(data)
+
+    def save_registry(self, data):
+        self._write_registry(data)
+
+    def user_exists(self, username):
+        return os.path.exists(self._user_file(username))
+
+    def load_user(self, username):
+        return self._read(self._user_file(username))
+
+    def save_user(self, user_data):
+        os.makedirs(os.path.join(self.users_path, user_data["username"]), exist_ok=True)
+        self._write(self._user_file(user_data["username"]), user_data)
+
+    def rename_user(self, old_username, new_username):
+        os.rename(os.path.join(self.users_path, old_username), os.path.join(self.users_path, new_username))
+        os.rename(os.path.join(self.users_path, new_username, f"{old_username}.json"), self._user_file(new_username))
+
+    def load_user_projects(self, username):
+        # None when the user has never joined a project
+        path = self._user_projects_file(username)
+        if not os.path.exists(path):
+            return None
+        return self._read(path)
+
+    def add_user_project(self, username, project_id):
+        path = self._user_projects_file(username)
+        with self.lock(f"user-{username}"):
+            if os.path.exists(path):
+                data = self._read(path)
+                data['projects'].append(project_id)
+            else:
+                data = {'projects': [project_id]}
+            self._write(path, data)
+
+    def remove_user_project(self, username, project_id):
+        path = self._user_projects_file(username)
+        with self.lock(f"user-{username}"):
+            data = self._read(path)
+            if project_id in data['projects']:
+                data['projects'].remove(project_id)
+                self._write(path, data)
+
+    def set_user_projects(self, username, project_ids):
+        os.makedirs(os.path.join(self.users_path, username), exist_ok=True)
+        with self.lock(f"user-{username}"):
+            self._write(self._user_projects_file(username), {'projects': list(project_ids)})
+
+    def project_ids(self):
+        if not os.path.isdir(self.projects_path):
+            return []
+        return [name[:-len(".json")] for name in os.listdir(self.projects_path)
+                if name.endswith(".json") and name != os.path.basename(self.summaries_path)]
+
+    def _load_summaries(self):
+        # Cached until the file changes on disk
+        try:
+            stat = os.stat(self.summaries_path)
+        except FileNotFoundError:
+            self._summaries, self._summaries_stamp = {}, None
+            return self._summaries
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp != self._summaries_stamp:
+            self._summaries, self._summaries_stamp = self._read(self.summaries_path), stamp
+        return self._summaries
+
+    def _update_summaries(self, ID, summary):
+        # summary=None drops the project; unchanged summaries are not rewritten
+        if self._deferred is not None:
+            if self.summaries_path not in self._deferred:
+                self._deferred[self.summaries_path] = dict(self._load_summaries())
+            summaries = self._deferred[self.summaries_path]
+            if summary is None:
+                summaries.pop(ID, None)
+            else:
+                summaries[ID] = summary
+            return
+        with self.lock("summaries"):
+            summaries = self._load_summaries()
+            if summaries.get(ID) == summary:
+                return
+            summaries = dict(summaries)
+            if summary is None:
+                del summaries[ID]
+            else:
+                summaries[ID] = summary
+            os.makedirs(self.projects_path, exist_ok=True)
+            self._write(self.summaries_path, summaries)
+            self._summaries = None
+            self._summaries_stamp = None
+
+    def _task_status(self, path):
+        # Stored status of one task of a split project (None when it has no file yet)
+        return self._read(path)["status"] if os.path.exists(path) else None
+
+    def _update_task_counts(self, project_data, moves):
+        # Moves the summary's task counts from the old to the new status of the tasks written
+        # ((old, new) pairs, None for no task) instead of recounting every task of the project
+        summaries = self._deferred.get(self.summaries_path) if self._deferred is not None else None
+        summary = (summaries if summaries is not None else self._load_summaries()).get(project_data["ID"])
+        if summary is None:
+            self._update_summaries(project_data["ID"], project_summary(project_data))
+            return
+        counts = dict(summary["tasks"])
+        for old, new in moves:
+            if old is not None:
+                counts[old] = counts.get(old, 0) - 1
+                if counts[old] <= 0:
+                    del counts[old]
+            if new is not None:
+                counts[new] = counts.get(new, 0) + 1
+        self._update_summaries(project_data["ID"], project_summary(project_data, counts))
+
+    def load_project_summaries(self, IDs):
+        summaries = self._load_summaries()
+        result = {}
+        for ID in IDs:
+            if ID in summaries:
+                result[ID] = summaries[ID]
+            elif os.path.exists(self._project_file(ID)):
+                # project saved before the index existed
+                result[ID] = project_summary(self.load_project(ID))
+                self._update_summaries(ID, result[ID])
+        return result
+
+    def load_project(self, ID):
+        data = self._read(self._project_file(ID))
+        if isinstance(data["tasks"], list):
+            # split layout: the header lists the task IDs in order
+            data["tasks"] = {task_id: self._read(self._task_file(ID, task_id)) for task_id in data["tasks"]}
+        return data
+
+    def _write_header(self, project_data):
+        header = dict(project_data)
+        header["tasks"] = list(project_data["tasks"])
+        self._write(self._project_file(project_data["ID"]), header)
+
+    def save_project(self, project_data):
+        os.makedirs(self.projects_path, exist_ok=True)
+        if not self.split_tasks:
+            # tasks may be any mapping (see Project.project_data); the codecs need a dict
+            self._write(self._project_file(project_data["ID"]), dict(project_data, tasks=dict(project_data["tasks"])))
+            self._update_summaries(project_data["ID"], project_summary(project_data))
+            return
+        tasks_folder = os.path.dirname(self._task_file(project_data["ID"], ""))
+        os.makedirs(tasks_folder, exist_ok=True)
+        for task_id, task in project_data["tasks"].items():
+            self._write(self._task_file(project_data["ID"], task_id), task)
+        self._write_header(project_data)
+        # drop files of tasks that no longer belong to the project
+        for name in os.listdir(tasks_folder):
+            if name[:-len(".json")] not in project_data["tasks"]:
+                os.remove(os.path.join(tasks_folder, name))
+        self._update_summaries(project_data["ID"], project_summary(project_data))
+
+    def save_project_header(self, project_data):
+        if not self._is_split(project_data["ID"]):
+            self.save_project(project_data)
+            return
+        self._write_header(project_data)
+        self._update_summaries(project_data["ID"], project_summary(project_data))
+
+    def save_task(self, project_data, task_id):
+        path = self._task_file(project_data["ID"], task_id)
+        if not self._is_split(project_data["ID"]):
+            self.save_project(project_data)
+            return
+        old_status = self._task_status(path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._write(path, project_data["tasks"][task_id])
+        if old_status is None:
+            self._write_header(project_data)
+        self._update_task_counts(project_data, [(old_status, project_data["tasks"][task_id]["status"])])
+
+    def delete_task(self, project_data, task_id):
+        if not self._is_split(project_data["ID"]):
+            self.save_project(project_data)
+        else:
+            self._write_header(project_data)
+            self._update_task_counts(project_data, [(self._task_status(self._task_file(project_data["ID"], task_id)), None)])
+        for path in (self._task_file(project_data["ID"], task_id), self._history_file(project_data["ID"], task_id)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def save_changes(self, project_data, task_ids, deleted_ids, header):
+        ID = project_data["ID"]
+        if not self._is_split(ID):
+            # one rewrite of the single project file covers the whole batch
+            self.save_project(project_data)
+        else:
+            moves = []
+            for task_id in task_ids:
+                path = self._task_file(ID, task_id)
+                moves.append((self._task_status(path), project_data["tasks"][task_id]["status"]))
+                self._write(path, project_data["tasks"][task_id])
+            if header or deleted_ids or any(old is None for old, _ in moves):
+                self._write_header(project_data)
+            for task_id in deleted_ids:
+                path = self._task_file(ID, task_id)
+                moves.append((self._task_status(path), None))
+                if os.path.exists(path):
+                    os.remove(path)
+            self._update_task_counts(project_data, moves)
+        for task_id in deleted_ids:
+            path = self._history_file(ID, task_id)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def append_history(self, project_id, task_id, entries):
+        path = self._history_file(project_id, task_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        append_lines(path, [json.dumps(entry, separators=(",", ":")) + "\n" for entry in entries], self.durability)
+
+    def iter_history(self, project_id, task_id):
+        path = self._history_file(project_id, task_id)
+        if not os.path.exists(path):
+            return
+        with open(path, "r") as file:
+            for line in file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # torn last line of an interrupted append
+                    continue
+
+    def index_path(self, name):
+        return os.path.join(self.root, f"{name}.db")
+
+    def _assignments_file(self, user_ID):
+        return os.path.join(self.assignments_path, f"{user_ID}.json")
+
+    def _ensure_assignments(self):
+        # Data written before the index existed: build it once from every project
+        if os.path.isdir(self.assignments_path):
+            return
+        with self.lock("assignments"):
+            if os.path.isdir(self.assignments_path):
+                return
+            index = {}
+            for project_id in self.project_ids():
+                for task_id, task in self.load_project(project_id)["tasks"].items():
+                    for user in task["assignees"]:
+                        index.setdefault(user, {}).setdefault(project_id, {})[task_id] = assignment_row(task)
+            temp_path = f"{self.assignments_path}.new"
+            if os.path.isdir(temp_path):
+                shutil.rmtree(temp_path)
+            os.makedirs(temp_path)
+            for user, projects in index.items():
+                self._write(os.path.join(temp_path, f"{user}.json"), projects)
+            os.rename(temp_path, self.assignments_path)
+
+    def load_assignments(self, user_ID):
+        self._ensure_assignments()
+        path = self._assignments_file(user_ID)
+        if not os.path.exists(path):
+            return []
+        return [dict(row, project=project_id, task=task_id)
+                for project_id, tasks in self._read(path).items() for task_id, row in tasks.items()]
+
+    def update_assignments(self, project_id, changes):
+        self._ensure_assignments()
+        for user, tasks in changes.items():
+            path = self._assignments_file(user)
+            with self.lock(f"assignments-{user}"):
+                data = self._read(path) if os.path.exists(path) else {}
+                project = data.setdefault(project_id, {})
+                for task_id, row in tasks.items():
+                    if row is None:
+                        project.pop(task_id, None)
+                    else:
+                        project[task_id] = row
+                if not project:
+                    del data[project_id]
+                self._write(path, data)
+
+    def delete_project(self, ID):
+        path = self._project_file(ID)
+        if not os.path.exists(path):
+            return False
+        os.remove(path)
+        if os.path.isdir(self._project_folder(ID)):
+            shutil.rmtree(self._project_folder(ID))
+        self._update_summaries(ID, None)
+        return True
+
+    @contextmanager
+    def bulk(self):
+        # No fsync per file (one sync of the whole file system at the end) and one write of the
+        # registry and of summaries.json; the assignment index is rebuilt from the projects on next use
+        durability, level = self.durability, self.durability or get_durability()
+        self.durability = "none"
+        self._deferred = {}
+        try:
+            yield self
+        finally:
+            deferred, self._deferred = self._deferred, None
+            self.durability = durability
+            for path, data in deferred.items():
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                self._write(path, data)
+            self._summaries = None
+            self._summaries_stamp = None
+            if self.summaries_path in deferred and os.path.isdir(self.assignments_path):
+                shutil.rmtree(self.assignments_path)
+            if level != "none" and hasattr(os, "sync"):
+                os.sync()
+
+    def purge(self):
+        had_projects = had_users = False
+        os.makedirs(self.projects_path, exist_ok=True)
+        os.makedirs(self.users_path, exist_ok=True)
+        with os.scandir(self.projects_path) as entries:
+            had_projects = any(entries)
+        if had_projects:
+            shutil.rmtree(self.projects_path)
+            os.makedirs(self.projects_path)
+            self._summaries = None
+            self._summaries_stamp = None
+            if os.path.isdir(self.assignments_path):
+                shutil.rmtree(self.assignments_path)
+            os.makedirs(self.assignments_path)
+
+        with os.scandir(self.users_path) as entries:
+            had_users = any(entries)
+        if had_users:
+            shutil.rmtree(self.users_path)
+            os.makedirs(self.users_path)
+            self._write(self.registry_path, {'emails': [], 'usernames': {}})
+        return had_projects, had_users
+
+
+class SQLiteStorage(Storage):
+    """
+    Single-file SQLite database with tables for users, projects,
+    memberships, tasks, assignees, comments and history.
+    Memberships back both project collaborators and users' project lists;
+    the history table is append-only and only read per task.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS users (
+            id TEXT PRIMARY KEY,
+            username TEXT NOT NULL UNIQUE,
+            email TEXT NOT NULL UNIQUE,
+            password TEXT,
+            active INTEGER NOT NULL DEFAULT 1,
+            last_login TEXT
+        );
+        CREATE TABLE IF NOT EXISTS projects (
+            id TEXT PRIMARY KEY,
+            title TEXT NOT NULL,
+            owner TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS memberships (
+            project_id TEXT NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+            user_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            PRIMARY KEY (project_id, user_id)
+        );
+        CREATE INDEX IF NOT EXISTS memberships_user ON memberships(user_id);
+        CREATE TABLE IF NOT EXISTS tasks (
+            id TEXT PRIMARY KEY,
+            project_id TEXT NOT NULL REFERENCES projects(id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            title TEXT NOT NULL,
+            description TEXT NOT NULL,
+            priority TEXT NOT NULL,
+            status TEXT NOT NULL,
+            start_time TEXT NOT NULL,
+            end_time TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS tasks_project ON tasks(project_id, position);
+        CREATE TABLE IF NOT EXISTS task_assignees (
+            task_id TEXT NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+            user_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            PRIMARY KEY (task_id, user_id)
+        );
+        CREATE INDEX IF NOT EXISTS task_assignees_user ON task_assignees(user_id);
+        CREATE TABLE IF NOT EXISTS comments (
+            task_id TEXT NOT NULL REFERENCES tasks(id) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            user_id TEXT NOT NULL,
+            comment TEXT NOT NULL,
+            role TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            PRIMARY KEY (task_id, position)
+        );
+        CREATE TABLE IF NOT EXISTS history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            project_id TEXT NOT NULL,
+            task_id TEXT NOT NULL,
+            user_id TEXT,
+            action TEXT,
+            details TEXT NOT NULL,
+            timestamp TEXT
+        );
+        CREATE INDEX IF NOT EXISTS history_task ON history(task_id, id);
+        CREATE INDEX IF NOT EXISTS history_project ON history(project_id);
+    """
+
+    # TRELLOMIZE_DURABILITY levels mapped onto SQLite's synchronous setting
+    SYNCHRONOUS = {"none": "OFF", "file": "NORMAL", "dir": "FULL"}
+
+    def __init__(self, path="trellomize.db", durability=None):
+        self.path = path
+        self.lock_dir = f"{path}.locks"
+        self._lock = threading.RLock()
+        # imported here: the JSON backend never needs sqlite3
+        import sqlite3
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self._synchronous = self.SYNCHRONOUS[durability or get_durability()]
+        self.conn.execute(f"PRAGMA synchronous = {self._synchronous}")
+        with self.conn:
+            self.conn.executescript(self.SCHEMA)
+            self.conn.execute("INSERT OR IGNORE INTO meta VALUES ('registry_version', 0)")
+            # databases created before users had a last login day
+            if "last_login" not in {row[1] for row in self.conn.execute("PRAGMA table_info(users)")}:
+                self.conn.execute("ALTER TABLE users ADD COLUMN last_login TEXT")
+
+    def _bump_registry(self):
+        self.conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'registry_version'")
+
+    def _user_id(self, username):
+        row = self.conn.execute("SELECT id FROM users WHERE username = ?", (username,)).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"No such user: {username}")
+        return row[0]
+
+    def load_registry(self):
+        with self._lock:
+            rows = self.conn.execute("SELECT id, username, email FROM users ORDER BY rowid").fetchall()
+        return {"emails": [email for _, _, email in rows], "usernames": {ID: username for ID, username, _ in rows}}
+
+    def registry_stamp(self):
+        with self._lock:
+            return self.conn.execute("SELECT value FROM meta WHERE key = 'registry_version'").fetchone()[0]
+
+    def add_registry_user(self, data, ID, email, username):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO users (id, username, email) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET username = excluded.username, email = excluded.email",
+                (ID, username, email))
+            self._bump_registry()
+
+    def rename_registry_user(self, data, ID, new_username):
+        with self._lock, self.conn:
+            self.conn.execute("UPDATE users SET username = ? WHERE id = ?", (new_username, ID))
+            self._bump_registry()
+
+    def change_registry_email(self, data, ID, old_email, new_email):
+        with self._lock, self.conn:
+            self.conn.execute("UPDATE users SET email = ? WHERE id = ?", (new_email, ID))
+            self._bump_registry()
+
+    def user_exists(self, username):
+        with self._lock:
+            row = self.conn.execute("SELECT 1 FROM users WHERE username = ? AND password IS NOT NULL", (username,)).fetchone()
+        return row is not None
+
+    def load_user(self, username):
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT email, username, password, active, id, last_login FROM users WHERE username = ? AND password IS NOT NULL",
+                (username,)).fetchone()
+        if row is None:
+            raise FileNotFoundError(f"No such user: {username}")
+        email, username, password, active, ID, last_login = row
+        user_data = {"email": email, "username": username, "password": password, "active": bool(active), "ID": ID}
+        if last_login is not None:
+            user_data["last_login"] = last_login
+        return user_data
+
+    def save_user(self, user_data):
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO users (id, username, email, password, active, last_login) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET username = excluded.username, email = excluded.email, "
+                "password = excluded.password, active = excluded.active, last_login = excluded.last_login",
+                (user_data["ID"], user_data["username"], user_data["email"], user_data["password"], int(user_data["active"]),
+                 user_data.get("last_login")))
+            self._bump_registry()
+
+    def rename_user(self, old_username, new_username):
+        # Rows are keyed by ID; save_user stores the new username
+        pass
+
+    def load_user_projects(self, username):
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT m.project_id FROM memberships m JOIN users u ON u.id = m.user_id "
+                "WHERE u.username = ? ORDER BY m.rowid", (username,)).fetchall()
+        if not rows:
+            return None
+        return {"projects": [row[0] for row in rows]}
+
+    def add_user_project(self, username, project_id):
+        with self._lock, self.conn:
+            user_id = self._user_id(username)
+            self.conn.execute(
+                "INSERT OR IGNORE INTO memberships (project_id, user_id, position) "
+                "SELECT ?, ?, COALESCE(MAX(position) + 1, 0) FROM memberships WHERE project_id = ?",
+                (project_id, user_id, project_id))
+
+    def remove_user_project(self, username, project_id):
+        with self._lock, self.conn:
+            user_id = self._user_id(username)
+            self.conn.execute("DELETE FROM memberships WHERE project_id = ? AND user_id = ?", (project_id, user_id))
+
+    def set_user_projects(self, username, project_ids):
+        # memberships are the saved projects' collaborators
+        pass
+
+    def load_project(self, ID):
+        with self._lock:
+            row = self.conn.execute("SELECT title, owner FROM projects WHERE id = ?", (ID,)).fetchone()
+            if row is None:
+                raise FileNotFoundError(f"No such project: {ID}")
+            collaborators = [r[0] for r in self.conn.execute(
+                "SELECT user_id FROM memberships WHERE project_id = ? ORDER BY position", (ID,))]
+            tasks = {}
+            for task_row in self.conn.execute(
+                    "SELECT id, title, description, priority, status, start_time, end_time "
+                    "FROM tasks WHERE project_id = ? ORDER BY position", (ID,)).fetchall():
+                tasks[task_row[0]] = self._load_task(task_row)
+        return {"title": row[0], "owner": row[1], "tasks": tasks, "collaborators": collaborators, "ID": ID}
+
+    def project_ids(self):
+        with self._lock:
+            return [row[0] for row in self.conn.execute("SELECT id FROM projects")]
+
+    def load_project_summaries(self, IDs):
+        # Computed from the indexed tables, so it is always in step with the projects
+        IDs = list(IDs)
+        placeholders = ",".join("?" * len(IDs))
+        with self._lock:
+            summaries = {ID: {"ID": ID, "title": title, "owner": owner, "members": 0, "tasks": {}}
+                         for ID, title, owner in self.conn.execute(
+                             f"SELECT id, title, owner FROM projects WHERE id IN ({placeholders})", IDs)}
+            for ID, members in self.conn.execute(
+                    f"SELECT project_id, COUNT(*) FROM memberships WHERE project_id IN ({placeholders}) "
+                    "GROUP BY project_id", IDs):
+                summaries[ID]["members"] = members
+            for ID, status, count in self.conn.execute(
+                    f"SELECT project_id, status, COUNT(*) FROM tasks WHERE project_id IN ({placeholders}) "
+                    "GROUP BY project_id, status", IDs):
+                summaries[ID]["tasks"][status] = count
+        return summaries
+
+    def _load_task(self, task_row):
+        ID, title, description, priority, status, start_time, end_time = task_row
+        assignees = [r[0] for r in self.conn.execute(
+            "SELECT user_id FROM task_assignees WHERE task_id = ? ORDER BY position", (ID,))]
+        comments = [{"user": user, "comment": comment, "role": role, "timestamp": timestamp}
+                    for user, comment, role, timestamp in self.conn.execute(
+                        "SELECT user_id, comment, role, timestamp FROM comments WHERE task_id = ? ORDER BY position", (ID,))]
+        return {"title": title, "description": description, "priority": priority, "status": status, "ID": ID,
+                "start_time": start_time, "end_time": end_time, "assignees": assignees,
+                "comments": comments, "history": []}
+
+    def _save_task(self, project_id, position, task):
+        self.conn.execute(
+            "INSERT INTO tasks (id, project_id, position, title, description, priority, status, start_time, end_time) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET project_id = excluded.project_id, position = excluded.position, "
+            "title = excluded.title, description = excluded.description, priority = excluded.priority, "
+            "status = excluded.status, start_time = excluded.start_time, end_time = excluded.end_time",
+            (task["ID"], project_id, position, task["title"], task["description"], task["priority"],
+             task["status"], task["start_time"], task["end_time"]))
+        self.conn.execute("DELETE FROM task_assignees WHERE task_id = ?", (task["ID"],))
+        self.conn.execute("DELETE FROM comments WHERE task_id = ?", (task["ID"],))
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO task_assignees (task_id, user_id, position) VALUES (?, ?, ?)",
+            [(task["ID"], user, idx) for idx, user in enumerate(task["assignees"])])
+        self.conn.executemany(
+            "INSERT INTO comments (task_id, position, user_id, comment, role, timestamp) VALUES (?, ?, ?, ?, ?, ?)",
+            [(task["ID"], idx, c["user"], c["comment"], c["role"], c["timestamp"]) for idx, c in enumerate(task["comments"])])
+
+    def _save_header(self, project_data):
+        ID = project_data["ID"]
+        self.conn.execute(
+            "INSERT INTO projects (id, title, owner) VALUES (?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET title = excluded.title, owner = excluded.owner",
+            (ID, project_data["title"], project_data["owner"]))
+
+        collaborators = project_data["collaborators"]
+        placeholders = ",".join("?" * len(collaborators))
+        self.conn.execute(
+            f"DELETE FROM memberships WHERE project_id = ? AND user_id NOT IN ({placeholders})",
+            (ID, *collaborators))
+        for idx, user_id in enumerate(collaborators):
+            self.conn.execute(
+                "INSERT INTO memberships (project_id, user_id, position) VALUES (?, ?, ?) "
+                "ON CONFLICT(project_id, user_id) DO UPDATE SET position = excluded.position",
+                (ID, user_id, idx))
+
+    def save_project(self, project_data):
+        ID = project_data["ID"]
+        with self._lock, self.conn:
+            self._save_header(project_data)
+            tasks = project_data["tasks"]
+            placeholders = ",".join("?" * len(tasks))
+            self.conn.execute(f"DELETE FROM tasks WHERE project_id = ? AND id NOT IN ({placeholders})", (ID, *tasks))
+            self.conn.execute(f"DELETE FROM history WHERE project_id = ? AND task_id NOT IN ({placeholders})", (ID, *tasks))
+            for position, task in enumerate(tasks.values()):
+                self._save_task(ID, position, task)
+
+    def save_project_header(self, project_data):
+        with self._lock, self.conn:
+            self._save_header(project_data)
+
+    def _upsert_task(self, project_data, task_id):
+        # Keeps the task's position when it already exists, appends it otherwise
+        ID = project_data["ID"]
+        row = self.conn.execute("SELECT position FROM tasks WHERE id = ?", (task_id,)).fetchone()
+        if row is None:
+            row = self.conn.execute("SELECT COALESCE(MAX(position) + 1, 0) FROM tasks WHERE project_id = ?", (ID,)).fetchone()
+        self._save_task(ID, row[0], project_data["tasks"][task_id])
+
+    def _delete_task(self, project_id, task_id):
+        self.conn.execute("DELETE FROM tasks WHERE id = ? AND project_id = ?", (task_id, project_id))
+        self.conn.execute("DELETE FROM history WHERE task_id = ? AND project_id = ?", (task_id, project_id))
+
+    def save_task(self, project_data, task_id):
+        with self._lock:
+            if self.conn.execute("SELECT 1 FROM projects WHERE id = ?", (project_data["ID"],)).fetchone() is None:
+                self.save_project(project_data)
+                return
+            with self.conn:
+                self._upsert_task(project_data, task_id)
+
+    def delete_task(self, project_data, task_id):
+        with self._lock, self.conn:
+            self._delete_task(project_data["ID"], task_id)
+
+    def save_changes(self, project_data, task_ids, deleted_ids, header):
+        # the whole batch is one transaction
+        with self._lock, self.conn:
+            for task_id in deleted_ids:
+                self._delete_task(project_data["ID"], task_id)
+            for task_id in task_ids:
+                self._upsert_task(project_data, task_id)
+            if header:
+                self._save_header(project_data)
+
+    def append_history(self, project_id, task_id, entries):
+        rows = []
+        for entry in entries:
+            details = {k: v for k, v in entry.items() if k not in ("user", "action", "timestamp")}
+            rows.append((project_id, task_id, entry.get("user"), entry.get("action"), json.dumps(details), entry.get("timestamp")))
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO history (project_id, task_id, user_id, action, details, timestamp) VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+    def iter_history(self, project_id, task_id):
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT user_id, action, details, timestamp FROM history WHERE task_id = ? AND project_id = ? ORDER BY id",
+                (task_id, project_id)).fetchall()
+        for user, action, details, timestamp in rows:
+            yield {"user": user, "action": action, **json.loads(details), "timestamp": timestamp}
+
+    def load_assignments(self, user_ID):
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT t.project_id, t.id, t.title, t.status, t.priority, t.end_time FROM task_assignees a "
+                "JOIN tasks t ON t.id = a.task_id WHERE a.user_id = ? ORDER BY t.project_id, t.position",
+                (user_ID,)).fetchall()
+        return [{"title": title, "status": status, "priority": priority, "end_time": end_time,
+                 "project": project_id, "task": task_id}
+                for project_id, task_id, title, status, priority, end_time in rows]
+
+    def update_assignments(self, project_id, changes):
+        # task_assignees (indexed by user) already is the inverted index
+        pass
+
+    def index_path(self, name):
+        return f"{self.path}.{name}"
+
+    def delete_project(self, ID):
+        with self._lock, self.conn:
+            cursor = self.conn.execute("DELETE FROM projects WHERE id = ?", (ID,))
+            self.conn.execute("DELETE FROM history WHERE project_id = ?", (ID,))
+        return cursor.rowcount > 0
+
+    @contextmanager
+    def bulk(self):
+        # Commits are not synced until the end, where the write-ahead log is checkpointed into the database
+        with self._lock:
+            self.conn.execute("PRAGMA synchronous = OFF")
+        try:
+            yield self
+        finally:
+            with self._lock:
+                self.conn.execute(f"PRAGMA synchronous = {self._synchronous}")
+                self.conn.execute("PRAGMA wal_checkpoint(FULL)")
+
+    def purge(self):
+        with self._lock, self.conn:
+            had_projects = self.conn.execute("SELECT COUNT(*) FROM projects").fetchone()[0] > 0
+            had_users = self.conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] > 0
+            self.conn.execute("DELETE FROM projects")
+            self.conn.execute("DELETE FROM memberships")
+            self.conn.execute("DELETE FROM history")
+            self.conn.execute("DELETE FROM users")
+            self._bump_registry()
+        return had_projects, had_users
+
+
+_storage = None
+
+
+def get_storage():
+    # Backend selected with TRELLOMIZE_STORAGE=json|sqlite|remote (TRELLOMIZE_DB sets the SQLite file,
+    # TRELLOMIZE_JSON_LAYOUT=split stores one file per task, TRELLOMIZE_CODEC picks the file format,
+    # remote talks to server.py on TRELLOMIZE_SOCKET)
+    global _storage
+    if _storage is None:
+        kind = os.environ.get("TRELLOMIZE_STORAGE", "json").lower()
+        if kind == "sqlite":
+            _storage = SQLiteStorage(os.environ.get("TRELLOMIZE_DB", "trellomize.db"))
+        elif kind == "remote":
+            # imported here: only clients of the daemon need it
+            from remote import RemoteStorage
+            _storage = RemoteStorage()
+        else:
+            _storage = JSONStorage(split_tasks=os.environ.get("TRELLOMIZE_JSON_LAYOUT", "").lower() == "split",
+                                   codec=get_codec())
+    return _storage
+
+
+def set_storage(backend):
+    global _storage
+    _storage = backend
@@ -0,0 +1,68 @@
+import os
+import platform
+
+# Custom theme for console output using the rich library
+STYLES = {
+    "Title": "bold Magenta",
+    "Info": "blue",
+    "Notice": "bold green",
+    "Error": "bold red"
+}
+
+
+class LazyConsole:
+    """
+    Stand-in for a rich Console that imports rich and builds the real
+    console on first use, so commands that never print do not pay for
+    loading rich at startup.
+    """
+
+    def __init__(self):
+        self._console = None
+
+    def __getattr__(self, name):
+        if self._console is None:
+            from rich.console import Console
+            from rich.theme import Theme
+            self._console = Console(theme=Theme(STYLES))
+        return getattr(self._console, name)
+
+
+console = LazyConsole()
+
+
+def Table(*args, **kwargs):
+    # rich.table.Table, imported when the first table is rendered
+    from rich.table import Table
+    return Table(*args, **kwargs)
+
+
+def clear_screen():
+    #Clears the terminal screen based on the operating system.
+    os.system('cls' if os.name == 'nt' else 'clear')
+
+
+def wait_for(future, message):
+    # Waits for background work (e.g. password hashing) with a spinner so the terminal stays live
+    with console.status(message):
+        return future.result()
+
+
+def wait_for_key_press():
+    #Waits for a key press from the user and handles different OS requirements.
+    console.print("\nPress any key to continue...", style="yellow")
+    if platform.system().lower() == 'windows':
+        import msvcrt
+        return msvcrt.getch()
+    else:
+        import sys
+        import tty
+        import termios
+        fd = sys.stdin.fileno()
+        old_settings = termios.tcgetattr(fd)
+        try:
+            tty.setraw(fd)
+            ch = sys.stdin.read(1)
+        finally:
+            termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
+        return ch
@@ -1,22 +1,66 @@
 import os
+import json
 import shutil
-from unittest import TestCase, main
-from unittest.mock import patch, Mock
+import sys
+import tempfile
+import subprocess
+import threading
+import asyncio
+from datetime import datetime, timedelta
+from unittest import TestCase, main, skipIf
+from unittest.mock import patch, MagicMock, Mock
 
-from main import User, Project, Task
+from main import User, Project, Task, Status, Priority
+from registry import UserDirectory
+from search import get_search_index
+from deadlines import get_deadline_index
+from userstatus import get_user_status_index
+from manager import Manager
+from storage import JSONStorage, SQLiteStorage
+import storage
+from fileio import atomic_write, decode, encode, msgpack, FileLock
+from logsetup import get_logger, shutdown as shutdown_logging
+from bench.generate import generate
+from bench.harness import Harness, compare
+from startup import DEFERRED_MODULES, budget_ms, import_profile
+from membership import update_memberships
+from archive import export_archive, import_archive, read_records
+from batch import BatchSession, authenticate
+from server import StoreServer
+from remote import RemoteStorage
+from passwords import MAX_ROUNDS, MIN_ROUNDS, PasswordHasher, calibrate, cost_of, hasher
+
+
+def setUpModule():
+    # Log records of the whole suite go to a temporary file, not the data directory
+    global log_folder, log_env
+    log_folder = tempfile.mkdtemp()
+    shutdown_logging()
+    log_env = patch.dict(os.environ, {"TRELLOMIZE_LOG_FILE": os.path.join(log_folder, "test.jsonl")})
+    log_env.start()
+
+
+def tearDownModule():
+    shutdown_logging()
+    log_env.stop()
+    shutil.rmtree(log_folder)
 
 
 class TestMainClsUser(TestCase):
 
     @classmethod
     def setUpClass(cls):
-        # Set up a test user
+        # Set up a test user, saved in a throwaway data directory
+        cls.folder = tempfile.TemporaryDirectory()
+        cls.previous = storage._storage
+        storage.set_storage(JSONStorage(cls.folder.name))
         cls.user1 = User("user1@test.com", "user1test", "user1", ID="tester")
 
     @classmethod
     def tearDownClass(cls):
-        # Clean up after testing by removing user data directory
-        shutil.rmtree(f"users/user1test")
+        # Clean up after testing by removing the data directory
+        storage.set_storage(cls.previous)
+        cls.folder.cleanup()
 
     def test_create_user(self):
         # Check if user attributes match expected values
@@ -28,7 +72,7 @@ class TestMainClsUser(TestCase):
         # Save user data and check if file exists
         self.user1.save_user_data()
         expected_data_user1 = {"email": "user1@test.com", "username": "user1test", "password": "user1", "active": True, "ID": "tester"}
-        self.assertTrue(os.path.exists(f"users/{self.user1.username}/{self.user1.username}.json"))
+        self.assertTrue(os.path.exists(os.path.join(self.folder.name, f"users/{self.user1.username}/{self.user1.username}.json")))
         # Check if loaded user data matches expected data
         self.assertEqual(expected_data_user1, User.load_user_data(self.user1.username))
 
@@ -37,13 +81,17 @@ class TestMainClsProject(TestCase):
 
     @classmethod
     def setUpClass(cls):
-        # Set up a test project
+        # Set up a test project, saved in a throwaway data directory
+        cls.folder = tempfile.TemporaryDirectory()
+        cls.previous = storage._storage
+        storage.set_storage(JSONStorage(cls.folder.name))
         cls.project1 = Project("project test1", "user1", collaborators=None, ID="tester")
 
     @classmethod
     def tearDownClass(cls):
-        # Clean up after testing by removing project data file
-        os.remove(f"projects/tester.json")
+        # Clean up after testing by removing the data directory
+        storage.set_storage(cls.previous)
+        cls.folder.cleanup()
 
     def test_create_project(self):
         # Check if project attributes match expected values
@@ -56,7 +104,7 @@ class TestMainClsProject(TestCase):
         # Save project data and check if file exists
         self.project1.save_project_data()
         expected_data_project = {"title": "project test1", "owner": "user1", "tasks": {}, "collaborators": ["user1"], "ID": "tester"}
-        self.assertTrue(os.path.exists("projects/tester.json"))
+        self.assertTrue(os.path.exists(os.path.join(self.folder.name, "projects/tester.json")))
         # Check if loaded project data matches expected data
         self.assertEqual(expected_data_project, Project.load_project_data("tester"))
 
@@ -112,5 +160,1289 @@ class TestMainClsTask(TestCase):
         mock_obj.method.assert_called_once()
 
 
+class TestTaskModel(TestCase):
+
+    def setUp(self):
+        self.data = {"title": "t", "description": "d", "priority": "HIGH", "status": "DOING", "ID": "task1",
+                     "start_time": "2024-05-22 22:56:04", "end_time": "2024-05-23 22:56:04",
+                     "assignees": ["id1"], "comments": [], "history": []}
+
+    def test_typed_fields_and_round_trip(self):
+        task = Task.from_dict(self.data)
+        self.assertFalse(hasattr(task, "__dict__"))
+        self.assertIs(task.status, Status.DOING)
+        self.assertIs(task.priority, Priority.HIGH)
+        self.assertEqual(task.end - task.start, timedelta(days=1))
+        self.assertEqual(task.to_dict(), self.data)
+        task.status = "DONE"
+        self.assertIs(task.status, Status.DONE)
+        with self.assertRaises(ValueError):
+            task.priority = "URGENT"
+
+    def test_projects_hold_task_objects(self):
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder)
+        backend = JSONStorage(folder)
+        backend.save_project({"title": "p", "owner": "id1", "collaborators": ["id1"], "ID": "proj1",
+                              "tasks": {"task1": self.data}})
+        with patch("main.get_storage", return_value=backend):
+            project = Project.open("proj1")
+            task = project.tasks["task1"]
+            self.assertIsInstance(task, Task)
+            task.status = Status.DONE
+            project.save_task(task)
+            self.assertIs(project.tasks["task1"], task)
+        self.assertEqual(backend.load_project("proj1")["tasks"]["task1"], dict(self.data, status="DONE"))
+
+
+class TestTaskIndex(TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.patcher = patch("main.get_storage", return_value=JSONStorage(self.folder))
+        self.patcher.start()
+        self.username_patcher = patch("main.get_username", side_effect=lambda ID: ID)
+        self.username_patcher.start()
+        self.project = Project("indexed", "id1", collaborators=["id1", "id2", "id3"], ID="proj1")
+        with self.project.batch():
+            for i in range(5):
+                self.project.save_task(Task(f"task {i}", "desc", ID=f"task{i}", status="TODO" if i % 2 else "DONE",
+                                            end_time=f"2024-06-0{i + 1} 12:00:00", assignees=["id2"] if i < 3 else []))
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.username_patcher.stop()
+        shutil.rmtree(self.folder)
+
+    def ids(self, tasks):
+        return [task.ID for task in tasks]
+
+    def test_queries(self):
+        index = self.project.index
+        self.assertEqual(self.ids(index.by_status("DONE")), ["task0", "task2", "task4"])
+        self.assertEqual(self.ids(index.by_status(Status.TODO)), ["task1", "task3"])
+        self.assertEqual(self.ids(index.by_priority("LOW")), [f"task{i}" for i in range(5)])
+        self.assertEqual(self.ids(index.by_assignee("id2")), ["task0", "task1", "task2"])
+        self.assertEqual(index.ending_between(datetime(2024, 6, 2), datetime(2024, 6, 4)), ["task1", "task2"])
+
+    def test_mutations_update_the_index(self):
+        task = self.project.tasks["task1"]
+        task.status = Status.DOING
+        task.end_time = "2024-05-01 00:00:00"
+        self.project.save_task(task)
+        with self.project.batch():
+            for assigned in self.project.index.by_assignee("id2"):
+                self.project.remove_assignee("id2", assigned)
+        del self.project.tasks["task4"]
+        self.project.delete_task_data("task4")
+        index = self.project.index
+        self.assertEqual(self.ids(index.by_status("DOING")), ["task1"])
+        self.assertEqual(self.ids(index.by_status("DONE")), ["task0", "task2"])
+        self.assertEqual(index.by_assignee("id2"), [])
+        self.assertEqual(index.ending_between(end=datetime(2024, 6, 2)), ["task1", "task0"])
+        reloaded = Project.open("proj1")
+        for status in Status:
+            self.assertEqual(self.ids(reloaded.index.by_status(status)), self.ids(index.by_status(status)))
+
+
+class TestUserDirectory(TestCase):
+
+    def setUp(self):
+        # Write a small registry file to a temporary folder
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "emails_and_usernames.json")
+        self.write({"emails": ["a@test.com"], "usernames": {"id1": "alice"}})
+        self.directory = UserDirectory(JSONStorage(self.folder))
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def write(self, data):
+        with open(self.path, "w") as file:
+            json.dump(data, file)
+
+    def test_lookups_both_directions(self):
+        self.assertEqual(self.directory.username("id1"), "alice")
+        self.assertEqual(self.directory.ID("alice"), "id1")
+        self.assertIsNone(self.directory.ID("nobody"))
+
+    def test_file_is_parsed_once(self):
+        self.directory.username("id1")
+        with patch("storage.read_data") as mock_load:
+            self.directory.username("id1")
+            self.directory.ID("alice")
+            mock_load.assert_not_called()
+
+    def test_reload_on_change(self):
+        self.directory.username("id1")
+        self.write({"emails": ["a@test.com", "b@test.com"], "usernames": {"id1": "alice", "id2": "bobby"}})
+        self.assertEqual(self.directory.username("id2"), "bobby")
+        self.assertEqual(self.directory.ID("bobby"), "id2")
+
+    def test_rename_user_writes_through(self):
+        self.directory.rename_user("id1", "carol")
+        self.assertEqual(self.directory.ID("carol"), "id1")
+        with open(self.path) as file:
+            self.assertEqual(json.load(file)["usernames"]["id1"], "carol")
+
+    def test_unique_checks_are_case_insensitive(self):
+        self.assertTrue(self.directory.username_taken("ALICE"))
+        self.assertTrue(self.directory.email_taken("A@Test.com"))
+        self.assertFalse(self.directory.username_taken("bobby"))
+        self.assertFalse(self.directory.email_taken("b@test.com"))
+
+    def test_add_user_updates_indexes_and_file(self):
+        self.directory.add_user("id2", "b@test.com", "bobby")
+        with patch("storage.read_data") as mock_load:
+            self.assertTrue(self.directory.username_taken("Bobby"))
+            self.assertTrue(self.directory.email_taken("b@test.com"))
+            self.assertEqual(self.directory.ID("bobby"), "id2")
+            mock_load.assert_not_called()
+        with open(self.path) as file:
+            self.assertEqual(json.load(file)["usernames"]["id2"], "bobby")
+
+
+class TestPasswordHasher(TestCase):
+
+    def setUp(self):
+        self.hasher = PasswordHasher(rounds=4, workers=2)
+
+    def tearDown(self):
+        self.hasher.shutdown()
+
+    def test_hash_and_verify(self):
+        hashed = self.hasher.hash("Secret#123")
+        self.assertEqual(cost_of(hashed), 4)
+        self.assertTrue(self.hasher.verify("Secret#123", hashed))
+        self.assertFalse(self.hasher.verify("other", hashed))
+        self.assertFalse(self.hasher.verify("Secret#123", "plain text"))
+        self.assertFalse(self.hasher.needs_rehash(hashed))
+        self.assertTrue(PasswordHasher(rounds=5).needs_rehash(hashed))
+        # a stronger stored hash is never downgraded
+        self.assertFalse(PasswordHasher(rounds=3).needs_rehash(hashed))
+        metrics = self.hasher.metrics()
+        self.assertEqual((metrics["hash"]["count"], metrics["verify"]["count"]), (1, 3))
+
+    def test_calibration_is_clamped(self):
+        self.assertEqual(calibrate(0.001), MIN_ROUNDS)
+        self.assertEqual(calibrate(10 ** 9), MAX_ROUNDS)
+        with patch.dict(os.environ, {"TRELLOMIZE_BCRYPT_ROUNDS": "5"}):
+            self.assertEqual(PasswordHasher().rounds, 5)
+
+    def test_calibrated_cost_is_shared(self):
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder)
+        cost_file = os.path.join(folder, "bcrypt.cost")
+        with patch("passwords.calibrate", return_value=11):
+            self.assertEqual(PasswordHasher(cost_file=cost_file).rounds, 11)
+        # another process (or a later run) reads the saved cost instead of calibrating again
+        with patch("passwords.calibrate", return_value=10) as mock_calibrate:
+            self.assertEqual(PasswordHasher(cost_file=cost_file).rounds, 11)
+            mock_calibrate.assert_not_called()
+
+    def test_login_rehashes_cheaper_costs(self):
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder)
+        backend = JSONStorage(folder)
+        backend.save_user({"email": "a@test.com", "username": "alice", "password": self.hasher.hash("Secret#123"),
+                           "active": True, "ID": "id1"})
+        with patch("main.get_storage", return_value=backend), patch.object(hasher, "_rounds", 5), \
+                patch("main.get_deadline_index", **{"return_value.counts.return_value": (0, 0)}), patch("main.clear_screen"), patch("main.wait_for_key_press"), \
+                patch("builtins.input", return_value="alice"), patch("pwinput.pwinput", return_value="Secret#123"):
+            user = User.login()
+        self.assertEqual(user.username, "alice")
+        stored = backend.load_user("alice")["password"]
+        self.assertEqual(cost_of(stored), 5)
+        self.assertTrue(self.hasher.verify("Secret#123", stored))
+
+
+class TestLogging(TestCase):
+
+    def setUp(self):
+        # Route the shared pipeline to a temporary file for the duration of the test
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "test.log")
+        shutdown_logging()
+        self.env = patch.dict(os.environ, {"TRELLOMIZE_LOG_FILE": self.path, "TRELLOMIZE_LOG_MAX_BYTES": "300",
+                                           "TRELLOMIZE_LOG_BACKUPS": "2"})
+        self.env.start()
+        self.logger = get_logger("test-logging")
+        self.logger.setLevel("INFO")
+
+    def tearDown(self):
+        shutdown_logging()
+        self.env.stop()
+        shutil.rmtree(self.folder)
+
+    def records(self):
+        shutdown_logging()
+        with open(self.path) as file:
+            return [json.loads(line) for line in file]
+
+    def test_json_lines_with_event_fields(self):
+        self.logger.info("User [%s] logged in", "alice", extra={"user": "id1", "action": "login"})
+        record, = self.records()
+        self.assertEqual(record["message"], "User [alice] logged in")
+        self.assertEqual((record["level"], record["user"], record["action"]), ("INFO", "id1", "login"))
+        self.assertNotIn("project", record)
+
+    def test_disabled_levels_are_not_formatted(self):
+        argument = MagicMock()
+        self.logger.debug("lookup %s", argument)
+        self.assertFalse(os.path.exists(self.path))
+        argument.__str__.assert_not_called()
+
+    def test_size_rotation(self):
+        for i in range(20):
+            self.logger.info("message number %d", i)
+        self.records()
+        self.assertTrue(os.path.exists(self.path + ".1"))
+        self.assertFalse(os.path.exists(self.path + ".3"))
+
+
+class TestBenchmarks(TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.root = os.path.join(self.folder, "data")
+        generate(self.root, users=20, projects=5, tasks=40, seed=7)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_generator_is_deterministic(self):
+        other = os.path.join(self.folder, "again")
+        generate(other, users=20, projects=5, tasks=40, seed=7)
+        backend, again = JSONStorage(self.root), JSONStorage(other)
+        self.assertEqual(backend.load_registry(), again.load_registry())
+        self.assertEqual(sorted(backend.project_ids()), sorted(again.project_ids()))
+        for ID in backend.project_ids():
+            self.assertEqual(backend.load_project(ID), again.load_project(ID))
+        self.assertEqual(sum(len(backend.load_project(ID)["tasks"]) for ID in backend.project_ids()), 40)
+
+    def test_harness_reports_and_compares(self):
+        with patch.object(hasher, "_rounds", 12):
+            report = Harness(self.root, iterations=3).run(["load_project_data", "view_user_projects", "login"])
+            self.assertEqual(hasher._rounds, 12)
+        # logins ran at the bench cost: no password was rehashed at the caller's
+        backend = JSONStorage(self.root)
+        self.assertEqual({cost_of(backend.load_user(username)["password"])
+                          for username in backend.load_registry()["usernames"].values()}, {4})
+        self.assertEqual(list(report["operations"]), ["load_project_data", "view_user_projects", "login"])
+        result = report["operations"]["load_project_data"]
+        self.assertEqual(result["reads"], 1)
+        self.assertLessEqual(result["p50_ms"], result["p95_ms"])
+        self.assertEqual(compare(report, report), [])
+        slower = json.loads(json.dumps(report))
+        slower["operations"]["login"]["p50_ms"] += 100
+        slower["operations"]["load_project_data"]["writes"] += 1
+        self.assertEqual({(name, metric) for name, metric, _, _ in compare(slower, report)},
+                         {("login", "p50_ms"), ("load_project_data", "writes")})
+
+
+class TestStartupBudget(TestCase):
+
+    def test_entry_points_defer_heavy_imports(self):
+        # wall-clock time depends on the host: it is only checked when a budget is set for this run
+        timed = "TRELLOMIZE_STARTUP_BUDGET_MS" in os.environ
+        for module in ("main", "manager"):
+            with self.subTest(module=module):
+                # best of three runs: the budget is about our imports, not a busy host
+                profiles = [import_profile(module) for _ in range(3 if timed else 1)]
+                total_ms, rows = min(profiles, key=lambda profile: profile[0])
+                loaded = {row[3] for row in rows}
+                for name in DEFERRED_MODULES:
+                    self.assertNotIn(name, loaded)
+                if timed:
+                    self.assertLess(total_ms, budget_ms())
+
+
+class TestAtomicWrite(TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, "data.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_replaces_content_at_every_durability(self):
+        for level in ("none", "file", "dir"):
+            atomic_write(self.path, f'{{"level": "{level}"}}', durability=level)
+            with open(self.path) as file:
+                self.assertEqual(json.load(file), {"level": level})
+        self.assertEqual(os.listdir(self.folder), ["data.json"])
+
+    def test_failed_write_keeps_old_file(self):
+        atomic_write(self.path, '{"old": true}')
+        with patch("fileio.os.replace", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                atomic_write(self.path, '{"new": true}')
+        with open(self.path) as file:
+            self.assertEqual(json.load(file), {"old": True})
+        self.assertEqual(os.listdir(self.folder), ["data.json"])
+
+    def test_unknown_durability_level(self):
+        with patch.dict(os.environ, {"TRELLOMIZE_DURABILITY": "sometimes"}):
+            with self.assertRaises(ValueError):
+                atomic_write(self.path, "{}")
+
+
+class TestCodecs(TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.project = {"title": "p", "owner": "id1", "collaborators": ["id1"], "ID": "proj1",
+                        "tasks": {"task1": {"title": "t\u00e9", "status": "TODO", "assignees": ["id1"], "comments": [], "history": []}}}
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_round_trip_and_auto_detect(self):
+        codecs = ["json", "pretty", "marshal"]
+        if msgpack is not None:
+            codecs.append("msgpack")
+        for codec in codecs:
+            with self.subTest(codec=codec):
+                self.assertEqual(decode(encode(self.project, codec)), self.project)
+
+    def test_json_without_accelerator(self):
+        with patch("fileio.orjson", None):
+            raw = encode(self.project, "json")
+            self.assertNotIn(b"\n", raw)
+            self.assertEqual(decode(raw), self.project)
+
+    def test_switching_codec_keeps_old_files_readable(self):
+        old = JSONStorage(self.folder, codec="pretty")
+        old.save_project(self.project)
+        new = JSONStorage(self.folder, codec="marshal")
+        self.assertEqual(new.load_project("proj1"), self.project)
+        new.save_project(self.project)
+        self.assertEqual(old.load_project("proj1"), self.project)
+
+    def test_unknown_codec(self):
+        with patch.dict(os.environ, {"TRELLOMIZE_CODEC": "xml"}):
+            with self.assertRaises(ValueError):
+                encode({})
+
+
+class TestStorageBackends(TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        json_backend = JSONStorage(self.folder)
+        with open(json_backend.registry_path, "w") as file:
+            json.dump({"emails": [], "usernames": {}}, file)
+        self.backends = [json_backend, SQLiteStorage(os.path.join(self.folder, "test.db"))]
+
+    def tearDown(self):
+        self.backends[1].conn.close()
+        shutil.rmtree(self.folder)
+
+    def test_user_round_trip(self):
+        user = {"email": "a@test.com", "username": "alice", "password": "hash", "active": True, "ID": "id1"}
+        for backend in self.backends:
+            with self.subTest(backend=type(backend).__name__):
+                backend.save_user(user)
+                backend.add_registry_user({"emails": ["a@test.com"], "usernames": {"id1": "alice"}}, "id1", "a@test.com", "alice")
+                self.assertTrue(backend.user_exists("alice"))
+                self.assertEqual(backend.load_user("alice"), user)
+                self.assertEqual(backend.load_registry(), {"emails": ["a@test.com"], "usernames": {"id1": "alice"}})
+                with self.assertRaises(FileNotFoundError):
+                    backend.load_user("nobody")
+
+    def test_save_whole_registry(self):
+        registry = {"emails": ["a@test.com", "b@test.com"], "usernames": {"id1": "alice", "id2": "bob"}}
+        for backend in self.backends:
+            with self.subTest(backend=type(backend).__name__):
+                for ID, username in registry["usernames"].items():
+                    backend.save_user({"email": f"{username[0]}@test.com", "username": username,
+                                       "password": "hash", "active": True, "ID": ID})
+                backend.save_registry(registry)
+                self.assertEqual(backend.load_registry(), registry)
+
+    def test_project_round_trip(self):
+        user = {"email": "a@test.com", "username": "alice", "password": "hash", "active": True, "ID": "id1"}
+        task = {"title": "t", "description": "d", "priority": "LOW", "status": "TODO", "ID": "task1",
+                "start_time": "2024-05-22 22:56:04", "end_time": "2024-05-23 22:56:04", "assignees": ["id1"],
+                "comments": [{"user": "id1", "comment": "hi", "role": "owner", "timestamp": "2024-05-22 23:00:00"}],
+                "history": []}
+        project = {"title": "p", "owner": "id1", "tasks": {"task1": task}, "collaborators": ["id1"], "ID": "proj1"}
+        for backend in self.backends:
+            with self.subTest(backend=type(backend).__name__):
+                backend.save_user(user)
+                backend.save_project(project)
+                backend.add_user_project("alice", "proj1")
+                self.assertEqual(backend.load_project("proj1"), project)
+                self.assertEqual(backend.load_user_projects("alice"), {"projects": ["proj1"]})
+                backend.remove_user_project("alice", "proj1")
+                self.assertTrue(backend.delete_project("proj1"))
+                self.assertFalse(backend.delete_project("proj1"))
+                with self.assertRaises(FileNotFoundError):
+                    backend.load_project("proj1")
+
+    def test_save_and_delete_single_task(self):
+        task = {"title": "t", "description": "d", "priority": "LOW", "status": "TODO", "ID": "task1",
+                "start_time": "2024-05-22 22:56:04", "end_time": "2024-05-23 22:56:04",
+                "assignees": [], "comments": [], "history": []}
+        for backend in self.backends:
+            with self.subTest(backend=type(backend).__name__):
+                project = {"title": "p", "owner": "id1", "tasks": {}, "collaborators": ["id1"], "ID": "proj2"}
+                backend.save_project(project)
+                project["tasks"]["task1"] = dict(task)
+                backend.save_task(project, "task1")
+                project["tasks"]["task1"]["status"] = "DONE"
+                backend.save_task(project, "task1")
+                self.assertEqual(backend.load_project("proj2"), project)
+                del project["tasks"]["task1"]
+                backend.delete_task(project, "task1")
+                self.assertEqual(backend.load_project("proj2")["tasks"], {})
+
+    def test_history_log(self):
+        first = {"user": "id1", "action": "change title", "new title": "t", "timestamp": "2024-05-22 23:00:00"}
+        second = {"user": "id1", "action": "add assignee", "new assignees": ["id2"], "timestamp": "2024-05-22 23:01:00"}
+        for backend in self.backends:
+            with self.subTest(backend=type(backend).__name__):
+                backend.append_history("proj3", "task1", [first])
+                backend.append_history("proj3", "task1", [second])
+                backend.append_history("proj3", "task2", [first])
+                self.assertEqual(list(backend.iter_history("proj3", "task1")), [first, second])
+                self.assertEqual(list(backend.iter_history("proj3", "task3")), [])
+
+
+class TestProjectSummaries(TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.backends = [JSONStorage(self.folder), SQLiteStorage(os.path.join(self.folder, "test.db"))]
+        task = {"title": "t", "description": "d", "priority": "LOW", "status": "TODO", "ID": "task1",
+                "start_time": "2024-05-22 22:56:04", "end_time": "2024-05-23 22:56:04",
+                "assignees": [], "comments": [], "history": []}
+        self.project = {"title": "p", "owner": "id1", "collaborators": ["id1", "id2"], "ID": "proj1",
+                        "tasks": {"task1": task, "task2": dict(task, ID="task2", status="DONE")}}
+
+    def tearDown(self):
+        self.backends[1].conn.close()
+        shutil.rmtree(self.folder)
+
+    def test_summaries_follow_project_writes(self):
+        for backend in self.backends:
+            with self.subTest(backend=type(backend).__name__):
+                backend.save_project(self.project)
+                self.assertEqual(backend.load_project_summaries(["proj1", "missing"]), {"proj1": {
+                    "ID": "proj1", "title": "p", "owner": "id1", "members": 2, "tasks": {"TODO": 1, "DONE": 1}}})
+                project = backend.load_project("proj1")
+                project["title"] = "renamed"
+                project["collaborators"].remove("id2")
+                project["tasks"]["task1"]["status"] = "DONE"
+                backend.save_changes(project, ["task1"], [], True)
+                summary = backend.load_project_summaries(["proj1"])["proj1"]
+                self.assertEqual((summary["title"], summary["members"], summary["tasks"]), ("renamed", 1, {"DONE": 2}))
+                backend.delete_project("proj1")
+                self.assertEqual(backend.load_project_summaries(["proj1"]), {})
+
+    def test_projects_saved_before_the_index_are_added(self):
+        backend = self.backends[0]
+        backend.save_project(self.project)
+        os.remove(backend.summaries_path)
+        self.assertEqual(backend.load_project_summaries(["proj1"])["proj1"]["tasks"], {"TODO": 1, "DONE": 1})
+        self.assertTrue(os.path.exists(backend.summaries_path))
+
+    def test_listing_does_not_load_projects(self):
+        backend = self.backends[0]
+        backend.save_project(self.project)
+        backend.save_user({"email": "a@test.com", "username": "alice", "password": "hash", "active": True, "ID": "id1"})
+        backend.add_user_project("alice", "proj1")
+        user = User("a@test.com", "alice", "hash", ID="id1")
+        with patch("main.get_storage", return_value=backend), patch("main.get_username", side_effect=lambda ID: ID), \
+                patch("main.clear_screen"), patch("builtins.input", return_value=""), \
+                patch.object(backend, "load_project") as mock_load:
+            Project.view_user_projects(user)
+            mock_load.assert_not_called()
+
+
+class TestAssignmentIndex(TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.backends = [JSONStorage(self.folder), SQLiteStorage(os.path.join(self.folder, "test.db"))]
+        self.username_patcher = patch("main.get_username", side_effect=lambda ID: ID)
+        self.username_patcher.start()
+
+    def tearDown(self):
+        self.username_patcher.stop()
+        self.backends[1].conn.close()
+        shutil.rmtree(self.folder)
+
+    def tasks_of(self, backend, user):
+        return sorted((row["project"], row["task"], row["title"]) for row in backend.load_assignments(user))
+
+    def test_index_follows_task_changes(self):
+        for backend in self.backends:
+            with self.subTest(backend=type(backend).__name__), patch("main.get_storage", return_value=backend):
+                project = Project("p", "id1", collaborators=["id1", "id2", "id3"], ID="proj1")
+                project.save_task(Task("first", "d", ID="task1", assignees=["id2"]))
+                project.save_task(Task("second", "d", ID="task2"))
+                other = Project("q", "id1", collaborators=["id1", "id2"], ID="proj2")
+                other.save_task(Task("third", "d", ID="task3", assignees=["id2"]))
+                project.assign_member("id2", project.tasks["task2"])
+                project.assign_member("id3", project.tasks["task2"])
+                project.tasks["task1"].title = "renamed"
+                project.save_task(project.tasks["task1"])
+                self.assertEqual(self.tasks_of(backend, "id2"), [("proj1", "task1", "renamed"), ("proj1", "task2", "second"),
+                                                                 ("proj2", "task3", "third")])
+                project.remove_assignee("id3", project.tasks["task2"])
+                del project.tasks["task1"]
+                project.delete_task_data("task1")
+                self.assertEqual(self.tasks_of(backend, "id3"), [])
+                self.assertEqual(self.tasks_of(backend, "id2"), [("proj1", "task2", "second"), ("proj2", "task3", "third")])
+                with patch("builtins.input", return_value="y"), patch("main.wait_for_key_press"), \
+                        patch("main.update_memberships", return_value={}):
+                    other.delete_project(User("a@test.com", "alice", "hash", ID="id1"))
+                self.assertEqual(self.tasks_of(backend, "id2"), [("proj1", "task2", "second")])
+
+    def test_existing_projects_are_indexed_once(self):
+        backend = self.backends[0]
+        task = {"title": "t", "description": "d", "priority": "LOW", "status": "TODO", "ID": "task1",
+                "start_time": "2024-05-22 22:56:04", "end_time": "2024-05-23 22:56:04",
+                "assignees": ["id2"], "comments": [], "history": []}
+        backend.save_project({"title": "p", "owner": "id1", "collaborators": ["id1", "id2"], "ID": "proj1",
+                              "tasks": {"task1": task}})
+        self.assertFalse(os.path.exists(backend.assignments_path))
+        self.assertEqual(self.tasks_of(backend, "id2"), [("proj1", "task1", "t")])
+        with patch.object(backend, "load_project") as mock_load:
+            self.assertEqual(self.tasks_of(backend, "id2"), [("proj1", "task1", "t")])
+            mock_load.assert_not_called()
+
+
+class TestSearchIndex(TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.backend = JSONStorage(self.folder)
+        self.patcher = patch("main.get_storage", return_value=self.backend)
+        self.patcher.start()
+        self.project = Project("p", "id1", ID="proj1")
+        with self.project.batch():
+            self.project.save_task(Task("Design login page", "mockups for the login form", ID="task1"))
+            self.project.save_task(Task("Write tests", "cover the login design", ID="task2"))
+            self.project.save_task(Task("Deploy", "release to production", ID="task3"))
+        self.index = get_search_index(self.backend)
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.index.conn.close()
+        shutil.rmtree(self.folder)
+
+    def found(self, query, project_ids=None):
+        return [result["task"] for result in self.index.search(query, project_ids)]
+
+    def test_ranked_exact_and_prefix_queries(self):
+        self.assertEqual(self.found("login"), ["task1", "task2"])
+        self.assertEqual(self.found("design"), ["task1", "task2"])
+        self.assertEqual(self.found("login mockups"), ["task1"])
+        self.assertEqual(self.found("dep*"), ["task3"])
+        self.assertEqual(self.found("des"), [])
+        self.assertEqual(self.found("login", ["other"]), [])
+
+    def test_edits_update_the_index(self):
+        task = self.project.tasks["task3"]
+        task.comments.append({"user": "id1", "comment": "blocked on login", "role": "owner", "timestamp": "2024-05-22 23:00:00"})
+        self.project.save_task(task)
+        self.assertEqual(self.found("blocked"), ["task3"])
+        with patch.object(self.index, "update") as mock_update:
+            task.status = "DONE"
+            self.project.save_task(task)
+            mock_update.assert_not_called()
+        del self.project.tasks["task1"]
+        self.project.delete_task_data("task1")
+        self.assertCountEqual(self.found("login"), ["task2", "task3"])
+
+    def test_existing_projects_are_indexed_once(self):
+        self.index.conn.close()
+        os.remove(self.backend.index_path("search"))
+        index = get_search_index(JSONStorage(self.folder))
+        self.addCleanup(index.conn.close)
+        self.assertEqual([result["task"] for result in index.search("production")], ["task3"])
+
+
+class TestDeadlineIndex(TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.backend = JSONStorage(self.folder)
+        self.patcher = patch("main.get_storage", return_value=self.backend)
+        self.patcher.start()
+        self.now = datetime(2024, 5, 22, 12, 0, 0)
+        self.project = Project("p", "id1", ID="proj1")
+        with self.project.batch():
+            self.project.save_task(Task("late", "d", ID="task1", status=Status.TODO, assignees=["id2"],
+                                        end_time=self.now - timedelta(hours=2)))
+            self.project.save_task(Task("soon", "d", ID="task2", status=Status.DOING, assignees=["id2", "id3"],
+                                        end_time=self.now + timedelta(hours=3)))
+            self.project.save_task(Task("later", "d", ID="task3", status=Status.TODO,
+                                        end_time=self.now + timedelta(days=3)))
+            self.project.save_task(Task("finished", "d", ID="task4", status=Status.DONE, assignees=["id2"],
+                                        end_time=self.now - timedelta(days=1)))
+        self.index = get_deadline_index(self.backend)
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.index.conn.close()
+        get_search_index(self.backend).conn.close()
+        shutil.rmtree(self.folder)
+
+    def tasks(self, rows):
+        return [row["task"] for row in rows]
+
+    def test_overdue_and_due_soon_queries(self):
+        self.assertEqual(self.tasks(self.index.overdue(self.now)), ["task1"])
+        self.assertEqual(self.tasks(self.index.due_within(24, self.now)), ["task2"])
+        self.assertEqual(self.tasks(self.index.due_between(self.now - timedelta(days=1))), ["task1", "task2", "task3"])
+        self.assertEqual(self.tasks(self.index.due_within(24, self.now, user_ID="id3")), ["task2"])
+        self.assertEqual(self.tasks(self.index.overdue(self.now, project_ids=["other"])), [])
+        self.assertEqual(self.index.counts("id2", now=self.now), (1, 1))
+        row = self.index.overdue(self.now)[0]
+        self.assertEqual((row["title"], row["status"], row["end_time"]), ("late", "TODO", self.now - timedelta(hours=2)))
+
+    def test_edits_update_the_index(self):
+        task = self.project.tasks["task1"]
+        task.end = self.now + timedelta(hours=1)
+        self.project.save_task(task)
+        self.assertEqual(self.tasks(self.index.overdue(self.now)), [])
+        self.assertEqual(self.tasks(self.index.due_within(24, self.now, user_ID="id2")), ["task1", "task2"])
+        task.status = Status.DONE
+        self.project.save_task(task)
+        self.assertEqual(self.index.counts("id2", now=self.now), (0, 1))
+        self.project.tasks["task2"].assignees.remove("id2")
+        self.project.save_task(self.project.tasks["task2"])
+        self.assertEqual(self.index.counts("id2", now=self.now), (0, 0))
+        with patch.object(self.index, "update") as mock_update:
+            self.project.tasks["task3"].description = "new"
+            self.project.save_task(self.project.tasks["task3"])
+            mock_update.assert_not_called()
+        del self.project.tasks["task2"]
+        self.project.delete_task_data("task2")
+        self.assertEqual(self.tasks(self.index.due_between()), ["task3"])
+
+    def test_existing_projects_are_indexed_once(self):
+        self.index.conn.close()
+        os.remove(self.backend.index_path("deadlines"))
+        index = get_deadline_index(JSONStorage(self.folder))
+        self.addCleanup(index.conn.close)
+        self.assertEqual(self.tasks(index.due_between()), ["task1", "task2", "task3"])
+
+
+class TestSplitTaskLayout(TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.backend = JSONStorage(self.folder, split_tasks=True)
+        self.task = {"title": "t", "description": "d", "priority": "LOW", "status": "TODO", "ID": "task1",
+                     "start_time": "2024-05-22 22:56:04", "end_time": "2024-05-23 22:56:04",
+                     "assignees": [], "comments": [], "history": []}
+        self.project = {"title": "p", "owner": "id1", "tasks": {"task1": self.task}, "collaborators": ["id1"], "ID": "proj1"}
+        self.backend.save_project(self.project)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_task_edit_writes_only_task_file(self):
+        self.task["title"] = "changed"
+        with patch.object(self.backend, "_write", wraps=self.backend._write) as mock_write:
+            self.backend.save_task(self.project, "task1")
+            self.assertEqual([call.args[0] for call in mock_write.call_args_list],
+                             [os.path.join(self.folder, "projects", "proj1", "tasks", "task1.json")])
+        self.assertEqual(self.backend.load_project("proj1"), self.project)
+
+    def test_new_and_deleted_tasks_update_header(self):
+        new_task = dict(self.task, ID="task2")
+        self.project["tasks"]["task2"] = new_task
+        self.backend.save_task(self.project, "task2")
+        self.assertEqual(list(self.backend.load_project("proj1")["tasks"]), ["task1", "task2"])
+        del self.project["tasks"]["task1"]
+        self.backend.delete_task(self.project, "task1")
+        self.assertEqual(self.backend.load_project("proj1"), self.project)
+        self.assertFalse(os.path.exists(os.path.join(self.folder, "projects", "proj1", "tasks", "task1.json")))
+
+    def test_task_writes_update_counts_without_recounting(self):
+        self.project["tasks"]["task2"] = dict(self.task, ID="task2")
+        self.backend.save_task(self.project, "task2")
+        with patch("storage.project_summary", wraps=storage.project_summary) as mock_summary:
+            self.task["status"] = "DONE"
+            self.backend.save_task(self.project, "task1")
+            self.project["tasks"]["task3"] = dict(self.task, ID="task3")
+            del self.project["tasks"]["task2"]
+            self.backend.save_changes(self.project, ["task3"], ["task2"], False)
+            # counts are moved from the stored summary, not recounted from every task
+            self.assertTrue(all(call.args[1] is not None for call in mock_summary.call_args_list))
+        self.assertEqual(self.backend.load_project_summaries(["proj1"])["proj1"]["tasks"], {"DONE": 2})
+        del self.project["tasks"]["task1"]
+        self.backend.delete_task(self.project, "task1")
+        self.assertEqual(self.backend.load_project_summaries(["proj1"])["proj1"]["tasks"], {"DONE": 1})
+
+    def test_single_file_projects_are_converted(self):
+        JSONStorage(self.folder).save_project(dict(self.project, ID="proj2"))
+        project = self.backend.load_project("proj2")
+        self.backend.save_task(project, "task1")
+        self.assertTrue(os.path.exists(os.path.join(self.folder, "projects", "proj2", "tasks", "task1.json")))
+        self.assertEqual(self.backend.load_project("proj2"), project)
+
+
+class TestProjectHistoryLog(TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.backend = JSONStorage(self.folder)
+        self.project = Project("history test", "id1", tasks={}, ID="proj1")
+        self.task = Task("task", "desc", ID="task1")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_saved_history_moves_to_log(self):
+        with patch("main.get_storage", return_value=self.backend):
+            self.task.add_to_history("id1", action="change title", new_amount="task")
+            self.project.save_task(self.task)
+            self.task.add_to_history("id1", action="change status", new_amount="DONE")
+            self.project.save_task(self.task)
+            stored = self.backend.load_project("proj1")
+            self.assertEqual(stored["tasks"]["task1"]["history"], [])
+            logged = list(self.backend.iter_history("proj1", "task1"))
+            self.assertEqual([entry["action"] for entry in logged], ["change title", "change status"])
+            self.assertEqual(self.task.history, [])
+
+
+class TestProjectDirtyTracking(TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.backend = JSONStorage(self.folder)
+        self.patcher = patch("main.get_storage", return_value=self.backend)
+        self.patcher.start()
+        self.username_patcher = patch("main.get_username", side_effect=lambda ID: ID)
+        self.username_patcher.start()
+        project = Project("dirty test", "id1", collaborators=["id1", "id2"], ID="proj1")
+        project.save_task(Task("task", "desc", ID="task1"))
+        self.project = Project.from_data(self.backend.load_project("proj1"))
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.username_patcher.stop()
+        shutil.rmtree(self.folder)
+
+    def test_unchanged_saves_are_noops(self):
+        with patch.object(self.backend, "save_changes") as mock_save:
+            self.project.save_project_data()
+            self.project.save_task(self.project.tasks["task1"])
+            self.project.save_project_header()
+            mock_save.assert_not_called()
+
+    def test_batch_flushes_once(self):
+        task = self.project.tasks["task1"]
+        with patch.object(self.backend, "save_changes", wraps=self.backend.save_changes) as mock_save:
+            with self.project.batch():
+                self.project.assign_member("id2", task)
+                task.add_to_history("id1", action="add assignee", members=["id2"])
+                self.project.save_task(task)
+                self.project.collaborators.append("id3")
+                self.project.save_project_header()
+            mock_save.assert_called_once_with(self.project.project_data(), ["task1"], [], True)
+        stored = self.backend.load_project("proj1")
+        self.assertEqual(stored["tasks"]["task1"]["assignees"], ["id2"])
+        self.assertEqual(stored["collaborators"], ["id1", "id2", "id3"])
+
+    def test_deleted_task_is_removed(self):
+        del self.project.tasks["task1"]
+        self.project.delete_task_data("task1")
+        self.assertEqual(self.backend.load_project("proj1")["tasks"], {})
+
+
+class TestBulkMembership(TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.backend = JSONStorage(self.folder)
+        self.patcher = patch("main.get_storage", return_value=self.backend)
+        self.patcher.start()
+        self.username_patcher = patch("main.get_username", side_effect=lambda ID: ID)
+        self.username_patcher.start()
+        project = Project("bulk test", "id1", collaborators=["id1", "id2", "id3", "id4"], ID="proj1")
+        with project.batch():
+            project.save_task(Task("a", "d", ID="task1", assignees=["id2", "id3"]))
+            project.save_task(Task("b", "d", ID="task2", assignees=["id2", "id4"]))
+            project.save_task(Task("c", "d", ID="task3", assignees=["id4"]))
+            project.save_task(Task("e", "d", ID="task4"))
+        self.project = Project.from_data(self.backend.load_project("proj1"))
+
+    def tearDown(self):
+        self.patcher.stop()
+        self.username_patcher.stop()
+        shutil.rmtree(self.folder)
+
+    def history(self, task_id):
+        return list(self.backend.iter_history("proj1", task_id))
+
+    def test_remove_members_saves_once(self):
+        with patch.object(self.backend, "save_changes", wraps=self.backend.save_changes) as mock_save, \
+                patch("main.update_memberships", return_value={}) as mock_update:
+            removed = self.project.remove_members(["id2", "id3", "id2", "id1", "id9"], by="id1")
+            self.assertEqual(removed, ["id2", "id3"])
+            mock_save.assert_called_once()
+            self.assertEqual(sorted(mock_save.call_args[0][1]), ["task1", "task2"])
+            mock_update.assert_called_once_with("proj1", added=(), removed=["id2", "id3"], backend=self.backend)
+        stored = self.backend.load_project("proj1")
+        self.assertEqual(stored["collaborators"], ["id1", "id4"])
+        self.assertEqual(stored["tasks"]["task1"]["assignees"], [])
+        self.assertEqual(stored["tasks"]["task2"]["assignees"], ["id4"])
+        self.assertEqual([entry["removed assignees"] for entry in self.history("task1")], [["id2", "id3"]])
+        self.assertEqual([entry["removed assignees"] for entry in self.history("task2")], [["id2"]])
+        self.assertEqual(self.history("task3"), [])
+        self.assertEqual(list(self.project.index.by_assignee("id2")), [])
+
+    def test_reassign_tasks(self):
+        with patch.object(self.backend, "save_changes", wraps=self.backend.save_changes) as mock_save:
+            self.assertEqual(self.project.reassign_tasks("id2", "id4", by="id1"), 2)
+            mock_save.assert_called_once()
+        stored = self.backend.load_project("proj1")
+        self.assertEqual(stored["tasks"]["task1"]["assignees"], ["id4", "id3"])
+        self.assertEqual(stored["tasks"]["task2"]["assignees"], ["id4"])
+        entry, = self.history("task1")
+        self.assertEqual((entry["action"], entry["removed assignees"], entry["new assignees"]), ("reassign", ["id2"], ["id4"]))
+        with self.assertRaises(ValueError):
+            self.project.reassign_tasks("id4", "id9")
+
+    def test_menu_reassigns_then_removes(self):
+        owner = User("a@test.com", "alice", "hash", ID="id1")
+        with patch.object(self.backend, "save_changes", wraps=self.backend.save_changes) as mock_save, \
+                patch("main.update_memberships", return_value={}), patch("main.get_ID", side_effect=lambda name: name), \
+                patch("main.clear_screen"), patch("main.console"), patch("builtins.input", side_effect=["1,3", "2"]):
+            self.project.remove_member_menu(owner)
+            mock_save.assert_called_once()
+        stored = self.backend.load_project("proj1")
+        self.assertEqual(stored["collaborators"], ["id1", "id3"])
+        self.assertEqual([stored["tasks"][ID]["assignees"] for ID in ("task1", "task2", "task3")], [["id3"], ["id3"], ["id3"]])
+
+
+class TestMembershipFanout(TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.backend = JSONStorage(self.folder)
+        registry = {"emails": [], "usernames": {}}
+        self.IDs = [f"id{i}" for i in range(20)]
+        for ID in self.IDs:
+            registry["emails"].append(f"{ID}@test.com")
+            registry["usernames"][ID] = f"user_{ID}"
+            self.backend.save_user({"email": f"{ID}@test.com", "username": f"user_{ID}", "password": "hash",
+                                    "active": True, "ID": ID})
+            self.backend.add_user_project(f"user_{ID}", "other")
+        self.backend.save_registry(registry)
+        self.patcher = patch("membership.directory", UserDirectory(self.backend))
+        self.patcher.start()
+
+    def tearDown(self):
+        self.patcher.stop()
+        shutil.rmtree(self.folder)
+
+    def projects_of(self, ID):
+        return self.backend.load_user_projects(f"user_{ID}")["projects"]
+
+    def test_parallel_add_and_remove(self):
+        self.assertEqual(update_memberships("proj1", added=self.IDs, workers=4, backend=self.backend), {})
+        self.assertTrue(all(self.projects_of(ID) == ["other", "proj1"] for ID in self.IDs))
+        self.assertEqual(update_memberships("proj1", removed=self.IDs, workers=4, backend=self.backend), {})
+        self.assertTrue(all(self.projects_of(ID) == ["other"] for ID in self.IDs))
+
+    def test_failures_are_reported_per_user(self):
+        os.remove(self.backend._user_projects_file("user_id3"))
+        failed = update_memberships("other", removed=self.IDs + ["ghost"], workers=4, backend=self.backend)
+        self.assertEqual(sorted(failed), ["ghost", "id3"])
+        self.assertIsInstance(failed["id3"], FileNotFoundError)
+        self.assertTrue(all(self.projects_of(ID) == [] for ID in self.IDs if ID != "id3"))
+
+    def test_other_backends_use_their_own_registry(self):
+        other = JSONStorage(tempfile.mkdtemp(dir=self.folder))
+        other.save_user({"email": "x@test.com", "username": "xavier", "password": "hash", "active": True, "ID": "x1"})
+        other.save_registry({"emails": ["x@test.com"], "usernames": {"x1": "xavier"}})
+        self.assertEqual(update_memberships("proj1", added=["x1"], backend=other), {})
+        self.assertEqual(other.load_user_projects("xavier")["projects"], ["proj1"])
+        self.assertEqual(sorted(update_memberships("proj1", added=["id1"], backend=other)), ["id1"])
+
+    def test_member_lists_wait_for_the_project_save(self):
+        with patch("main.get_storage", return_value=self.backend), patch("main.get_username", side_effect=lambda ID: ID):
+            project = Project("fanout", "id0", collaborators=["id0", "id1"], ID="proj1")
+            project.save_project_header()
+            update_memberships("proj1", added=["id0", "id1"], backend=self.backend)
+            with patch.object(self.backend, "save_changes", side_effect=FileNotFoundError), \
+                    self.assertRaises(FileNotFoundError):
+                with project.batch():
+                    project.add_members(["id2"])
+                    project.remove_members(["id1"])
+            self.assertEqual([self.projects_of(ID) for ID in ("id0", "id1", "id2")],
+                             [["other", "proj1"], ["other", "proj1"], ["other"]])
+            with project.batch():
+                project.add_members(["id3"])
+            self.assertEqual([self.projects_of(ID) for ID in ("id1", "id2", "id3")],
+                             [["other"], ["other", "proj1"], ["other", "proj1"]])
+
+
+class TestUserStatusAdmin(TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.backend = JSONStorage(self.folder)
+        registry = {"emails": [], "usernames": {}}
+        for i in range(30):
+            username = f"intern_{i:02d}" if i < 10 else f"staff_{i:02d}"
+            registry["emails"].append(f"{username}@test.com")
+            registry["usernames"][f"id{i}"] = username
+            self.backend.save_user({"email": f"{username}@test.com", "username": username, "password": "hash",
+                                    "active": i % 3 != 0, "ID": f"id{i}", "last_login": f"2024-01-{i + 1:02d}"})
+        self.backend.save_registry(registry)
+        self.patchers = [patch("manager.get_storage", return_value=self.backend),
+                         patch("manager.directory", UserDirectory(self.backend)),
+                         patch("manager.console"), patch.object(Manager, "check_credentials")]
+        for patcher in self.patchers:
+            patcher.start()
+        self.index = get_user_status_index(self.backend)
+
+    def tearDown(self):
+        for patcher in self.patchers:
+            patcher.stop()
+        self.index.conn.close()
+        shutil.rmtree(self.folder)
+
+    def test_index_filters_without_opening_user_files(self):
+        self.index.ensure_built()
+        with patch.object(self.backend, "load_user") as mock_load:
+            self.assertEqual(self.index.counts(), (20, 10))
+            self.assertEqual(self.index.select(active=False, pattern="intern_*"), ["intern_00", "intern_03", "intern_06", "intern_09"])
+            self.assertEqual(self.index.select(active=True, inactive_since="2024-01-04"), ["intern_01", "intern_02"])
+            self.assertEqual(self.index.select(usernames=["staff_10", "nobody"]), ["staff_10"])
+            mock_load.assert_not_called()
+
+    def test_bulk_deactivate_reports_failures(self):
+        self.index.ensure_built()
+        os.remove(os.path.join(self.folder, "users", "intern_04", "intern_04.json"))
+        manager = Manager("admin", "secret")
+        failures = manager.bulk_status(False, pattern="intern_*", inactive_since="2024-01-09", workers=4)
+        self.assertEqual(failures, 1)
+        self.assertEqual([self.backend.load_user(f"intern_{i:02d}")["active"] for i in (1, 2, 5, 7, 8)], [False] * 4 + [True])
+        self.assertEqual(self.index.select(active=True, pattern="intern_*"), ["intern_04", "intern_08"])
+
+    def test_from_file_and_dry_run(self):
+        path = os.path.join(self.folder, "names.txt")
+        with open(path, "w") as file:
+            file.write("# to reactivate\nintern_00\nstaff_12\n\nghost\nstaff_11\n")
+        selected, unknown, already = Manager.select_users(True, from_file=path)
+        self.assertEqual((selected, unknown, already), (["intern_00", "staff_12"], ["ghost"], 1))
+        manager = Manager("admin", "secret")
+        self.assertEqual(manager.bulk_status(True, from_file=path, dry_run=True), 0)
+        self.assertFalse(self.backend.load_user("intern_00")["active"])
+        self.assertEqual(manager.bulk_status(True, from_file=path), 0)
+        self.assertEqual(self.index.select(active=False, pattern="*_1[0-2]"), [])
+
+    def test_login_records_the_day_once(self):
+        with patch("main.get_storage", return_value=self.backend), patch.object(hasher, "needs_rehash", return_value=False), \
+                patch.object(hasher, "submit_verify"), patch("main.wait_for", return_value=True), \
+                patch("main.get_deadline_index", **{"return_value.counts.return_value": (0, 0)}), \
+                patch("main.clear_screen"), patch("main.wait_for_key_press"), patch("main.console"), \
+                patch("builtins.input", return_value="staff_10"), patch("pwinput.pwinput", return_value="pw"), \
+                patch.object(self.backend, "save_user", wraps=self.backend.save_user) as mock_save:
+            User.login()
+            User.login()
+            mock_save.assert_called_once()
+        today = str(datetime.now().date())
+        self.assertEqual(self.backend.load_user("staff_10")["last_login"], today)
+        self.assertNotIn("staff_10", self.index.select(inactive_since=today))
+
+
+class TestArchive(TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        generate(os.path.join(self.folder, "data"), users=20, projects=5, tasks=40, seed=3)
+        self.source = JSONStorage(os.path.join(self.folder, "data"))
+        self.path = os.path.join(self.folder, "backup.jsonl.gz")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def records(self, path):
+        return sorted(json.dumps(record, sort_keys=True) for record in read_records(path) if record["type"] != "meta")
+
+    def test_round_trip_between_backends(self):
+        counts = export_archive(self.path, self.source)
+        self.assertEqual((counts["user"], counts["project"], counts["task"]), (20, 5, 40))
+        targets = [JSONStorage(os.path.join(self.folder, "copy"), split_tasks=True),
+                   SQLiteStorage(os.path.join(self.folder, "copy.db"))]
+        for target in targets:
+            with self.subTest(backend=type(target).__name__):
+                self.assertEqual(import_archive(self.path, target), counts)
+                again = os.path.join(self.folder, f"{type(target).__name__}.jsonl.gz")
+                export_archive(again, target)
+                self.assertEqual(self.records(again), self.records(self.path))
+                user = self.source.load_user("user00003")
+                self.assertEqual(target.load_user_projects("user00003"), self.source.load_user_projects("user00003"))
+                self.assertEqual(len(target.load_assignments(user["ID"])), len(self.source.load_assignments(user["ID"])))
+                self.assertEqual(get_user_status_index(target).counts(), get_user_status_index(self.source).counts())
+        targets[1].conn.close()
+
+    def test_import_needs_an_empty_store(self):
+        export_archive(self.path, self.source)
+        with self.assertRaises(ValueError):
+            import_archive(self.path, self.source)
+
+
+class TestBatchMode(TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.backend = JSONStorage(self.folder)
+        self.previous = storage._storage
+        storage.set_storage(self.backend)
+        registry = {"emails": [], "usernames": {}}
+        for ID, name in (("id1", "alice"), ("id2", "bob"), ("id3", "carol")):
+            registry["emails"].append(f"{name}@test.com")
+            registry["usernames"][ID] = name
+            self.backend.save_user({"email": f"{name}@test.com", "username": name, "password": "hash", "active": True, "ID": ID})
+        self.backend.save_registry(registry)
+        project = Project("batch test", "id1", collaborators=["id1", "id2"], ID="proj1")
+        with project.batch():
+            for i in range(20):
+                project.save_task(Task(f"task {i}", "d", status="DOING" if i % 2 else "TODO", ID=f"task{i}",
+                                       assignees=["id2"] if i < 5 else []))
+        self.alice = User("alice@test.com", "alice", "hash", ID="id1")
+        self.bob = User("bob@test.com", "bob", "hash", ID="id2")
+
+    def tearDown(self):
+        storage.set_storage(self.previous)
+        shutil.rmtree(self.folder)
+
+    def test_commands_are_saved_together(self):
+        commands = ["# sprint end", "status proj1 status:DOING done", "create proj1 'New task' priority=high assignees=bob",
+                    "assign proj1 task7 bob", "comment proj1 task2 'Moved to the next sprint'", "unassign proj1 task0 bob",
+                    "priority proj1 nosuchtask HIGH", "assign proj1 task3 carol", "frobnicate proj1"]
+        with patch.object(self.backend, "save_changes", wraps=self.backend.save_changes) as mock_save:
+            report = BatchSession(self.alice, flush_every=1000).run(commands)
+            mock_save.assert_called_once()
+        self.assertEqual((report["applied"], report["failed"], report["tasks_changed"]), (5, 3, 14))
+        stored = self.backend.load_project("proj1")["tasks"]
+        self.assertEqual(sum(task["status"] == "DONE" for task in stored.values()), 10)
+        created, = [task for task in stored.values() if task["title"] == "New task"]
+        self.assertEqual((created["priority"], created["assignees"]), ("HIGH", ["id2"]))
+        self.assertEqual(stored["task0"]["assignees"], [])
+        self.assertEqual(stored["task2"]["comments"][0]["comment"], "Moved to the next sprint")
+        self.assertEqual([entry["action"] for entry in self.backend.iter_history("proj1", "task1")], ["change status"])
+
+    def test_assignees_only_edit_their_tasks(self):
+        session = BatchSession(self.bob, flush_every=2)
+        report = session.run(["status proj1 * BACKLOG", "status proj1 task9 DONE", "create proj1 'Mine'"])
+        self.assertEqual((report["applied"], report["failed"], report["tasks_changed"]), (1, 2, 5))
+        stored = self.backend.load_project("proj1")["tasks"]
+        self.assertEqual(sorted(ID for ID, task in stored.items() if task["status"] == "BACKLOG"),
+                         ["task0", "task1", "task2", "task3", "task4"])
+        self.assertEqual([error for _, _, error in session.failed],
+                         ["You don't have access to modify task task9.", "Only the project owner can create tasks."])
+
+    def test_errors_inside_commands_are_not_usage_errors(self):
+        session = BatchSession(self.alice)
+        with self.assertRaisesRegex(ValueError, "Wrong arguments for 'status'"):
+            session.execute("status proj1 task1")
+        with patch.object(Task, "add_to_history", side_effect=TypeError("bug")):
+            with self.assertRaisesRegex(TypeError, "bug"):
+                session.execute("status proj1 task1 DONE")
+        session.close()
+
+    def test_failed_saves_are_not_failed_commands(self):
+        session = BatchSession(self.alice, flush_every=1)
+        with patch.object(self.backend, "save_changes", side_effect=OSError("disk full")):
+            report = session.run(["status proj1 task1 DONE", "status proj1 task2 DONE", "status nosuch task1 DONE"])
+        self.assertEqual((report["applied"], report["failed"], report["save_errors"]), (1, 0, 1))
+        self.assertEqual(session.save_errors, ["disk full"])
+        session = BatchSession(self.alice)
+        session.run(["status nosuch task1 DONE"])
+        self.assertEqual([error for _, _, error in session.failed], ["No such project: nosuch"])
+
+    def test_authenticate(self):
+        user = self.backend.load_user("alice")
+        user["password"] = hasher.hash("Secret#123")
+        self.backend.save_user(user)
+        with patch.object(hasher, "_rounds", 4):
+            self.assertEqual(authenticate("alice", "Secret#123").ID, "id1")
+            self.assertIsNone(authenticate("alice", "wrong"))
+            self.assertIsNone(authenticate("nobody", "Secret#123"))
+
+
+
+class TestServerMode(TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.backend = JSONStorage(self.folder)
+        self.backend.save_registry({"emails": [], "usernames": {}})
+        self.server = StoreServer(self.backend, os.path.join(self.folder, "test.sock"), flush_interval=3600)
+        ready = threading.Event()
+        self.thread = threading.Thread(target=asyncio.run, args=(self.server.serve(ready),))
+        self.thread.start()
+        ready.wait(10)
+        self.remote = RemoteStorage(self.server.path)
+        self.previous = storage._storage
+        storage.set_storage(self.remote)
+        for ID, name in (("id1", "alice"), ("id2", "bob")):
+            user = User(f"{name}@test.com", name, "hash", ID=ID)
+            user.add_email_username()
+            user.save_user_data()
+        self.remote.flush()
+
+    def tearDown(self):
+        storage.set_storage(self.previous)
+        self.remote.close()
+        self.server.stop()
+        self.thread.join(10)
+        shutil.rmtree(self.folder)
+
+    def test_users_and_projects_through_the_server(self):
+        project = Project("shared", "id1", collaborators=["id1"], ID="proj1")
+        with project.batch():
+            for i in range(5):
+                project.save_task(Task(f"task {i}", "d", ID=f"task{i}", assignees=["id1"]))
+        project.add_members(["id2"])
+        opened = Project.open("proj1")
+        self.assertEqual((len(opened.tasks), opened.collaborators), (5, ["id1", "id2"]))
+        self.assertEqual(User.load_user_projects("bob"), {"projects": ["proj1"]})
+        self.assertEqual(len(self.remote.load_assignments("id1")), 5)
+        with self.assertRaises(FileNotFoundError):
+            self.remote.load_user("nobody")
+        self.remote.flush()
+        stored = JSONStorage(self.folder)
+        self.assertEqual(stored.load_project("proj1")["collaborators"], ["id1", "id2"])
+        self.assertEqual(stored.load_registry()["usernames"], {"id1": "alice", "id2": "bob"})
+        self.assertEqual(stored.load_user_projects("bob"), {"projects": ["proj1"]})
+
+    def test_writes_to_a_project_are_merged(self):
+        project = Project("shared", "id1", collaborators=["id1"], ID="proj1")
+        with project.batch():
+            for i in range(5):
+                project.save_task(Task(f"task {i}", "d", ID=f"task{i}"))
+        self.remote.flush()
+        with patch.object(self.backend, "save_changes", wraps=self.backend.save_changes) as mock_save:
+            for i in range(5):
+                task = project.tasks[f"task{i}"]
+                task.status = Status.DONE
+                task.add_to_history("id1", action="change status", new_amount="DONE")
+                project.save_task(task)
+            del project.tasks["task4"]
+            project.delete_task_data("task4")
+            self.remote.flush()
+            mock_save.assert_called_once()
+        stored = JSONStorage(self.folder)
+        self.assertEqual([task["status"] for task in stored.load_project("proj1")["tasks"].values()], ["DONE"] * 4)
+        # the history of the deleted task was dropped with it, not written after it
+        self.assertEqual(list(stored.iter_history("proj1", "task4")), [])
+        self.assertEqual(len(list(stored.iter_history("proj1", "task0"))), 1)
+
+    def test_history_sent_before_its_task_is_kept(self):
+        project = Project("shared", "id1", collaborators=["id1"], ID="proj1")
+        project.save_task(Task("first", "d", ID="task0"))
+        # a flush (another client's read, the timer) between the history and the task save
+        self.remote.append_history("proj1", "task1", [{"user": "id1", "action": "create task"}])
+        self.remote.flush()
+        project.save_task(Task("second", "d", ID="task1"))
+        self.remote.flush()
+        self.assertEqual([entry["action"] for entry in self.backend.iter_history("proj1", "task1")], ["create task"])
+
+    def test_failed_writes_are_retried(self):
+        bob = self.remote.load_user("bob")
+        with patch.object(self.backend, "save_user", side_effect=OSError("disk full")):
+            self.remote.save_user(dict(bob, active=False))
+            self.remote.save_user(dict(bob, active=False, last_login="2026-01-01"))
+            with self.assertRaisesRegex(OSError, "2 write\\(s\\) not saved yet: save_user failed: disk full"):
+                self.remote.flush()
+        self.remote.flush()
+        self.assertEqual(self.backend.load_user("bob")["last_login"], "2026-01-01")
+
+    def test_stop_writes_queued_changes(self):
+        self.remote.save_user(dict(self.remote.load_user("bob"), active=False))
+        self.assertTrue(self.backend.load_user("bob")["active"])
+        self.server.stop()
+        self.thread.join(10)
+        self.assertFalse(self.backend.load_user("bob")["active"])
+        self.assertFalse(os.path.exists(self.server.path))
+        with self.assertRaises(ConnectionError):
+            self.remote.load_user("bob")
+
+class TestConcurrentSessions(TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.backend = JSONStorage(self.folder)
+        self.patcher = patch("main.get_storage", return_value=self.backend)
+        self.patcher.start()
+        project = Project("shared", "id1", collaborators=["id1", "id2"], ID="proj1")
+        project.save_task(Task("first", "desc", ID="task1"))
+        project.save_task(Task("second", "desc", ID="task2"))
+
+    def tearDown(self):
+        self.patcher.stop()
+        shutil.rmtree(self.folder)
+
+    def test_changes_to_different_tasks_are_merged(self):
+        session_a, session_b = Project.open("proj1"), Project.open("proj1")
+        session_a.tasks["task1"].title = "renamed by a"
+        session_a.save_task(session_a.tasks["task1"])
+        with session_b.batch():
+            session_b.tasks["task2"].status = "DONE"
+            session_b.save_task(session_b.tasks["task2"])
+            session_b.tasks["task1"].description = "described by b"
+            session_b.save_task(session_b.tasks["task1"])
+        stored = self.backend.load_project("proj1")["tasks"]
+        self.assertEqual(stored["task1"]["title"], "renamed by a")
+        self.assertEqual(stored["task1"]["description"], "described by b")
+        self.assertEqual(stored["task2"]["status"], "DONE")
+
+    def test_membership_changes_are_merged(self):
+        session_a, session_b = Project.open("proj1"), Project.open("proj1")
+        session_a.collaborators.append("id3")
+        session_a.save_project_header()
+        session_b.collaborators.remove("id2")
+        session_b.save_project_header()
+        self.assertEqual(self.backend.load_project("proj1")["collaborators"], ["id1", "id3"])
+
+    def test_comments_from_both_sessions_are_kept(self):
+        session_a, session_b = Project.open("proj1"), Project.open("proj1")
+        for session, text in ((session_a, "from a"), (session_b, "from b")):
+            task = session.tasks["task1"]
+            task.comments.append({"user": "id1", "comment": text, "role": "owner", "timestamp": "2024-05-22 23:00:00"})
+            task.title = f"renamed {text}"
+            session.save_task(task)
+        stored = self.backend.load_project("proj1")["tasks"]["task1"]
+        self.assertEqual([comment["comment"] for comment in stored["comments"]], ["from a", "from b"])
+        self.assertEqual(stored["title"], "renamed from b")
+
+    def test_same_field_keeps_last_writer(self):
+        session_a, session_b = Project.open("proj1"), Project.open("proj1")
+        session_a.tasks["task1"].title = "a"
+        session_a.save_task(session_a.tasks["task1"])
+        session_b.tasks["task1"].title = "b"
+        session_b.save_task(session_b.tasks["task1"])
+        self.assertEqual(self.backend.load_project("proj1")["tasks"]["task1"]["title"], "b")
+
+    @skipIf(os.name == 'nt', "fcntl is POSIX only")
+    def test_lock_is_held_across_processes(self):
+        path = os.path.join(self.folder, "test.lock")
+        probe = ("import fcntl, sys\n"
+                 "file = open(sys.argv[1], 'a+')\n"
+                 "try:\n"
+                 "    fcntl.flock(file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)\n"
+                 "except BlockingIOError:\n"
+                 "    sys.exit(3)\n")
+        with FileLock(path):
+            with FileLock(path):
+                self.assertEqual(subprocess.run([sys.executable, "-c", probe, path]).returncode, 3)
+        self.assertEqual(subprocess.run([sys.executable, "-c", probe, path]).returncode, 0)
+
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,91 @@
+from indexdb import DerivedIndex
+
+
+class UserStatusIndex(DerivedIndex):
+    """
+    Active/inactive status and last login day of every user, so the
+    manager can list, count and select users without opening their
+    files. Built once from the stored user records; every save of a user
+    record (User.save_user_data, the manager's status changes) sends the
+    new record with update_users().
+
+    last_login is the day ("YYYY-MM-DD") of the user's last login or
+    registration; users saved before it was recorded have none and are
+    never matched by 'inactive_since'.
+    """
+
+    NAME = "users"
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS user_status (
+            user_id TEXT PRIMARY KEY,
+            username TEXT NOT NULL,
+            active INTEGER NOT NULL,
+            last_login TEXT
+        );
+        CREATE INDEX IF NOT EXISTS user_status_active ON user_status (active, last_login);
+    """
+    TABLES = ("user_status",)
+
+    @staticmethod
+    def entry(user_data):
+        return (user_data["username"], int(user_data["active"]), user_data.get("last_login"))
+
+    def _put(self, user_id, entry):
+        self.conn.execute("INSERT OR REPLACE INTO user_status VALUES (?, ?, ?, ?)", (user_id, *entry))
+
+    def _build(self):
+        # Every user in the registry that has a saved record (none before the first registration)
+        try:
+            usernames = self.storage.load_registry()["usernames"].values()
+        except FileNotFoundError:
+            return
+        for username in usernames:
+            try:
+                user_data = self.storage.load_user(username)
+            except FileNotFoundError:
+                continue
+            self._put(user_data["ID"], self.entry(user_data))
+
+    def update_users(self, users):
+        # users: saved user records (dicts with ID, username, active and maybe last_login)
+        self.ensure_built()
+        with self._lock, self.conn:
+            for user_data in users:
+                self._put(user_data["ID"], self.entry(user_data))
+
+    def select(self, active=None, pattern=None, inactive_since=None, usernames=None):
+        """
+        Usernames (sorted) of the users matching every filter given:
+        'active' True/False, 'pattern' a shell-style glob on the username,
+        'inactive_since' a "YYYY-MM-DD" day their last login is before,
+        'usernames' a collection they must belong to.
+        """
+        self.ensure_built()
+        clauses, params = [], []
+        if active is not None:
+            clauses.append("active = ?")
+            params.append(int(active))
+        if pattern is not None:
+            clauses.append("username GLOB ?")
+            params.append(pattern)
+        if inactive_since is not None:
+            clauses.append("last_login < ?")
+            params.append(inactive_since)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self.conn.execute(f"SELECT username FROM user_status{where} ORDER BY username", params).fetchall()
+        if usernames is None:
+            return [row[0] for row in rows]
+        wanted = set(usernames)
+        return [row[0] for row in rows if row[0] in wanted]
+
+    def counts(self):
+        # (active users, inactive users) from the index alone
+        self.ensure_built()
+        with self._lock:
+            rows = dict(self.conn.execute("SELECT active, COUNT(*) FROM user_status GROUP BY active").fetchall())
+        return rows.get(1, 0), rows.get(0, 0)
+
+
+def get_user_status_index(storage):
+    return UserStatusIndex.for_storage(storage)